@@ -0,0 +1,356 @@
+"""
+🧩 ترکیب فایل‌های CSS/JS محلی
+تگ‌های پشت سر هم ارجاع static به auto_* (با dialect پروژه) در هر template با یک فایل ترکیبی
+(با hash محتوا) جایگزین میشن. فقط تگ‌های پشت سر هم ترکیب میشن، نه همه ارجاع‌های یک
+template: ترتیب اجرا نسبت به اسکریپت‌ها و استایل‌های بینشون نباید عوض بشه.
+"""
+
+import os
+import re
+import json
+import hashlib
+import posixpath
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Set, Tuple
+
+from replace_cdn import ConfigManager, CDNReplacer, DIALECTS
+from cdn_downloader import compress_asset
+from static_integrity import IntegrityManifest, hash_file
+
+
+# محل فایل‌های ترکیبی داخل static
+BUNDLE_DIR = 'auto_bundles'
+
+# فایل ترکیبی → فایل‌های منبعش (برای ساخت دوباره وقتی منبع‌ها عوض میشن)؛ مثل
+# static_integrity.json کنار پوشه static
+BUNDLE_MANIFEST = 'static_bundles.json'
+
+# مسیر ...auto_....css (فقط فایل‌های نصب شده توسط دانلودر، نه فایل‌های ترکیبی خودمون)
+STATIC_PATH = r"""(?P<path>(?!""" + BUNDLE_DIR + r"""/)[^'"]*auto_[^'"]*\.EXT)"""
+
+# ارجاع به فایل ترکیبی ساخته شده در اجرای قبلی
+BUNDLE_REF_RE = re.compile(BUNDLE_DIR + r"""/auto_bundle\.[0-9a-f]{8}\.(?:css|js)""")
+
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+SOURCE_MAP_RE = re.compile(r"""^\s*(?://|/\*)#\s*sourceMappingURL=.*$""", re.MULTILINE)
+CHARSET_RE = re.compile(r"""@charset\s+["'][^"']*["']\s*;""", re.IGNORECASE)
+
+
+def static_ref(dialect: str) -> str:
+    """regex ارجاع static از روی قالب dialect (replace_cdn.DIALECTS)
+
+    فاصله‌ها اختیاری و نوع کوتیشن آزاد: {% static "x" %} و {{url_for('static',filename='x')}}
+    هم پیدا میشن.
+    """
+    prefix, _, suffix = DIALECTS[dialect].partition('{asset}')
+
+    def loose(text: str) -> str:
+        out = []
+        for ch in text:
+            if ch.isspace():
+                out.append(r"\s*")
+            elif ch in '\'"':
+                out.append(r"""['"]""")
+            else:
+                out.append(re.escape(ch))
+        return ''.join(out)
+
+    return loose(prefix.strip()) + STATIC_PATH + loose(suffix.strip())
+
+
+@lru_cache(maxsize=None)
+def tag_patterns(dialect: str) -> Tuple[Pattern, Pattern]:
+    """(تگ <link> css، تگ <script> js) برای یک dialect"""
+    ref = static_ref(dialect)
+    css_tag = re.compile(
+        r"""<link\b[^>]*?\bhref=(?P<q>["'])\s*""" + ref.replace('EXT', 'css') + r"""\s*(?P=q)[^>]*>""",
+        re.IGNORECASE
+    )
+    js_tag = re.compile(
+        r"""<script\b[^>]*?\bsrc=(?P<q>["'])\s*""" + ref.replace('EXT', 'js') + r"""\s*(?P=q)[^>]*>\s*</script>""",
+        re.IGNORECASE
+    )
+    return css_tag, js_tag
+
+
+def tag_signature(tag: str, path: str) -> str:
+    """ویژگی‌های تگ به جز آدرس (defer، async، type، media ...)"""
+    return re.sub(r"\s+", ' ', tag.replace(path, '')).strip().lower()
+
+
+def find_runs(content: str, tag_re) -> List[List[re.Match]]:
+    """گروه‌های تگ‌هایی که پشت سر هم اومدن و فقط فاصله بینشون هست"""
+    runs: List[List[re.Match]] = []
+
+    for match in tag_re.finditer(content):
+        previous = runs[-1][-1] if runs else None
+
+        if previous is not None and not content[previous.end():match.start()].strip():
+            runs[-1].append(match)
+        else:
+            runs.append([match])
+
+    return runs
+
+
+def rebase_css_urls(css: str, source: str, bundle: str) -> str:
+    """اصلاح url() های نسبی چون فایل ترکیبی در پوشه دیگه‌ای قرار می‌گیره"""
+    source_dir = posixpath.dirname(source)
+    bundle_dir = posixpath.dirname(bundle)
+
+    def rebase(match: re.Match) -> str:
+        quote, url = match.group(1), match.group(2).strip()
+
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+
+        # ?v=... و #iefix بعد از مسیر دست نمی‌خورن
+        path, suffix = re.match(r"([^?#]*)(.*)", url, re.DOTALL).groups()
+        target = posixpath.normpath(posixpath.join(source_dir, path))
+        new_url = posixpath.relpath(target, bundle_dir or '.') + suffix
+
+        return f"url({quote}{new_url}{quote})"
+
+    return CSS_URL_RE.sub(rebase, css)
+
+
+class AssetBundler:
+    """ساخت فایل‌های ترکیبی برای یک پروژه و بازنویسی template ها"""
+
+    def __init__(self, proj_data: Dict, settings: Optional[Dict] = None):
+        self.settings = settings or {}
+        self.replacer = CDNReplacer(proj_data, [], self.settings)
+        self.static_dir = self.replacer.static_dir
+        self.integrity = IntegrityManifest(self.static_dir)
+
+        # مجموعه مرتب فایل‌ها → مسیر فایل ترکیبی (مشترک بین template ها)
+        self.bundles: Dict[Tuple[str, ...], Optional[str]] = {}
+
+        # فایل ترکیبی → {'kind', 'sources'} از همه اجراها
+        self.manifest_file = self.static_dir.parent / BUNDLE_MANIFEST
+        self.manifest: Dict[str, Dict] = self.load_manifest()
+
+        self.dry_run = False
+        self.stats = {'templates_modified': 0, 'tags_removed': 0, 'bundles': 0, 'bundles_refreshed': 0,
+                      'bundles_removed': 0, 'skipped_runs': 0}
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        """بارگذاری لیست منبع‌های فایل‌های ترکیبی"""
+        if not self.manifest_file.exists():
+            return {}
+
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"   ⚠️ {BUNDLE_MANIFEST} خراب است: {e}")
+            return {}
+
+    def save_manifest(self):
+        """ذخیره اتمیک لیست منبع‌ها"""
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.manifest_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(self.manifest.items())), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
+
+    def refresh_bundles(self, content: str) -> Tuple[str, int]:
+        """ساخت دوباره فایل‌های ترکیبی قبلی از روی منبع‌ها؛ اگه محتوا عوض شده ارجاع به hash جدید میره"""
+        refreshed = 0
+
+        def refresh(match: re.Match) -> str:
+            nonlocal refreshed
+            entry = self.manifest.get(match.group(0))
+            if entry is None:
+                return match.group(0)
+
+            bundle = self.build_bundle(tuple(entry['sources']), entry['kind'])
+            if bundle is None or bundle == match.group(0):
+                return match.group(0)
+
+            refreshed += 1
+            return bundle
+
+        return BUNDLE_REF_RE.sub(refresh, content), refreshed
+
+    def build_bundle(self, paths: Tuple[str, ...], kind: str) -> Optional[str]:
+        """ساخت (یا استفاده دوباره از) فایل ترکیبی برای یک مجموعه مرتب"""
+        if paths in self.bundles:
+            return self.bundles[paths]
+
+        parts = []
+        charset = False
+
+        for path in paths:
+            file_path = self.static_dir / path
+            if not file_path.exists():
+                print(f"   ⚠️ فایل static یافت نشد: {path}")
+                self.bundles[paths] = None
+                return None
+
+            text = SOURCE_MAP_RE.sub('', file_path.read_text(encoding='utf-8'))
+
+            if kind == 'css':
+                if '@import' in text:
+                    # @import فقط اول فایل معتبره؛ این مجموعه ترکیب نمیشه
+                    print(f"   ⚠️ @import در {path}، ترکیب نمیشه")
+                    self.bundles[paths] = None
+                    return None
+                # @charset فقط یک بار و اول فایل ترکیبی
+                text, removed = CHARSET_RE.subn('', text)
+                charset = charset or bool(removed)
+
+            parts.append((path, text))
+
+        digest = hashlib.sha256()
+        for path, text in parts:
+            digest.update(path.encode('utf-8') + b'\0' + text.encode('utf-8'))
+
+        bundle = f"{BUNDLE_DIR}/auto_bundle.{digest.hexdigest()[:8]}.{kind}"
+        bundle_path = self.static_dir / bundle
+
+        if not bundle_path.exists() and not self.dry_run:
+            if kind == 'css':
+                body = "\n".join(f"/* {path} */\n" + rebase_css_urls(text, path, bundle) for path, text in parts)
+                if charset:
+                    body = '@charset "UTF-8";\n' + body
+            else:
+                # ; بین فایل‌ها تا فایلی که بدون ; تموم شده بعدی رو خراب نکنه
+                body = "\n;".join(f"/* {path} */\n" + text for path, text in parts)
+
+            bundle_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = bundle_path.with_name(bundle_path.name + '.tmp')
+            tmp_path.write_text(body, encoding='utf-8')
+            os.replace(tmp_path, bundle_path)
+
+            self.integrity.record(bundle_path, hash_file(bundle_path), 'bundle')
+            compress_asset(str(bundle_path))
+            self.stats['bundles'] += 1
+            print(f"   🧩 {bundle} ← {len(paths)} فایل")
+
+        self.bundles[paths] = bundle
+        self.manifest[bundle] = {'kind': kind, 'sources': list(paths)}
+        return bundle
+
+    def bundle_content(self, content: str) -> Tuple[str, int]:
+        """جایگزینی هر گروه از تگ‌های پشت سر هم با یک تگ فایل ترکیبی"""
+        edits = []
+
+        for kind, tag_re in zip(('css', 'js'), tag_patterns(self.replacer.dialect)):
+            for run in find_runs(content, tag_re):
+                if len(run) < 2:
+                    continue
+
+                tags = [m.group(0) for m in run]
+                signatures = {tag_signature(tag, m.group('path')) for tag, m in zip(tags, run)}
+
+                # integrity قدیمی یا ویژگی‌های متفاوت (defer، media ...) = ترکیب امن نیست
+                if len(signatures) > 1 or any('integrity=' in tag.lower() for tag in tags):
+                    self.stats['skipped_runs'] += 1
+                    continue
+
+                paths = tuple(m.group('path') for m in run)
+                bundle = self.build_bundle(paths, kind)
+                if bundle is None:
+                    self.stats['skipped_runs'] += 1
+                    continue
+
+                first = run[0]
+                new_tag = first.group(0).replace(first.group('path'), bundle)
+                edits.append((first.start(), run[-1].end(), new_tag, len(run) - 1))
+
+        if not edits:
+            return content, 0
+
+        parts = []
+        last = 0
+        removed = 0
+
+        for start, end, new_tag, count in sorted(edits):
+            parts.append(content[last:start])
+            parts.append(new_tag)
+            last = end
+            removed += count
+
+        parts.append(content[last:])
+        return ''.join(parts), removed
+
+    def prune_bundles(self, referenced: Set[str]):
+        """حذف فایل‌های ترکیبی قبلی (و .gz/.br شون) که دیگه هیچ template ای بهشون ارجاع نمیده"""
+        for bundle in [b for b in self.manifest if b not in referenced]:
+            for suffix in ('', '.gz', '.br'):
+                (self.static_dir / (bundle + suffix)).unlink(missing_ok=True)
+
+            del self.manifest[bundle]
+            self.integrity.files.pop(bundle, None)
+            self.stats['bundles_removed'] += 1
+            print(f"   🧹 {bundle}")
+
+    def run(self, dry_run: bool = False) -> Dict:
+        """پردازش همه template های پروژه"""
+        self.dry_run = dry_run
+
+        if not dry_run and not self.replacer.create_backup():
+            return self.stats
+
+        # فایل‌های ترکیبی که بعد از این اجرا هنوز ارجاع دارن (None = template خطادار، حذف نکن)
+        referenced: Optional[Set[str]] = set()
+
+        for file_path in self.replacer.find_template_files():
+            try:
+                with open(file_path, 'r', encoding='utf-8', newline='') as f:
+                    content = f.read()
+                new_content, refreshed = self.refresh_bundles(content)
+                new_content, removed = self.bundle_content(new_content)
+            except Exception as e:
+                print(f"   ❌ {file_path}: {e}")
+                referenced = None
+                continue
+
+            if referenced is not None:
+                referenced.update(BUNDLE_REF_RE.findall(new_content))
+
+            if not removed and not refreshed:
+                continue
+
+            self.stats['templates_modified'] += 1
+            self.stats['tags_removed'] += removed
+            self.stats['bundles_refreshed'] += refreshed
+            print(f"   ✅ {file_path.relative_to(self.replacer.templates_dir)} "
+                  f"({removed} درخواست کمتر، {refreshed} فایل ترکیبی به‌روز)")
+
+            if not dry_run:
+                with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(new_content)
+
+        if not dry_run:
+            if referenced is not None:
+                self.prune_bundles(referenced)
+            self.integrity.save()
+            self.save_manifest()
+
+        return self.stats
+
+
+def main():
+    """تابع اصلی"""
+    print()
+    print("╔" + "═" * 68 + "╗")
+    print("║" + " " * 20 + "🧩 ترکیب فایل‌های CSS/JS" + " " * 24 + "║")
+    print("╚" + "═" * 68 + "╝")
+
+    config_manager = ConfigManager()
+    settings = config_manager.get_settings()
+
+    for proj_id, proj_data in config_manager.get_enabled_projects().items():
+        print(f"\n📁 {proj_data.get('name', proj_id)}")
+        stats = AssetBundler(proj_data, settings).run()
+        print(f"   📊 {stats['templates_modified']} template، {stats['bundles']} فایل ترکیبی، "
+              f"{stats['tags_removed']} درخواست کمتر")
+
+    print()
+    input("Press Enter to exit...")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,10 @@ import json
 import sys
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, List
 from replace_cdn import ConfigManager, CDNReplacer
+from rollback import RollbackEngine
+from replacement_cache import create_cache
 
 
 class BatchProcessor:
@@ -16,6 +19,9 @@ class BatchProcessor:
     def __init__(self):
         self.config_manager = ConfigManager()
         self.results = []
+        
+        # template های یکسان پروژه‌های fork شده فقط یک بار پردازش میشن
+        self.result_cache = create_cache(self.config_manager.get_settings())
     
     def process_all(self, dry_run=False):
         """پردازش همه پروژه‌های فعال"""
@@ -46,6 +52,8 @@ class BatchProcessor:
             
             try:
                 replacer = CDNReplacer(proj_data, cdn_mappings, settings)
+                replacer.attach_cache(self.result_cache)
+                replacer.open_index(proj_id)
                 
                 if not dry_run:
                     if not replacer.create_backup():
@@ -60,13 +68,16 @@ class BatchProcessor:
                 
                 replacer.process_all_files(dry_run=dry_run)
                 
-                if not dry_run:
-                    replacer.save_log()
+                log_file = replacer.save_log() if not dry_run else None
+                replacer.index.save()
                 
+                # مسیر بکاپ و لاگ برای rollback.py
                 self.results.append({
                     'project': proj_id,
                     'status': 'success',
-                    'stats': replacer.stats
+                    'stats': replacer.stats,
+                    'backup_dir': str(replacer.backup_dir) if replacer.backup_dir.exists() else None,
+                    'log_file': str(log_file) if log_file else None
                 })
                 
             except Exception as e:
@@ -79,6 +90,11 @@ class BatchProcessor:
         
         self.print_summary()
     
+    def rollback(self) -> List[Dict]:
+        """بازگردانی همه پروژه‌های همین اجرا از بکاپ‌هاشون"""
+        engine = RollbackEngine(self.config_manager.get_settings())
+        return engine.rollback_batch(self.results, self.config_manager.get_projects())
+    
     def print_summary(self):
         """خلاصه کلی"""
         print("\n")
@@ -119,6 +135,12 @@ class BatchProcessor:
                     reason = result.get('reason', result.get('error', 'نامشخص'))
                     print(f"   • {result['project']}: {reason}")
         
+        if self.result_cache is not None and self.result_cache.hits:
+            metrics = self.result_cache.get_metrics()
+            print()
+            print(f"♻️ template های تکراری بین پروژه‌ها: {metrics['hits']} "
+                  f"(hit rate {metrics['hit_rate']:.0%}، {metrics['size_mb']} MB)")
+        
         print()
         print("=" * 80)
 
@@ -0,0 +1,272 @@
+"""
+🔭 کشف خودکار لینک‌های CDN
+پیدا کردن همه لینک‌های خارجی template ها، گروه‌بندی بر اساس host/پکیج/نسخه
+و پیشنهاد cdn_mappings و کارهای دانلود برای لینک‌هایی که هنوز پوشش داده نشدن
+"""
+
+import re
+import json
+from pathlib import Path
+from urllib.parse import urlsplit
+from typing import Dict, List, Optional, Tuple
+
+from replace_cdn import ConfigManager, CDNReplacer, iter_url_tokens
+
+
+VERSION_RE = re.compile(r"^v?\d+(?:\.\d+)*(?:[\-\.]?(?:rc|beta|alpha)[\.\d]*)?$", re.IGNORECASE)
+
+# نوع فایل → پوشه مقصد در static (مثل فایل‌های دانلودر)
+KIND_DIRS = {'.css': 'css', '.js': 'js'}
+
+
+def parse_cdn_url(url: str) -> Optional[Dict]:
+    """تجزیه لینک به host، پکیج، نسخه و مسیر فایل داخل پکیج"""
+    if url.startswith('//'):
+        url = 'https:' + url
+
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.netloc:
+        return None
+
+    host = parts.netloc.lower()
+    segments = [s for s in parts.path.split('/') if s]
+    package, version, rest = None, None, segments
+
+    if host in ('cdn.jsdelivr.net', 'unpkg.com') or host.endswith('.jsdelivr.net'):
+        if segments and segments[0] in ('npm', 'gh'):
+            segments = segments[1:]
+        if segments and segments[0].startswith('@') and len(segments) > 1:
+            segments = [segments[0] + '/' + segments[1]] + segments[2:]
+        if segments:
+            # select2@4.1.0 یا @popperjs/core@2.11.8
+            name = segments[0]
+            at = name.rfind('@')
+            package, version = (name[:at], name[at + 1:]) if at > 0 else (name, None)
+            rest = segments[1:]
+
+    elif segments[:2] == ['ajax', 'libs'] and len(segments) >= 4:
+        # cdnjs.cloudflare.com و ajax.googleapis.com
+        package, version, rest = segments[2], segments[3], segments[4:]
+
+    elif host == 'code.jquery.com' and segments:
+        if segments[0] == 'ui' and len(segments) > 1:
+            package, version, rest = 'jquery-ui', segments[1], segments[2:]
+        else:
+            match = re.match(r"^([a-z\-]+?)-(\d[\w\.\-]*?)(\.min|\.slim\.min|\.slim)?\.js$", segments[-1])
+            if match:
+                package, version = match.group(1), match.group(2)
+            rest = segments[-1:]
+
+    if package is None:
+        # حالت عمومی: اولین بخش شبیه نسخه، بخش قبلش اسم پکیجه
+        for i, segment in enumerate(segments):
+            if VERSION_RE.match(segment):
+                version = segment
+                if i > 0:
+                    package = segments[i - 1]
+                else:
+                    # هاست تک‌بخشی (مثل localhost:8000) نام دامنه دوم نداره
+                    labels = (parts.hostname or host).split('.')
+                    package = labels[-2] if len(labels) > 1 else labels[0]
+                rest = segments[i + 1:]
+                break
+        else:
+            package = segments[0] if segments else host
+
+    return {
+        'url': url,
+        'host': host,
+        'package': package,
+        'version': version.lstrip('v') if version else None,
+        'file': '/'.join(rest)
+    }
+
+
+class CDNDiscovery:
+    """اسکن یک‌باره template ها و جمع‌آوری لینک‌های خارجی"""
+
+    def __init__(self, config_file="config.json"):
+        self.config_manager = ConfigManager(config_file)
+        self.cdn_mappings = self.config_manager.get_cdn_mappings()
+        self.settings = self.config_manager.get_settings()
+
+        # (host, package, version) → {count, files, assets}
+        self.groups: Dict[Tuple[str, str, Optional[str]], Dict] = {}
+        self.covered = 0
+        self.files_scanned = 0
+
+    def scan_project(self, proj_id: str, proj_data: Dict):
+        """اسکن template های یک پروژه (فایل به فایل، بدون نگه داشتن محتوا)"""
+        replacer = CDNReplacer(proj_data, self.cdn_mappings, self.settings)
+        patterns = replacer.compiled_patterns
+
+        for file_path in replacer.find_template_files():
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception as e:
+                print(f"   ❌ {file_path}: {e}")
+                continue
+
+            self.files_scanned += 1
+            template = f"{proj_id}:{file_path.relative_to(replacer.templates_dir).as_posix()}"
+
+            for start, end in iter_url_tokens(content):
+                # لینک‌هایی که یک mapping موجود پوشششون میده کشف جدید نیستن
+                if any(p.search(content, start, end) for p in patterns.values()):
+                    self.covered += 1
+                    continue
+
+                url = content[start:end].strip().rstrip('"\'')
+                if not (url.startswith('http') or url.startswith('//')):
+                    continue
+
+                self.add(url, template)
+
+    def add(self, url: str, template: str):
+        """افزودن یک لینک به گروه مربوطه"""
+        info = parse_cdn_url(url)
+        if info is None:
+            return
+
+        key = (info['host'], info['package'], info['version'])
+        group = self.groups.setdefault(key, {'count': 0, 'templates': set(), 'assets': {}})
+        group['count'] += 1
+        group['templates'].add(template)
+        group['assets'].setdefault(info['file'], info['url'])
+
+    def ranked(self) -> List[Dict]:
+        """گروه‌ها به ترتیب تعداد استفاده"""
+        rows = []
+
+        for (host, package, version), group in self.groups.items():
+            rows.append({
+                'host': host,
+                'package': package,
+                'version': version,
+                'count': group['count'],
+                'templates': sorted(group['templates']),
+                'assets': group['assets']
+            })
+
+        rows.sort(key=lambda r: (-r['count'], r['host'], r['package']))
+        return rows
+
+    def suggest(self) -> Tuple[Dict[str, Dict], List[Dict]]:
+        """ساخت mapping های پیشنهادی و کارهای دانلود
+
+        یک mapping برای هر (host، پکیج، فایل) ساخته میشه که نسخه‌اش آزاده؛ کار
+        دانلود برای پرکاربردترین نسخه اون فایل.
+        """
+        mappings: Dict[str, Dict] = {}
+        jobs: List[Dict] = []
+        best_version: Dict[Tuple[str, str, str], Tuple[int, Optional[str], str]] = {}
+
+        for row in self.ranked():
+            for asset, url in row['assets'].items():
+                if Path(asset).suffix.lower() not in KIND_DIRS:
+                    continue
+
+                key = (row['host'], row['package'], asset)
+                if key not in best_version or best_version[key][0] < row['count']:
+                    best_version[key] = (row['count'], row['version'], url)
+
+        existing = {cdn_name for _, _, _, cdn_name in self.cdn_mappings}
+
+        for (host, package, asset), (count, version, url) in best_version.items():
+            ext = Path(asset).suffix.lower()
+            kind = KIND_DIRS[ext]
+            slug = re.sub(r"[^a-z0-9]+", '_', package.lower()).strip('_')
+            stem = Path(asset).name.split('.')[0].lower()
+
+            if stem.startswith(slug):
+                name = f"{slug}_{kind}"
+                dest = f"{kind}/auto_{Path(asset).name}"
+            else:
+                name = f"{slug}_{re.sub(r'[^a-z0-9]+', '_', stem)}_{kind}"
+                dest = f"{kind}/auto_{slug}_{Path(asset).name}"
+
+            while name in mappings or name in existing:
+                name += '_'
+
+            pattern = re.escape(url.split('://', 1)[-1])
+            if version:
+                # اولین نسخه در URL گرفته میشه (versioned_assets)، بقیه فقط آزاد
+                pattern = pattern.replace(re.escape(version), r"(?P<version>[\w\.\-]+)", 1)
+                pattern = pattern.replace(re.escape(version), r"[\w\.\-]+")
+
+            mappings[name] = {
+                'pattern': r"(?:https?:)?//" + pattern + r"[\"']?",
+                'asset': dest,
+                'enabled': False,
+                'description': f"{package} ({host}) - کشف شده در {count} مورد"
+            }
+
+            jobs.append({
+                'library': slug,
+                'version': version,
+                'url': url if '://' in url else 'https:' + url,
+                'dest': dest,
+                'kind': kind
+            })
+
+        return mappings, jobs
+
+    def report(self, output_file: Optional[str] = None) -> Dict:
+        """چاپ گزارش و ذخیره خروجی JSON"""
+        ranked = self.ranked()
+        mappings, jobs = self.suggest()
+
+        print()
+        print("=" * 80)
+        print("🔭 لینک‌های CDN پوشش داده نشده")
+        print("=" * 80)
+        print(f"📄 فایل‌های بررسی شده: {self.files_scanned}")
+        print(f"✅ لینک‌های پوشش داده شده با mapping فعلی: {self.covered}")
+        print(f"🔍 گروه‌های جدید: {len(ranked)}")
+        print()
+
+        for row in ranked[:30]:
+            version = row['version'] or '-'
+            print(f"   {row['count']:>5}  {row['host']:<30} {row['package']:<25} {version}")
+
+        result = {
+            'files_scanned': self.files_scanned,
+            'covered_links': self.covered,
+            'groups': ranked,
+            'suggested_mappings': mappings,
+            'download_jobs': jobs
+        }
+
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+
+            print()
+            print(f"💡 {len(mappings)} mapping پیشنهادی (غیرفعال) و {len(jobs)} کار دانلود: {output_file}")
+
+        print("=" * 80)
+
+        return result
+
+
+def main():
+    """تابع اصلی"""
+    print()
+    print("╔" + "═" * 78 + "╗")
+    print("║" + " " * 22 + "🔭 کشف لینک‌های CDN" + " " * 37 + "║")
+    print("╚" + "═" * 78 + "╝")
+
+    discovery = CDNDiscovery()
+
+    for proj_id, proj_data in discovery.config_manager.get_enabled_projects().items():
+        discovery.scan_project(proj_id, proj_data)
+
+    discovery.report('cdn_discovery.json')
+
+    print()
+    input("Press Enter to exit...")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,38 +3,119 @@
 دانلود در temp و کپی به static با پیشوند auto_
 """
 
+import io
+import os
+import gzip
 import json
+import tarfile
 import zipfile
-import io
+import hashlib
 import shutil
 from pathlib import Path
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from urllib.request import urlopen, Request
 from urllib.error import URLError, HTTPError
 
+from static_integrity import FINGERPRINT_EXTENSIONS, IntegrityManifest, copy_with_hash
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# مانیفست کتابخانه‌ها: library → نسخه پیش‌فرض و لیست فایل‌ها
+# افزودن کتابخانه جدید فقط با ویرایش این فایل انجام میشه
+MANIFEST_FILE = Path(__file__).with_name('libraries.json')
+
+# timeout دانلود (ثانیه)؛ آرشیوها بزرگ‌ترن. در مانیفست با "timeout" (کتابخانه یا فایل) عوض میشه
+DOWNLOAD_TIMEOUT = 30
+ARCHIVE_TIMEOUT = 60
+
+# فایل‌هایی که نسخه فشرده .gz / .br کنارشون ساخته میشه (woff2 و تصاویر خودشون فشرده‌ان)
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.ttf', '.eot', '.otf')
+
+# بسته آفلاین: tar.gz با مانیفست در اولین عضو و فایل‌ها زیر files/
+BUNDLE_MANIFEST = 'bundle.json'
+BUNDLE_VERSION = 1
+
+
+def load_manifest(manifest_file=MANIFEST_FILE) -> Dict:
+    """بارگذاری مانیفست کتابخانه‌ها"""
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def versioned_asset(library: str, version: str, asset: str) -> str:
+    """مسیر نصب یک نسخه مشخص: auto_bootstrap/4.6.2/css/auto_bootstrap.min.css"""
+    return f"auto_{library}/{version}/{asset}"
+
+
+def manifest_assets(manifest: Dict) -> Dict[str, str]:
+    """مسیر نصب هر فایل (یا پوشه، با / آخر) → نام کتابخانه"""
+    return {
+        entry['dest']: lib
+        for lib, data in manifest.items()
+        for entry in data['files']
+        if '{' not in entry['dest']
+    }
+
+
+def compress_asset(path: str) -> Tuple[str, int, int, int]:
+    """ساخت نسخه‌های .gz و .br یک فایل (در یک پروسس جدا اجرا میشه)
+
+    خروجی: (مسیر، اندازه اصلی، اندازه gzip، اندازه brotli یا 0)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    outputs = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        outputs.append(('.br', brotli.compress(data, quality=11)))
+
+    sizes = {}
+    for suffix, payload in outputs:
+        tmp_path = path + suffix + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path + suffix)
+        sizes[suffix] = len(payload)
+
+    return path, len(data), sizes['.gz'], sizes.get('.br', 0)
+
+
+class DownloadJob(NamedTuple):
+    """یک فایل نصبی: از کدوم URL (و کدوم عضو آرشیو) به کجای static"""
+    library: str
+    version: str
+    url: str
+    member: Optional[str]
+    dest: str
+    kind: str
+    optional: bool
+    versioned: bool = False     # نصب زیر auto_<lib>/<version>/ (نسخه پیدا شده در template ها)
+    timeout: int = DOWNLOAD_TIMEOUT
+
 
 class CDNDownloader:
     """دانلودر فایل‌های CDN"""
     
-    # نسخه‌های پیشنهادی
-    VERSIONS = {
-        'bootstrap': '5.3.2',
-        'jquery': '3.7.1',
-        'jquery_ui': '1.13.2',
-        'select2': '4.1.0-rc.0',
-        'datatables': '1.13.7',
-        'sweetalert2': '11.10.1',
-        'chartjs': '4.4.0',
-        'fontawesome': '6.5.1',
-        'popper': '2.11.8'
-    }
-    
-    def __init__(self, project_path: str):
+    def __init__(self, project_path: str, manifest: Optional[Dict] = None, jobs: int = 4,
+                 temp_dir: Optional[Path] = None, fingerprint: bool = False):
         self.project_path = Path(project_path)
+        self.manifest = manifest if manifest is not None else load_manifest()
+        self.jobs = jobs
         
-        # پوشه temp برای دانلود
-        self.temp_dir = self.project_path / 'cdn_temp'
-        self.temp_dir.mkdir(exist_ok=True)
+        # ساخت نسخه hash دار css/js (auto_bootstrap.<hash8>.min.css) کنار نام ثابت
+        self.fingerprint = fingerprint
+        
+        # نسخه‌های پیشنهادی
+        self.versions = {lib: data['default_version'] for lib, data in self.manifest.items()}
+        
+        # پوشه temp برای دانلود (می‌تونه بین چند پروژه مشترک باشه)
+        self.temp_dir = Path(temp_dir) if temp_dir else self.project_path / 'cdn_temp'
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
         
         # پوشه static برای کپی نهایی
         self.static_dir = self.project_path / 'static'
@@ -47,11 +128,14 @@ class CDNDownloader:
         self.js_dir.mkdir(parents=True, exist_ok=True)
         self.icons_dir.mkdir(parents=True, exist_ok=True)
         
+        # hash های SRI فایل‌های نصب شده (کنار پوشه static)
+        self.integrity = IntegrityManifest(self.static_dir)
+        
         print(f"📁 Temp: {self.temp_dir}")
         print(f"📦 Static: {self.static_dir}")
         print()
     
-    def download_file(self, url: str, save_path: Path) -> bool:
+    def download_file(self, url: str, save_path: Path, timeout: int = DOWNLOAD_TIMEOUT) -> bool:
         """دانلود یک فایل"""
         try:
             print(f"   📥 دانلود: {url}")
@@ -63,13 +147,16 @@ class CDNDownloader:
             req = Request(url, headers=headers)
             
             # دانلود
-            with urlopen(req, timeout=30) as response:
+            with urlopen(req, timeout=timeout) as response:
                 content = response.read()
             
-            # ذخیره
+            # ذخیره اتمیک: فایل نیمه‌کاره (قطع شدن دانلود) هیچ‌وقت با نام نهایی نمی‌مونه،
+            # چون fetch_artifacts هر فایل موجود در temp رو سالم حساب می‌کنه
             save_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(save_path, 'wb') as f:
+            part_path = save_path.with_name(save_path.name + '.part')
+            with open(part_path, 'wb') as f:
                 f.write(content)
+            os.replace(part_path, save_path)
             
             size_kb = len(content) / 1024
             print(f"   ✅ دانلود: {save_path.name} ({size_kb:.1f} KB)")
@@ -85,7 +172,7 @@ class CDNDownloader:
             print(f"   ❌ خطا: {e}")
             return False
     
-    def copy_to_static(self, src_path: Path, dest_path: Path) -> bool:
+    def copy_to_static(self, src_path: Path, dest_path: Path, library: Optional[str] = None) -> bool:
         """کپی فایل از temp به static"""
         try:
             if not src_path.exists():
@@ -96,8 +183,9 @@ class CDNDownloader:
             if dest_path.exists():
                 dest_path.unlink()
             
-            # کپی
-            shutil.copy2(src_path, dest_path)
+            # کپی (hash همزمان با نوشتن محاسبه میشه)
+            with open(src_path, 'rb') as src:
+                self.write_file(src, dest_path, library)
             print(f"   📋 کپی: {dest_path.name}")
             return True
             
@@ -105,296 +193,373 @@ class CDNDownloader:
             print(f"   ❌ خطا در کپی: {e}")
             return False
     
-    def extract_zip(self, zip_content: bytes, extract_to: Path) -> bool:
-        """استخراج فایل ZIP"""
-        try:
-            with zipfile.ZipFile(io.BytesIO(zip_content)) as zip_file:
-                zip_file.extractall(extract_to)
-            return True
-        except Exception as e:
-            print(f"   ❌ خطا در استخراج: {e}")
-            return False
+    def write_file(self, src, dest_path: Path, library: Optional[str] = None, *extra) -> str:
+        """نوشتن جریانی یک فایل و ثبت hash SRI آن در مانیفست"""
+        integrity = copy_with_hash(src, dest_path, *extra)
+        self.track(dest_path, integrity, library)
+        return integrity
     
-    def download_bootstrap(self, version: Optional[str] = None) -> bool:
-        """دانلود Bootstrap"""
-        version = version or self.VERSIONS['bootstrap']
+    def track(self, dest_path: Path, integrity: str, library: Optional[str] = None):
+        """ثبت hash فایل نصب شده و ساخت نسخه hash دار در صورت نیاز"""
+        self.integrity.record(dest_path, integrity, library)
         
-        print(f"\n🎨 Bootstrap {version}")
-        print("-" * 60)
+        if self.fingerprint and dest_path.suffix in FINGERPRINT_EXTENSIONS:
+            self.integrity.fingerprint(dest_path)
+    
+    def plan(self, libraries: Optional[List[str]] = None,
+             versions: Optional[Dict[str, str]] = None) -> List[DownloadJob]:
+        """ساخت لیست کامل کارها از روی مانیفست (قبل از هر دانلودی)"""
+        versions = versions or {}
+        jobs = []
         
-        url = f'https://github.com/twbs/bootstrap/releases/download/v{version}/bootstrap-{version}-dist.zip'
+        for lib in libraries or list(self.manifest):
+            if lib in self.manifest:
+                jobs.extend(self.library_jobs(lib, versions.get(lib) or self.versions[lib]))
         
-        try:
-            # دانلود در temp
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            req = Request(url, headers=headers)
-            
-            print(f"   📥 دانلود ZIP...")
-            with urlopen(req, timeout=60) as response:
-                zip_content = response.read()
-            
-            size_mb = len(zip_content) / (1024 * 1024)
-            print(f"   ✅ دانلود شد ({size_mb:.1f} MB)")
+        return jobs
+    
+    def plan_versions(self, found: Dict[str, List[Optional[str]]],
+                      libraries: Optional[List[str]] = None) -> List[DownloadJob]:
+        """کارهای دقیقا همون نسخه‌هایی که اسکن پیدا کرده (replace_cdn.scan_fleet_versions)
+        
+        هر نسخه در پوشه جدای خودش نصب میشه؛ None یعنی لینک بدون نسخه که
+        نسخه پیش‌فرض با مسیر معمولی براش نصب میشه.
+        """
+        jobs = []
+        
+        for lib, versions in found.items():
+            if lib not in self.manifest or (libraries and lib not in libraries):
+                continue
             
-            # استخراج در temp
-            temp_extract = self.temp_dir / 'bootstrap'
-            temp_extract.mkdir(exist_ok=True)
+            for version in versions:
+                if version is None:
+                    jobs.extend(self.library_jobs(lib, self.versions[lib]))
+                else:
+                    jobs.extend(self.library_jobs(lib, version, versioned=True))
+        
+        return jobs
+    
+    def library_jobs(self, lib: str, version: str, versioned: bool = False) -> List[DownloadJob]:
+        """کارهای یک نسخه از یک کتابخانه"""
+        data = self.manifest[lib]
+        files = data.get('versions', {}).get(version, data['files'])
+        jobs = []
+        
+        for entry in files:
+            member = entry.get('member')
+            dest = entry['dest'].format(version=version)
+            timeout = entry.get('timeout', data.get('timeout', ARCHIVE_TIMEOUT if member else DOWNLOAD_TIMEOUT))
             
-            print(f"   📦 استخراج...")
-            if self.extract_zip(zip_content, temp_extract):
-                extracted_dir = temp_extract / f'bootstrap-{version}-dist'
-                
-                # کپی به static با پیشوند auto_
-                print(f"   📋 کپی به static...")
-                
-                # CSS
-                css_src = extracted_dir / 'css' / 'bootstrap.min.css'
-                if css_src.exists():
-                    self.copy_to_static(css_src, self.css_dir / 'auto_bootstrap.min.css')
-                
-                # CSS Map (اختیاری)
-                css_map_src = extracted_dir / 'css' / 'bootstrap.min.css.map'
-                if css_map_src.exists():
-                    self.copy_to_static(css_map_src, self.css_dir / 'auto_bootstrap.min.css.map')
-                
-                # JS Bundle (با Popper)
-                js_bundle_src = extracted_dir / 'js' / 'bootstrap.bundle.min.js'
-                if js_bundle_src.exists():
-                    self.copy_to_static(js_bundle_src, self.js_dir / 'auto_bootstrap.bundle.min.js')
-                
-                # JS Bundle Map
-                js_bundle_map_src = extracted_dir / 'js' / 'bootstrap.bundle.min.js.map'
-                if js_bundle_map_src.exists():
-                    self.copy_to_static(js_bundle_map_src, self.js_dir / 'auto_bootstrap.bundle.min.js.map')
+            jobs.append(DownloadJob(
+                library=lib,
+                version=version,
+                url=entry['url'].format(version=version),
+                member=member.format(version=version) if member else None,
+                dest=versioned_asset(lib, version, dest) if versioned else dest,
+                kind=entry.get('kind', 'file'),
+                optional=entry.get('optional', False),
+                versioned=versioned,
+                timeout=timeout
+            ))
+        
+        return jobs
+    
+    def artifact_path(self, url: str) -> Path:
+        """مسیر فایل دانلود شده در temp (هر URL فقط یک بار)"""
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+        return self.temp_dir / f"{digest}_{url.rsplit('/', 1)[-1]}"
+    
+    def fetch_artifacts(self, jobs: List[DownloadJob]) -> Dict[str, Optional[Path]]:
+        """دانلود موازی URL های یکتا"""
+        urls = list(dict.fromkeys(job.url for job in jobs))
+        
+        # چند کار از یک آرشیو: بیشترین timeout
+        timeouts = {}
+        for job in jobs:
+            timeouts[job.url] = max(timeouts.get(job.url, 0), job.timeout)
+        
+        def fetch(url: str) -> Optional[Path]:
+            path = self.artifact_path(url)
+            if path.exists() or self.download_file(url, path, timeouts[url]):
+                return path
+            return None
+        
+        with ThreadPoolExecutor(max_workers=max(1, self.jobs)) as executor:
+            return dict(zip(urls, executor.map(fetch, urls)))
+    
+    def install(self, job: DownloadJob, artifact: Path, root: Optional[Path] = None) -> bool:
+        """نصب یک کار از فایل دانلود شده به static (یا پوشه root)"""
+        dest_path = (root or self.static_dir) / job.dest
+        
+        if job.member is None:
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            return self.copy_to_static(artifact, dest_path, job.library)
+        
+        try:
+            with zipfile.ZipFile(artifact) as archive:
+                if job.kind == 'dir':
+                    return self.extract_dir(archive, job.member, dest_path, job.library)
                 
-                # JS (بدون Popper)
-                js_src = extracted_dir / 'js' / 'bootstrap.min.js'
-                if js_src.exists():
-                    self.copy_to_static(js_src, self.js_dir / 'auto_bootstrap.min.js')
+                try:
+                    info = archive.getinfo(job.member)
+                except KeyError:
+                    if not job.optional:
+                        print(f"   ⚠️ فایل منبع یافت نشد: {job.member}")
+                    return False
                 
-                # پاک کردن temp
-                shutil.rmtree(temp_extract)
+                dest_path.parent.mkdir(parents=True, exist_ok=True)
+                with archive.open(info) as src:
+                    self.write_file(src, dest_path, job.library)
                 
+                print(f"   📋 کپی: {dest_path.name}")
                 return True
         
         except Exception as e:
-            print(f"   ❌ خطا: {e}")
+            print(f"   ❌ خطا در استخراج: {e}")
             return False
     
-    def download_jquery(self, version: Optional[str] = None) -> bool:
-        """دانلود jQuery"""
-        version = version or self.VERSIONS['jquery']
-        
-        print(f"\n💎 jQuery {version}")
-        print("-" * 60)
-        
-        url = f'https://code.jquery.com/jquery-{version}.min.js'
-        
-        # دانلود در temp
-        temp_file = self.temp_dir / f'jquery-{version}.min.js'
-        
-        if self.download_file(url, temp_file):
-            # کپی به static
-            return self.copy_to_static(temp_file, self.js_dir / 'auto_jquery.min.js')
-        
-        return False
-    
-    def download_select2(self, version: Optional[str] = None) -> bool:
-        """دانلود Select2"""
-        version = version or self.VERSIONS['select2']
-        
-        print(f"\n🔽 Select2 {version}")
-        print("-" * 60)
+    def extract_dir(self, archive: zipfile.ZipFile, prefix: str, dest_dir: Path,
+                    library: Optional[str] = None) -> bool:
+        """استخراج یک پوشه از آرشیو (جایگزین کامل پوشه مقصد)"""
+        members = [m for m in archive.infolist() if m.filename.startswith(prefix) and not m.is_dir()]
         
-        # JS
-        js_url = f'https://cdn.jsdelivr.net/npm/select2@{version}/dist/js/select2.min.js'
-        temp_js = self.temp_dir / f'select2-{version}.min.js'
-        
-        js_ok = False
-        if self.download_file(js_url, temp_js):
-            js_ok = self.copy_to_static(temp_js, self.js_dir / 'auto_select2.min.js')
-        
-        # CSS
-        css_url = f'https://cdn.jsdelivr.net/npm/select2@{version}/dist/css/select2.min.css'
-        temp_css = self.temp_dir / f'select2-{version}.min.css'
-        
-        css_ok = False
-        if self.download_file(css_url, temp_css):
-            css_ok = self.copy_to_static(temp_css, self.css_dir / 'auto_select2.min.css')
-        
-        return js_ok and css_ok
-    
-    def download_datatables(self, version: Optional[str] = None) -> bool:
-        """دانلود DataTables"""
-        version = version or self.VERSIONS['datatables']
-        
-        print(f"\n📊 DataTables {version}")
-        print("-" * 60)
-        
-        # JS
-        js_url = f'https://cdn.datatables.net/{version}/js/jquery.dataTables.min.js'
-        temp_js = self.temp_dir / f'datatables-{version}.min.js'
-        
-        js_ok = False
-        if self.download_file(js_url, temp_js):
-            js_ok = self.copy_to_static(temp_js, self.js_dir / 'auto_datatables.min.js')
+        if not members:
+            print(f"   ⚠️ پوشه منبع یافت نشد: {prefix}")
+            return False
         
-        # CSS
-        css_url = f'https://cdn.datatables.net/{version}/css/jquery.dataTables.min.css'
-        temp_css = self.temp_dir / f'datatables-{version}.min.css'
+        if dest_dir.exists():
+            # نسخه‌های hash دار (و .gz/.br شون) می‌مونن چون template ها ممکنه هنوز بهشون
+            # ارجاع بدن؛ refresh_fingerprints بعد از نصب ارجاع‌ها رو می‌بره و قدیمی‌ها رو پاک می‌کنه
+            for path in [p for p in dest_dir.rglob('*') if p.is_file()]:
+                name = self.integrity.relative(path)
+                if name is None or not self.integrity.is_fingerprint_file(name):
+                    path.unlink()
+            self.integrity.forget_tree(dest_dir)
+        
+        for member in members:
+            target = dest_dir / member.filename[len(prefix):]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with archive.open(member) as src:
+                self.write_file(src, target, library)
+        
+        print(f"   ✅ {dest_dir.name} ({len(members)} files)")
+        return True
+    
+    def run_jobs(self, jobs: List[DownloadJob],
+                 artifacts: Optional[Dict[str, Optional[Path]]] = None,
+                 root: Optional[Path] = None) -> Dict[str, bool]:
+        """اجرای یک برنامه: دانلود یکتا و موازی، بعد نصب؛ نتیجه برای هر کتابخانه"""
+        if artifacts is None:
+            artifacts = self.fetch_artifacts(jobs)
+        results: Dict[str, bool] = {}
+        
+        current = None
+        for job in jobs:
+            # نسخه‌های جدا نصب شده نتیجه جدا دارن (bootstrap@4.6.2)
+            key = f"{job.library}@{job.version}" if job.versioned else job.library
+            
+            if key != current:
+                current = key
+                data = self.manifest.get(job.library, {})
+                print(f"\n{data.get('icon', '📦')} {data.get('title', job.library)} {job.version}")
+                print("-" * 60)
+                results.setdefault(key, True)
+            
+            artifact = artifacts.get(job.url)
+            ok = artifact is not None and self.install(job, artifact, root)
+            
+            if not ok and not job.optional:
+                results[key] = False
         
-        css_ok = False
-        if self.download_file(css_url, temp_css):
-            css_ok = self.copy_to_static(temp_css, self.css_dir / 'auto_datatables.min.css')
+        if root is None:
+            self.integrity.save()
         
-        return js_ok and css_ok
+        return results
     
-    def download_sweetalert2(self, version: Optional[str] = None) -> bool:
-        """دانلود SweetAlert2"""
-        version = version or self.VERSIONS['sweetalert2']
-        
-        print(f"\n🍭 SweetAlert2 {version}")
-        print("-" * 60)
+    def export_bundle(self, bundle_file: str, libraries: Optional[List[str]] = None) -> Dict[str, bool]:
+        """ساخت بسته آفلاین (tar.gz) از کتابخانه‌ها به همراه مانیفست و sha256 هر فایل"""
+        if libraries is None:
+            libraries = list(self.manifest)
         
-        # JS
-        js_url = f'https://cdn.jsdelivr.net/npm/sweetalert2@{version}/dist/sweetalert2.all.min.js'
-        temp_js = self.temp_dir / f'sweetalert2-{version}.min.js'
+        print()
+        print("=" * 70)
+        print("📦 ساخت بسته آفلاین")
+        print("=" * 70)
         
-        js_ok = False
-        if self.download_file(js_url, temp_js):
-            js_ok = self.copy_to_static(temp_js, self.js_dir / 'auto_sweetalert2.min.js')
+        jobs = self.plan(libraries)
+        staging = self.temp_dir / 'bundle'
+        results = self.run_jobs(jobs, root=staging)
+        
+        files = {}
+        for path in sorted(p for p in staging.rglob('*') if p.is_file()):
+            dest = path.relative_to(staging).as_posix()
+            library = next((job.library for job in jobs
+                            if dest == job.dest or dest.startswith(job.dest + '/')), None)
+            files[dest] = {
+                'library': library,
+                'size': path.stat().st_size,
+                'sha256': hashlib.sha256(path.read_bytes()).hexdigest()
+            }
         
-        # CSS
-        css_url = f'https://cdn.jsdelivr.net/npm/sweetalert2@{version}/dist/sweetalert2.min.css'
-        temp_css = self.temp_dir / f'sweetalert2-{version}.min.css'
+        manifest = {
+            'version': BUNDLE_VERSION,
+            'libraries': {job.library: job.version for job in jobs if results.get(job.library)},
+            'files': files
+        }
         
-        css_ok = False
-        if self.download_file(css_url, temp_css):
-            css_ok = self.copy_to_static(temp_css, self.css_dir / 'auto_sweetalert2.min.css')
+        bundle_path = Path(bundle_file)
+        bundle_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = bundle_path.with_name(bundle_path.name + '.tmp')
         
-        return js_ok and css_ok
-    
-    def download_chartjs(self, version: Optional[str] = None) -> bool:
-        """دانلود Chart.js"""
-        version = version or self.VERSIONS['chartjs']
-        
-        print(f"\n📈 Chart.js {version}")
-        print("-" * 60)
+        # مانیفست اولین عضو بسته است تا import بتونه جریانی بخونه
+        with tarfile.open(tmp_path, 'w:gz') as tar:
+            data = json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8')
+            info = tarfile.TarInfo(BUNDLE_MANIFEST)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+            
+            for dest in files:
+                tar.add(staging / dest, arcname=f"files/{dest}", recursive=False)
         
-        url = f'https://cdn.jsdelivr.net/npm/chart.js@{version}/dist/chart.umd.min.js'
-        temp_file = self.temp_dir / f'chart-{version}.min.js'
+        os.replace(tmp_path, bundle_path)
+        self.cleanup_temp()
         
-        if self.download_file(url, temp_file):
-            return self.copy_to_static(temp_file, self.js_dir / 'auto_chart.min.js')
+        size_mb = bundle_path.stat().st_size / (1024 * 1024)
+        print(f"\n✅ بسته: {bundle_path} ({len(files)} فایل، {size_mb:.1f} MB)")
         
-        return False
+        return results
     
-    def download_fontawesome(self, version: Optional[str] = None) -> bool:
-        """دانلود Font Awesome"""
-        version = version or self.VERSIONS['fontawesome']
-        
-        print(f"\n🎨 Font Awesome {version}")
-        print("-" * 60)
-        
-        url = f'https://use.fontawesome.com/releases/v{version}/fontawesome-free-{version}-web.zip'
+    def import_bundle(self, bundle_file: str) -> Dict[str, bool]:
+        """نصب از بسته آفلاین به static (بدون شبکه، با خواندن جریانی)"""
+        print()
+        print("=" * 70)
+        print(f"📦 نصب از بسته: {bundle_file}")
+        print("=" * 70)
         
-        try:
-            # دانلود
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            req = Request(url, headers=headers)
-            
-            print(f"   📥 دانلود ZIP (ممکنه کمی طول بکشه)...")
-            
-            with urlopen(req, timeout=90) as response:
-                zip_content = response.read()
-            
-            size_mb = len(zip_content) / (1024 * 1024)
-            print(f"   ✅ دانلود شد ({size_mb:.1f} MB)")
-            
-            # استخراج در temp
-            temp_extract = self.temp_dir / 'fontawesome'
-            temp_extract.mkdir(exist_ok=True)
-            
-            print(f"   📦 استخراج...")
-            if self.extract_zip(zip_content, temp_extract):
-                extracted_dir = temp_extract / f'fontawesome-free-{version}-web'
+        manifest = None
+        results: Dict[str, bool] = {}
+        installed = 0
+        
+        with tarfile.open(bundle_file, 'r|gz') as tar:
+            for member in tar:
+                if member.name == BUNDLE_MANIFEST:
+                    manifest = json.load(tar.extractfile(member))
+                    if manifest.get('version') != BUNDLE_VERSION:
+                        raise ValueError(f"نسخه بسته پشتیبانی نمیشه: {manifest.get('version')}")
+                    results = {lib: True for lib in manifest['libraries']}
+                    continue
                 
-                # کپی به static
-                print(f"   📋 کپی به static...")
+                if manifest is None:
+                    raise ValueError("مانیفست بسته یافت نشد")
                 
-                fa_dir = self.icons_dir / 'fontawesome'
-                fa_dir.mkdir(exist_ok=True)
+                if not member.isfile() or not member.name.startswith('files/'):
+                    continue
                 
-                # CSS
-                css_src = extracted_dir / 'css'
-                if css_src.exists():
-                    css_dest = fa_dir / 'css'
-                    if css_dest.exists():
-                        shutil.rmtree(css_dest)
-                    shutil.copytree(css_src, css_dest)
-                    print(f"   ✅ CSS files ({len(list(css_dest.glob('*')))} files)")
+                dest = member.name[len('files/'):]
+                entry = manifest['files'].get(dest)
+                target = (self.static_dir / dest).resolve()
                 
-                # Webfonts
-                fonts_src = extracted_dir / 'webfonts'
-                if fonts_src.exists():
-                    fonts_dest = fa_dir / 'webfonts'
-                    if fonts_dest.exists():
-                        shutil.rmtree(fonts_dest)
-                    shutil.copytree(fonts_src, fonts_dest)
-                    print(f"   ✅ Webfonts ({len(list(fonts_dest.glob('*')))} files)")
+                # جلوگیری از نوشتن بیرون static
+                if entry is None or self.static_dir.resolve() not in target.parents:
+                    print(f"   ⚠️ فایل ناشناخته رد شد: {dest}")
+                    continue
                 
-                # پاک کردن temp
-                shutil.rmtree(temp_extract)
-                
-                return True
+                if self.install_stream(tar.extractfile(member), target, entry['sha256'], entry.get('library')):
+                    installed += 1
+                else:
+                    print(f"   ❌ checksum نامعتبر: {dest}")
+                    if entry.get('library') in results:
+                        results[entry['library']] = False
         
-        except Exception as e:
-            print(f"   ❌ خطا: {e}")
-            return False
-    
-    def download_jquery_ui(self, version: Optional[str] = None) -> bool:
-        """دانلود jQuery UI"""
-        version = version or self.VERSIONS['jquery_ui']
+        if manifest is None:
+            raise ValueError("مانیفست بسته یافت نشد")
         
-        print(f"\n🎨 jQuery UI {version}")
-        print("-" * 60)
+        self.integrity.save()
+        self.precompress()
         
-        # JS
-        js_url = f'https://code.jquery.com/ui/{version}/jquery-ui.min.js'
-        temp_js = self.temp_dir / f'jquery-ui-{version}.min.js'
+        print(f"\n✅ {installed}/{len(manifest['files'])} فایل نصب شد")
+        for lib, version in manifest['libraries'].items():
+            icon = "✅" if results.get(lib) else "❌"
+            print(f"   {icon} {lib} {version}")
         
-        js_ok = False
-        if self.download_file(js_url, temp_js):
-            js_ok = self.copy_to_static(temp_js, self.js_dir / 'auto_jquery-ui.min.js')
+        return results
+    
+    def install_stream(self, src, target: Path, sha256: str, library: Optional[str] = None) -> bool:
+        """کپی جریانی به فایل موقت با محاسبه hash؛ فقط در صورت تطابق جایگزین میشه"""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + '.tmp')
+        digest = hashlib.sha256()
         
-        # CSS
-        css_url = f'https://code.jquery.com/ui/{version}/themes/base/jquery-ui.min.css'
-        temp_css = self.temp_dir / f'jquery-ui-{version}.min.css'
+        integrity = copy_with_hash(src, tmp_path, digest)
         
-        css_ok = False
-        if self.download_file(css_url, temp_css):
-            css_ok = self.copy_to_static(temp_css, self.css_dir / 'auto_jquery-ui.min.css')
+        if digest.hexdigest() != sha256:
+            tmp_path.unlink()
+            return False
         
-        return js_ok and css_ok
+        os.replace(tmp_path, target)
+        self.track(target, integrity, library)
+        return True
     
-    def download_popper(self, version: Optional[str] = None) -> bool:
-        """دانلود Popper.js"""
-        version = version or self.VERSIONS['popper']
+    def precompress(self, workers: Optional[int] = None) -> Dict:
+        """ساخت .gz (و .br اگه brotli نصب باشه) برای فایل‌های نصب شده، موازی روی همه هسته‌ها
+
+        فایل‌هایی که hash شون از آخرین فشرده‌سازی تغییر نکرده رد میشن.
+        """
+        todo = []
+        skipped = 0
+        
+        for name, entry in self.integrity.files.items():
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            
+            suffixes = ('.gz', '.br') if brotli is not None else ('.gz',)
+            outputs = [name + suffix for suffix in suffixes]
+            if entry.get('fingerprint'):
+                outputs += [entry['fingerprint'] + suffix for suffix in suffixes]
+            
+            if (entry.get('compressed') == entry['integrity']
+                    and all((self.static_dir / output).exists() for output in outputs)):
+                skipped += 1
+                continue
+            
+            todo.append(name)
+        
+        stats = {'files': 0, 'skipped': skipped, 'original': 0, 'gzip': 0, 'brotli': 0}
+        
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+                paths = [str(self.static_dir / name) for name in todo]
+                for name, (_, original, gz_size, br_size) in zip(todo, executor.map(compress_asset, paths)):
+                    entry = self.integrity.files[name]
+                    entry['compressed'] = entry['integrity']
+                    
+                    # نسخه hash دار همون محتوا رو داره؛ فایل فشرده فقط کپی میشه
+                    if entry.get('fingerprint'):
+                        for suffix in ('.gz', '.br'):
+                            compressed = self.static_dir / (name + suffix)
+                            if compressed.exists():
+                                shutil.copyfile(compressed, self.static_dir / (entry['fingerprint'] + suffix))
+                    
+                    stats['files'] += 1
+                    stats['original'] += original
+                    stats['gzip'] += gz_size
+                    stats['brotli'] += br_size
+            
+            self.integrity.save()
         
-        print(f"\n🎈 Popper.js {version}")
-        print("-" * 60)
+        print(f"\n🗜️ پیش‌فشرده‌سازی: {stats['files']} فایل (بدون تغییر: {skipped})")
         
-        url = f'https://cdn.jsdelivr.net/npm/@popperjs/core@{version}/dist/umd/popper.min.js'
-        temp_file = self.temp_dir / f'popper-{version}.min.js'
+        if stats['original']:
+            print(f"   gzip: {stats['original'] / 1024:.0f} KB → {stats['gzip'] / 1024:.0f} KB "
+                  f"({stats['gzip'] / stats['original']:.0%})")
+            if brotli is not None:
+                print(f"   brotli: {stats['original'] / 1024:.0f} KB → {stats['brotli'] / 1024:.0f} KB "
+                      f"({stats['brotli'] / stats['original']:.0%})")
         
-        if self.download_file(url, temp_file):
-            return self.copy_to_static(temp_file, self.js_dir / 'auto_popper.min.js')
+        if brotli is None:
+            print("   💡 برای ساخت .br پکیج brotli رو نصب کن")
         
-        return False
+        return stats
     
     def cleanup_temp(self):
         """پاک کردن پوشه temp"""
@@ -405,23 +570,10 @@ class CDNDownloader:
         except Exception as e:
             print(f"\n⚠️ خطا در پاک‌سازی temp: {e}")
     
-    def download_all(self, libraries: Optional[List[str]] = None):
+    def download_all(self, libraries: Optional[List[str]] = None) -> Dict[str, bool]:
         """دانلود همه کتابخانه‌ها"""
-        
-        available = {
-            'bootstrap': self.download_bootstrap,
-            'jquery': self.download_jquery,
-            'select2': self.download_select2,
-            'datatables': self.download_datatables,
-            'sweetalert2': self.download_sweetalert2,
-            'chartjs': self.download_chartjs,
-            'fontawesome': self.download_fontawesome,
-            'jquery_ui': self.download_jquery_ui,
-            'popper': self.download_popper
-        }
-        
         if libraries is None:
-            libraries = list(available.keys())
+            libraries = list(self.manifest)
         
         print()
         print("=" * 70)
@@ -429,19 +581,24 @@ class CDNDownloader:
         print("=" * 70)
         print(f"📁 پروژه: {self.project_path}")
         
+        jobs = self.plan(libraries)
+        print(f"🗺️ {len(jobs)} فایل از {len({job.url for job in jobs})} دانلود یکتا")
+        
         results = {}
         
         for lib in libraries:
-            if lib in available:
-                try:
-                    results[lib] = available[lib]()
-                except Exception as e:
-                    print(f"\n❌ خطای غیرمنتظره در {lib}: {e}")
-                    results[lib] = False
-            else:
+            if lib not in self.manifest:
                 print(f"\n⚠️ {lib} پشتیبانی نمیشه")
                 results[lib] = False
         
+        try:
+            results.update(self.run_jobs(jobs))
+            self.precompress()
+        except Exception as e:
+            print(f"\n❌ خطای غیرمنتظره: {e}")
+            for job in jobs:
+                results[job.library] = False
+        
         # پاک کردن temp
         self.cleanup_temp()
         
@@ -463,6 +620,120 @@ class CDNDownloader:
         
         print()
         print("=" * 70)
+        
+        return results
+
+
+class FleetDownloader:
+    """دانلود برای چند پروژه با هم: هر URL فقط یک بار، بعد نصب در static همه پروژه‌ها"""
+    
+    def __init__(self, projects: Dict[str, Dict], libraries: Optional[List[str]] = None,
+                 manifest: Optional[Dict] = None, jobs: int = 4, temp_dir: str = 'cdn_temp',
+                 fingerprint: bool = False, versions: Optional[Dict[str, Dict[str, List]]] = None):
+        self.manifest = manifest if manifest is not None else load_manifest()
+        self.temp_dir = Path(temp_dir)
+        self.jobs = jobs
+        
+        # پروژه → کتابخانه → نسخه‌های ارجاع شده (versioned_assets)؛ None = نسخه پیش‌فرض همه
+        self.versions = versions
+        
+        # هر پروژه می‌تونه لیست کتابخانه‌های خودش رو در کانفیگ داشته باشه
+        self.selections = {
+            proj_id: proj_data.get('libraries') or libraries or list(self.manifest)
+            for proj_id, proj_data in projects.items()
+        }
+        
+        self.downloaders = {
+            proj_id: CDNDownloader(proj_data['path'], self.manifest, jobs, self.temp_dir, fingerprint)
+            for proj_id, proj_data in projects.items()
+        }
+    
+    def plan(self) -> Tuple[Dict[str, List[DownloadJob]], Dict[str, int]]:
+        """کارهای هر پروژه و تعداد پروژه‌هایی که به هر URL نیاز دارن"""
+        project_jobs = {}
+        references: Dict[str, int] = {}
+        
+        for proj_id, downloader in self.downloaders.items():
+            if self.versions is None:
+                jobs = downloader.plan(self.selections[proj_id])
+            else:
+                jobs = downloader.plan_versions(self.versions.get(proj_id, {}), self.selections[proj_id])
+            project_jobs[proj_id] = jobs
+            
+            for url in {job.url for job in jobs}:
+                references[url] = references.get(url, 0) + 1
+        
+        return project_jobs, references
+    
+    def download_all(self) -> Dict[str, Dict[str, bool]]:
+        """دانلود یکتا و موازی، بعد نصب برای همه پروژه‌ها"""
+        project_jobs, references = self.plan()
+        
+        print()
+        print("=" * 70)
+        print("📥 دانلود مشترک برای چند پروژه")
+        print("=" * 70)
+        print(f"📁 پروژه‌ها: {len(self.downloaders)}")
+        print(f"🗺️ {sum(references.values())} دانلود لازم، {len(references)} دانلود یکتا")
+        
+        if not self.downloaders:
+            return {}
+        
+        # temp بین همه مشترکه پس هر downloader می‌تونه دانلود کل ناوگان رو انجام بده
+        fetcher = next(iter(self.downloaders.values()))
+        artifacts = fetcher.fetch_artifacts([job for jobs in project_jobs.values() for job in jobs])
+        
+        # حجم دانلود شده و حجمی که با اشتراک دانلود نشد
+        downloaded = saved = 0
+        for url, count in references.items():
+            artifact = artifacts.get(url)
+            if artifact is not None and artifact.exists():
+                size = artifact.stat().st_size
+                downloaded += size
+                saved += size * (count - 1)
+        
+        results = {}
+        
+        for proj_id, downloader in self.downloaders.items():
+            print(f"\n📁 {proj_id}: {downloader.static_dir}")
+            try:
+                results[proj_id] = downloader.run_jobs(project_jobs[proj_id], artifacts)
+                downloader.precompress()
+            except Exception as e:
+                print(f"\n❌ خطای غیرمنتظره: {e}")
+                results[proj_id] = {lib: False for lib in self.selections[proj_id]}
+            
+            for lib in self.selections[proj_id]:
+                if lib not in self.manifest:
+                    results[proj_id][lib] = False
+        
+        # پاک کردن temp مشترک
+        fetcher.cleanup_temp()
+        
+        self.stats = {
+            'projects': len(self.downloaders),
+            'artifacts': len(references),
+            'references': sum(references.values()),
+            'bytes_downloaded': downloaded,
+            'bytes_saved': saved
+        }
+        
+        print()
+        print("=" * 70)
+        print("📊 خلاصه:")
+        print("=" * 70)
+        print(f"📦 دانلود شده: {downloaded / (1024 * 1024):.2f} MB")
+        print(f"💾 صرفه‌جویی در شبکه: {saved / (1024 * 1024):.2f} MB")
+        print()
+        
+        for proj_id, libs in results.items():
+            icon = "✅" if all(libs.values()) else "❌"
+            print(f"   {icon} {proj_id}: {sum(1 for v in libs.values() if v)}/{len(libs)}")
+        
+        print()
+        print("=" * 70)
+        
+        return results
 
 
 def main():
@@ -509,51 +780,37 @@ def main():
         print(f"{i}. {proj_data['name']}")
         print(f"   📁 {proj_data['path']}")
     
+    print("0. همه پروژه‌ها (هر فایل فقط یک بار دانلود میشه)")
     print()
     
     try:
         choice = int(input("انتخاب پروژه: ").strip())
         
-        if choice < 1 or choice > len(project_list):
+        if choice < 0 or choice > len(project_list):
             print("❌ انتخاب نامعتبر!")
             return
         
-        proj_id, proj_data = project_list[choice - 1]
+        if choice:
+            proj_id, proj_data = project_list[choice - 1]
         
     except ValueError:
         print("❌ ورودی نامعتبر!")
         return
     
     # انتخاب کتابخانه‌ها
+    manifest = load_manifest()
+    lib_map = {str(i): lib for i, lib in enumerate(manifest, 1)}
+    
     print()
     print("📦 کتابخانه‌ها:")
     print("-" * 70)
-    print("1. Bootstrap")
-    print("2. jQuery")
-    print("3. Select2")
-    print("4. DataTables")
-    print("5. SweetAlert2")
-    print("6. Chart.js")
-    print("7. Font Awesome")
-    print("8. jQuery UI")
-    print("9. Popper.js")
+    for key, lib in lib_map.items():
+        print(f"{key}. {manifest[lib].get('title', lib)}")
     print("0. همه")
     print()
     
     selection = input("انتخاب (مثال: 1,2,3 یا 0 برای همه): ").strip()
     
-    lib_map = {
-        '1': 'bootstrap',
-        '2': 'jquery',
-        '3': 'select2',
-        '4': 'datatables',
-        '5': 'sweetalert2',
-        '6': 'chartjs',
-        '7': 'fontawesome',
-        '8': 'jquery_ui',
-        '9': 'popper'
-    }
-    
     if selection == '0':
         selected_libs = None  # همه
     else:
@@ -564,8 +821,32 @@ def main():
             return
     
     # دانلود
-    downloader = CDNDownloader(proj_data['path'])
-    downloader.download_all(selected_libs)
+    settings = config.get('replacement_settings', {})
+    fingerprint = settings.get('fingerprint_assets', False)
+    projects = enabled_projects if choice == 0 else {proj_id: proj_data}
+    
+    # با versioned_assets فقط نسخه‌هایی که در template ها پیدا شدن، هر کدوم در پوشه خودش
+    versions = None
+    if settings.get('versioned_assets', False):
+        from replace_cdn import ConfigManager, scan_fleet_versions
+        
+        print("🔍 پیدا کردن نسخه‌های ارجاع شده...")
+        versions = scan_fleet_versions(projects, ConfigManager().get_cdn_mappings(), settings)
+        for scanned_id, libs in versions.items():
+            for lib, lib_versions in libs.items():
+                print(f"   📌 {scanned_id}: {lib} {', '.join(v or 'پیش‌فرض' for v in lib_versions)}")
+    
+    if choice == 0 or versions is not None:
+        FleetDownloader(projects, selected_libs, manifest, fingerprint=fingerprint,
+                        versions=versions).download_all()
+    else:
+        downloader = CDNDownloader(proj_data['path'], manifest, fingerprint=fingerprint)
+        downloader.download_all(selected_libs)
+    
+    # ارجاع‌های template ها به hash جدید فایل‌های عوض شده
+    if fingerprint:
+        from replace_cdn import refresh_fleet_fingerprints
+        refresh_fleet_fingerprints(projects, settings)
     
     print()
     print("🎉 تمام!")
@@ -0,0 +1,214 @@
+"""
+🗂️ ایندکس معکوس CDN
+کدوم template ها هنوز کدوم کتابخانه رو از CDN لود می‌کنن؟
+cdn_name → (پروژه، template، خط)
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from replace_cdn import CDNReplacer
+
+
+class CDNIndex:
+    """ایندکس معکوس ماندگار که با هر اسکن به‌روز میشه"""
+
+    VERSION = 1
+
+    def __init__(self, index_file="cdn_index.json"):
+        self.index_file = Path(index_file)
+        self.lock = threading.Lock()
+        self.dirty = False
+
+        # "project::template" → {project, template, mtime_ns, size, hits}
+        self.files: Dict[str, Dict] = {}
+
+        # cdn_name → مجموعه کلیدهای files
+        self.by_cdn: Dict[str, set] = {}
+
+        self.mappings_hash: Optional[str] = None
+
+        self.load()
+
+    @staticmethod
+    def make_key(project: str, template: str) -> str:
+        return f"{project}::{template}"
+
+    @staticmethod
+    def hash_mappings(cdn_mappings: List) -> str:
+        """hash الگوها؛ با تغییر mapping ها ایندکس از اول ساخته میشه"""
+        data = json.dumps([(name, pattern) for pattern, _, _, name in cdn_mappings])
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def load(self):
+        """بارگذاری ایندکس از دیسک"""
+        if not self.index_file.exists():
+            return
+
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ ایندکس خراب است و از اول ساخته میشه: {e}")
+            return
+
+        if data.get('version') != self.VERSION:
+            return
+
+        self.files = data.get('files', {})
+        self.by_cdn = {name: set(keys) for name, keys in data.get('by_cdn', {}).items()}
+        self.mappings_hash = data.get('mappings_hash')
+
+    def save(self):
+        """ذخیره اتمیک ایندکس"""
+        if not self.dirty:
+            return
+
+        with self.lock:
+            data = {
+                'version': self.VERSION,
+                'mappings_hash': self.mappings_hash,
+                'files': self.files,
+                'by_cdn': {name: sorted(keys) for name, keys in self.by_cdn.items() if keys}
+            }
+
+            tmp_file = self.index_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+
+            self.dirty = False
+
+    def record(self, project: str, file_path: Path, templates_dir: Path, hits: List[Tuple[str, int, str]]):
+        """ثبت نتیجه اسکن یک فایل (جایگزین نتیجه قبلی میشه)"""
+        template = file_path.relative_to(templates_dir).as_posix()
+        key = self.make_key(project, template)
+
+        try:
+            st = file_path.stat()
+        except OSError:
+            self.forget(key)
+            return
+
+        with self.lock:
+            old = self.files.get(key)
+            if old:
+                for cdn_name, _, _ in old['hits']:
+                    self.by_cdn.get(cdn_name, set()).discard(key)
+
+            self.files[key] = {
+                'project': project,
+                'template': template,
+                'path': str(file_path),
+                'mtime_ns': st.st_mtime_ns,
+                'size': st.st_size,
+                'hits': [list(hit) for hit in hits]
+            }
+
+            for cdn_name, _, _ in hits:
+                self.by_cdn.setdefault(cdn_name, set()).add(key)
+
+            self.dirty = True
+
+    def forget(self, key: str):
+        """حذف یک فایل از ایندکس"""
+        with self.lock:
+            old = self.files.pop(key, None)
+            if old:
+                for cdn_name, _, _ in old['hits']:
+                    self.by_cdn.get(cdn_name, set()).discard(key)
+                self.dirty = True
+
+    def ensure_mappings(self, cdn_mappings: List):
+        """اگه mapping ها عوض شدن، ایندکس قبلی دیگه معتبر نیست"""
+        mappings_hash = self.hash_mappings(cdn_mappings)
+
+        if mappings_hash != self.mappings_hash:
+            with self.lock:
+                self.files.clear()
+                self.by_cdn.clear()
+                self.mappings_hash = mappings_hash
+                self.dirty = True
+
+    def update_project(self, proj_id: str, proj_data: Dict, cdn_mappings: List, settings: Dict) -> Dict:
+        """به‌روزرسانی تدریجی: فقط فایل‌هایی که stat شون عوض شده دوباره اسکن میشن"""
+        self.ensure_mappings(cdn_mappings)
+
+        replacer = CDNReplacer(proj_data, cdn_mappings, settings)
+        replacer.attach_index(self, proj_id)
+
+        seen = set()
+        rescanned = 0
+
+        # همه انواع فایل فعال (file_types)، نه فقط template ها
+        for file_path, file_type in replacer.find_source_files():
+            key = self.make_key(proj_id, file_path.relative_to(replacer.source_root(file_type)).as_posix())
+            seen.add(key)
+
+            try:
+                st = file_path.stat()
+            except OSError:
+                continue
+
+            entry = self.files.get(key)
+            if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                continue
+
+            try:
+                replacer.scan_file(file_path)
+                rescanned += 1
+            except Exception as e:
+                print(f"   ❌ {file_path}: {e}")
+
+        removed = [key for key, entry in self.files.items() if entry['project'] == proj_id and key not in seen]
+        for key in removed:
+            self.forget(key)
+
+        return {'project': proj_id, 'files': len(seen), 'rescanned': rescanned, 'removed': len(removed)}
+
+    def query(self, cdn_name: Optional[str] = None, project: Optional[str] = None) -> List[Dict]:
+        """همه استفاده‌های یک CDN (یا همه CDN ها) به صورت ردیف"""
+        names = [cdn_name] if cdn_name else sorted(self.by_cdn)
+        rows = []
+
+        for name in names:
+            for key in sorted(self.by_cdn.get(name, ())):
+                entry = self.files[key]
+
+                if project and entry['project'] != project:
+                    continue
+
+                for hit_name, line, url in entry['hits']:
+                    if hit_name == name:
+                        rows.append({
+                            'cdn': name,
+                            'project': entry['project'],
+                            'template': entry['template'],
+                            'line': line,
+                            'url': url
+                        })
+
+        return rows
+
+    def summary(self) -> Dict[str, int]:
+        """تعداد template های هر CDN"""
+        return {name: len(keys) for name, keys in sorted(self.by_cdn.items()) if keys}
+
+
+# یک نمونه برای هر فایل ایندکس در هر پروسه (سرویس و watch بین thread ها شریکن)
+_open_indexes: Dict[str, CDNIndex] = {}
+_open_lock = threading.Lock()
+
+
+def open_index(settings: Dict) -> CDNIndex:
+    """ایندکس مشترک پروسه از روی index_file تنظیمات (پیش‌فرض cdn_index.json)"""
+    index_file = settings.get('index_file', 'cdn_index.json')
+
+    with _open_lock:
+        if index_file not in _open_indexes:
+            _open_indexes[index_file] = CDNIndex(index_file)
+        return _open_indexes[index_file]
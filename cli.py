@@ -0,0 +1,659 @@
+"""
+⌨️ خط فرمان یکپارچه
+اجرای همه ابزارها بدون سوال و با خروجی قابل پردازش (JSON / NDJSON)
+
+مثال:
+    python cli.py replace --project shop --dry-run --format ndjson
+    python cli.py replace --project shop --dry-run --patch && python cli.py apply --project shop
+    python cli.py download --libs bootstrap,jquery --jobs 4
+    python cli.py export --output cdn_bundle.tar.gz
+    python cli.py import cdn_bundle.tar.gz --project shop
+    python cli.py validate --format json
+    python cli.py batch --run --jobs 8
+    python cli.py query jquery
+"""
+
+import sys
+import json
+import argparse
+import contextlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from replace_cdn import ConfigManager, CDNReplacer
+from replacement_cache import create_cache
+
+
+class ResultEmitter:
+    """نوشتن نتایج به شکل text، JSON یا NDJSON"""
+
+    def __init__(self, fmt: str, command: str):
+        self.fmt = fmt
+        self.command = command
+        self.results: List[Dict] = []
+
+        # stdout واقعی؛ در حالت JSON خروجی‌های معمولی ابزارها به stderr میرن
+        self.stream = sys.stdout
+
+    def emit(self, record: Dict):
+        """ثبت نتیجه یک کار"""
+        self.results.append(record)
+
+        if self.fmt == 'ndjson':
+            self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self.stream.flush()
+
+    def close(self) -> bool:
+        """نوشتن خروجی نهایی و برگرداندن موفق بودن همه کارها"""
+        ok = all(r.get('ok', False) for r in self.results)
+
+        if self.fmt == 'json':
+            json.dump({'command': self.command, 'ok': ok, 'results': self.results},
+                      self.stream, ensure_ascii=False, indent=2, default=str)
+            self.stream.write("\n")
+        elif self.fmt == 'text':
+            failed = [r.get('project', '?') for r in self.results if not r.get('ok', False)]
+            print()
+            print(f"📊 {len(self.results) - len(failed)}/{len(self.results)} موفق")
+            if failed:
+                print(f"❌ ناموفق: {', '.join(failed)}")
+
+        return ok
+
+    def quiet(self):
+        """در حالت JSON/NDJSON چاپ‌های معمولی به stderr منتقل میشن"""
+        if self.fmt == 'text':
+            return contextlib.nullcontext()
+        return contextlib.redirect_stdout(sys.stderr)
+
+
+def select_projects(config_manager: ConfigManager, selectors: Optional[List[str]]) -> List[Tuple[str, Optional[Dict]]]:
+    """انتخاب پروژه‌ها: بدون انتخاب = همه فعال‌ها، 'all' = همه، در غیر این صورت شناسه‌ها"""
+    if not selectors:
+        return list(config_manager.get_enabled_projects().items())
+
+    ids = [s.strip() for selector in selectors for s in selector.split(',') if s.strip()]
+
+    if 'all' in ids:
+        return list(config_manager.get_projects().items())
+
+    return [(proj_id, config_manager.get_project(proj_id)) for proj_id in ids]
+
+
+def run_jobs(items: Iterable, worker: Callable[..., Dict], jobs: int, emitter: ResultEmitter):
+    """اجرای worker روی هر آیتم (موازی اگه jobs > 1) و ارسال نتایج"""
+    items = list(items)
+
+    if jobs <= 1:
+        for item in items:
+            emitter.emit(safe_call(worker, item))
+        return
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(safe_call, worker, item) for item in items]
+        for future in as_completed(futures):
+            emitter.emit(future.result())
+
+
+def safe_call(worker: Callable[..., Dict], item: Tuple[str, Optional[Dict]]) -> Dict:
+    """اجرای worker بدون اینکه یک خطا کل اجرا رو متوقف کنه"""
+    proj_id, proj_data = item
+
+    if proj_data is None:
+        return {'project': proj_id, 'ok': False, 'error': 'project not found'}
+
+    try:
+        return worker(proj_id, proj_data)
+    except Exception as e:
+        return {'project': proj_id, 'ok': False, 'error': str(e)}
+
+
+def cmd_replace(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """جایگزینی (یا تست) روی پروژه‌های انتخاب شده"""
+    cdn_mappings = config_manager.get_cdn_mappings()
+    settings = config_manager.get_settings()
+
+    if args.no_backup:
+        settings = dict(settings, create_backup=False)
+
+    if not cdn_mappings:
+        emitter.emit({'ok': False, 'error': 'no enabled cdn mappings'})
+        return
+
+    index = open_index(settings)
+    index.ensure_mappings(cdn_mappings)
+
+    # نتیجه template های یکسان بین پروژه‌ها (و worker ها) مشترکه
+    cache = create_cache(settings)
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        replacer = CDNReplacer(proj_data, cdn_mappings, settings)
+        replacer.attach_index(index, proj_id)
+        replacer.attach_cache(cache)
+
+        if not args.dry_run:
+            if not args.skip_static_check:
+                replacer.check_static_files(create_placeholders=args.create_placeholders)
+
+            if not replacer.create_backup():
+                return {'project': proj_id, 'ok': False, 'error': 'backup_failed'}
+
+        patch_file = replacer.default_patch_file() if args.dry_run and args.patch else None
+        replacer.process_all_files(dry_run=args.dry_run, patch_file=patch_file)
+
+        log_file = replacer.save_log() if not args.dry_run else None
+
+        return {
+            'project': proj_id,
+            'ok': replacer.stats['errors'] == 0,
+            'dry_run': args.dry_run,
+            'backup_dir': str(replacer.backup_dir) if replacer.backup_dir.exists() else None,
+            'log_file': str(log_file) if log_file else None,
+            'patch_file': str(patch_file) if patch_file else None,
+            'stats': replacer.stats,
+            'mapping_costs': replacer.get_mapping_costs(),
+            'files': replacer.detailed_log
+        }
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+    index.save()
+
+    if cache is not None and cache.hits:
+        metrics = cache.get_metrics()
+        print(f"♻️ cache نتیجه: {metrics['hits']} hit، hit rate {metrics['hit_rate']:.0%}، "
+              f"{metrics['size_mb']} MB، {metrics['evictions']} حذف")
+
+
+def cmd_apply(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """اعمال patch حالت تست (replace --dry-run --patch) بدون اسکن دوباره"""
+    settings = config_manager.get_settings()
+
+    if args.no_backup:
+        settings = dict(settings, create_backup=False)
+
+    index = open_index(settings)
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        replacer = CDNReplacer(proj_data, [], settings)
+        replacer.attach_index(index, proj_id)
+
+        patch_file = Path(args.patch) if args.patch else replacer.latest_patch_file()
+        if patch_file is None or not patch_file.exists():
+            return {'project': proj_id, 'ok': False, 'error': 'patch not found'}
+
+        if not replacer.create_backup():
+            return {'project': proj_id, 'ok': False, 'error': 'backup_failed'}
+
+        replacer.apply_patch(patch_file)
+        log_file = replacer.save_log()
+
+        return {
+            'project': proj_id,
+            'ok': replacer.stats['errors'] == 0 and not replacer.stats['drifted_files'],
+            'patch_file': str(patch_file),
+            'backup_dir': str(replacer.backup_dir) if replacer.backup_dir.exists() else None,
+            'log_file': str(log_file) if log_file else None,
+            'stats': replacer.stats,
+            'files': replacer.detailed_log
+        }
+
+    projects = select_projects(config_manager, args.project)
+
+    # patch یک پروژه فقط روی همون پروژه اعمال میشه
+    if args.patch:
+        patch_path = Path(args.patch).resolve()
+
+        if not args.project:
+            projects = [(proj_id, proj_data) for proj_id, proj_data in projects
+                        if patch_path.is_relative_to(Path(proj_data['path']).resolve())]
+
+        if len(projects) != 1:
+            emitter.emit({'project': args.patch, 'ok': False,
+                          'error': 'patch belongs to one project: pass exactly one --project'})
+            return
+
+    run_jobs(projects, worker, args.jobs, emitter)
+    index.save()
+
+
+def open_index(settings: Dict):
+    """ایندکس معکوس پیش‌فرض (cdn_index.json) - همون نمونه مشترک replacer ها"""
+    import cdn_index
+
+    return cdn_index.open_index(settings)
+
+
+def cmd_index(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """به‌روزرسانی تدریجی ایندکس معکوس"""
+    cdn_mappings = config_manager.get_cdn_mappings()
+    settings = config_manager.get_settings()
+    index = open_index(settings)
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        result = index.update_project(proj_id, proj_data, cdn_mappings, settings)
+        print(f"🗂️ {proj_id}: {result['files']} فایل، {result['rescanned']} اسکن دوباره")
+        return dict(result, ok=True)
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+    index.save()
+
+    if emitter.fmt == 'text':
+        print()
+        for cdn_name, count in index.summary().items():
+            print(f"   {cdn_name}: {count} template")
+
+
+def cmd_query(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """جستجو در ایندکس معکوس بدون اسکن"""
+    index = open_index(config_manager.get_settings())
+    projects = [s.strip() for selector in (args.project or []) for s in selector.split(',')]
+
+    for row in index.query(args.cdn):
+        if projects and row['project'] not in projects:
+            continue
+
+        row['ok'] = True
+        emitter.emit(row)
+
+        if emitter.fmt == 'text':
+            print(f"{row['cdn']}\t{row['project']}\t{row['template']}:{row['line']}\t{row['url']}")
+
+
+def cmd_download(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """دانلود کتابخانه‌ها برای پروژه‌های انتخاب شده (هر فایل فقط یک بار)"""
+    from cdn_downloader import FleetDownloader
+
+    libraries = [lib.strip() for lib in args.libs.split(',')] if args.libs else None
+    projects = {}
+
+    for proj_id, proj_data in select_projects(config_manager, args.project):
+        if proj_data is None:
+            emitter.emit({'project': proj_id, 'ok': False, 'error': 'project not found'})
+        else:
+            projects[proj_id] = proj_data
+
+    settings = config_manager.get_settings()
+    fingerprint = settings.get('fingerprint_assets', False)
+
+    # با versioned_assets فقط نسخه‌هایی که در فایل‌های پروژه ارجاع شدن دانلود میشن
+    versions = None
+    if settings.get('versioned_assets', False):
+        from replace_cdn import scan_fleet_versions
+        versions = scan_fleet_versions(projects, config_manager.get_cdn_mappings(), settings)
+
+    fleet = FleetDownloader(projects, libraries, jobs=args.jobs, fingerprint=fingerprint, versions=versions)
+    results = fleet.download_all()
+
+    # ارجاع‌های template ها به hash جدید فایل‌های عوض شده
+    if fingerprint:
+        from replace_cdn import refresh_fleet_fingerprints
+        refresh_fleet_fingerprints(projects, settings)
+
+    for proj_id, libs in results.items():
+        # پروژه‌ای که چیزی برای دانلود نداره (هیچ نسخه‌ای ارجاع نشده) موفقه
+        result = {'project': proj_id, 'ok': all(libs.values()), 'libraries': libs}
+        if versions is not None:
+            result['versions'] = versions.get(proj_id, {})
+        emitter.emit(result)
+
+    if projects:
+        emitter.emit({'project': '*', 'ok': True, 'plan': fleet.stats})
+
+
+def cmd_export(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """ساخت بسته آفلاین از کتابخانه‌ها (روی سیستمی که اینترنت داره)"""
+    import tempfile
+    from cdn_downloader import CDNDownloader
+
+    libraries = [lib.strip() for lib in args.libs.split(',')] if args.libs else None
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        downloader = CDNDownloader(work_dir, jobs=max(4, args.jobs))
+        results = downloader.export_bundle(args.output, libraries)
+
+    emitter.emit({'project': args.output, 'ok': bool(results) and all(results.values()), 'libraries': results})
+
+
+def cmd_import(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """نصب بسته آفلاین در static پروژه‌های انتخاب شده"""
+    from cdn_downloader import CDNDownloader
+
+    settings = config_manager.get_settings()
+    fingerprint = settings.get('fingerprint_assets', False)
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        downloader = CDNDownloader(proj_data['path'], fingerprint=fingerprint)
+        results = downloader.import_bundle(args.bundle)
+        downloader.cleanup_temp()
+
+        if fingerprint:
+            CDNReplacer(proj_data, [], settings).refresh_fingerprints()
+
+        return {'project': proj_id, 'ok': bool(results) and all(results.values()), 'libraries': results}
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+
+
+def cmd_verify(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """بررسی hash فایل‌های static نصب شده (فقط فایل‌های تغییر کرده دوباره hash میشن)"""
+    from static_integrity import IntegrityManifest
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        manifest = IntegrityManifest(Path(proj_data['path']) / proj_data.get('static_dir', 'static'))
+
+        if not manifest.files:
+            return {'project': proj_id, 'ok': False, 'error': f"manifest not found: {manifest.manifest_file}"}
+
+        result = manifest.verify()
+        manifest.save()
+
+        if emitter.fmt == 'text':
+            for name in result['modified'] + result['missing']:
+                print(f"   ❌ {proj_id}: {name}")
+
+        return {
+            'project': proj_id,
+            'ok': not result['modified'] and not result['missing'],
+            'files': len(manifest.files),
+            'rehashed': len(result['rehashed']),
+            'modified': result['modified'],
+            'missing': result['missing']
+        }
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+
+
+def cmd_subset_icons(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """کوچک کردن CSS فونت‌آوسام به آیکون‌های استفاده شده در template ها"""
+    from fontawesome_subset import FontAwesomeSubsetter
+
+    settings = config_manager.get_settings()
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        result = FontAwesomeSubsetter(proj_data, settings).subset()
+
+        if result is None:
+            return {'project': proj_id, 'ok': False, 'error': 'Font Awesome is not installed'}
+
+        return dict(project=proj_id, ok=True, **result)
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+
+
+def cmd_bundle(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """ترکیب تگ‌های پشت سر هم CSS/JS محلی هر template در یک فایل"""
+    from asset_bundler import AssetBundler
+
+    settings = config_manager.get_settings()
+
+    if args.no_backup:
+        settings = dict(settings, create_backup=False)
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        stats = AssetBundler(proj_data, settings).run(dry_run=args.dry_run)
+        return dict(project=proj_id, ok=True, dry_run=args.dry_run, **stats)
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+
+
+def cmd_coverage(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """فایل static هر mapping: واقعی، ناموجود یا placeholder"""
+    from static_coverage import StaticCoverage
+
+    coverage = StaticCoverage(args.config)
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        return coverage.check_project(proj_id, proj_data)
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+
+    if emitter.fmt == 'text':
+        coverage.print_report([r for r in emitter.results if 'files' in r])
+
+
+def cmd_validate(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """اعتبارسنجی پروژه‌های انتخاب شده"""
+    from validate_project import ProjectValidator
+
+    validator = ProjectValidator(args.config)
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        is_valid, issues = validator.validate_project(proj_id)
+
+        if emitter.fmt == 'text':
+            print(f"\n📋 {proj_data.get('name', proj_id)}")
+            for issue in issues:
+                print(f"   {issue}")
+
+        return {'project': proj_id, 'ok': is_valid, 'issues': issues}
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+    validator.save_cache()
+
+
+def cmd_batch(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """پردازش دسته‌ای همه پروژه‌های فعال (مثل batch_process.py)"""
+    args.dry_run = not args.run
+    cmd_replace(args, config_manager, emitter)
+
+
+def cmd_rollback(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """بازگردانی از بکاپ (یا برگرداندن فقط یک CDN از روی لاگ)"""
+    from rollback import RollbackEngine, print_result
+
+    engine = RollbackEngine(config_manager.get_settings(), workers=max(args.jobs, 8))
+
+    def finish(proj_id: str, result: Dict) -> Dict:
+        print_result(proj_id, result)
+        return dict(project=proj_id, ok=not result['errors'], **result)
+
+    if args.batch:
+        # خروجی cli.py batch --run --format json (یا replace)
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            results = json.load(f).get('results', [])
+
+        for result in engine.rollback_batch(results, config_manager.get_projects()):
+            emitter.emit(finish(result.pop('project'), result))
+        return
+
+    def worker(proj_id: str, proj_data: Dict) -> Dict:
+        if args.cdn:
+            return finish(proj_id, engine.rollback_cdn(proj_data, args.cdn, args.log))
+        return finish(proj_id, engine.restore_backup(proj_data, args.backup))
+
+    run_jobs(select_projects(config_manager, args.project), worker, args.jobs, emitter)
+
+
+def cmd_discover(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """کشف لینک‌های CDN پوشش داده نشده و پیشنهاد mapping"""
+    from cdn_discovery import CDNDiscovery
+
+    discovery = CDNDiscovery(args.config)
+
+    for proj_id, proj_data in select_projects(config_manager, args.project):
+        if proj_data is None:
+            emitter.emit({'project': proj_id, 'ok': False, 'error': 'project not found'})
+            continue
+        discovery.scan_project(proj_id, proj_data)
+
+    result = discovery.report(args.output)
+    emitter.emit(dict(result, ok=True))
+
+
+def cmd_lint(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """بررسی رفتار الگوهای mapping"""
+    from lint_patterns import PatternLinter
+
+    linter = PatternLinter(args.config)
+
+    for result in linter.lint_all():
+        result['ok'] = not result['super_linear']
+        result['project'] = result['name']
+        emitter.emit(result)
+
+
+def cmd_watch(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """حالت نظارت روی پروژه‌های انتخاب شده"""
+    from watch_templates import TemplateWatcher
+
+    cdn_mappings = config_manager.get_cdn_mappings()
+    settings = config_manager.get_settings()
+
+    replacers = []
+    for proj_id, proj_data in select_projects(config_manager, args.project):
+        if proj_data:
+            replacer = CDNReplacer(proj_data, cdn_mappings, settings)
+            replacer.open_index(proj_id)
+            replacers.append(replacer)
+
+    cache = create_cache(settings)
+    for replacer in replacers:
+        replacer.attach_cache(cache)
+
+    watcher = TemplateWatcher(
+        replacers,
+        interval=args.interval or settings.get('watch_interval', 1.0),
+        debounce=settings.get('watch_debounce', 0.5),
+        use_inotify=not args.poll
+    )
+    watcher.watch()
+
+    for replacer in replacers:
+        emitter.emit({'project': replacer.project_name, 'ok': True, 'stats': replacer.stats})
+
+
+def cmd_serve(args, config_manager: ConfigManager, emitter: ResultEmitter):
+    """اجرای سرویس ماندگار"""
+    from replacer_service import ReplacerService, make_server
+
+    service = ReplacerService(args.config)
+    server = make_server(service, args.host, args.port, args.socket)
+
+    print(f"🛰️ سرویس آماده است: {args.socket or f'http://{args.host}:{args.port}'}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    emitter.emit({'ok': True, 'metrics': service.get_metrics()})
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """ساخت parser با همه زیرفرمان‌ها"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', default='config.json', help="مسیر فایل کانفیگ")
+    common.add_argument('--format', choices=['text', 'json', 'ndjson'], default='text',
+                        help="قالب خروجی (json/ndjson برای اتوماسیون)")
+    common.add_argument('--project', '-p', action='append',
+                        help="شناسه پروژه (قابل تکرار یا جدا با کاما، 'all' = همه؛ پیش‌فرض: همه فعال‌ها)")
+    common.add_argument('--jobs', '-j', type=int, default=1, help="تعداد پروژه‌های موازی")
+
+    parser = argparse.ArgumentParser(description="🔄 CDN Replacer - خط فرمان یکپارچه")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('replace', parents=[common], help="جایگزینی لینک‌های CDN")
+    p.add_argument('--dry-run', action='store_true', help="فقط تست، بدون تغییر")
+    p.add_argument('--no-backup', action='store_true', help="بدون ساخت بکاپ")
+    p.add_argument('--create-placeholders', action='store_true', default=False,
+                   help="ساخت فایل نمونه برای فایل‌های static ناموجود")
+    p.add_argument('--skip-static-check', action='store_true', help="رد شدن از بررسی فایل‌های static")
+    p.add_argument('--patch', action='store_true', help="در حالت تست، ذخیره تغییرات به صورت patch در پوشه لاگ")
+    p.set_defaults(handler=cmd_replace)
+
+    p = sub.add_parser('apply', parents=[common], help="اعمال patch حالت تست بدون اسکن دوباره")
+    p.add_argument('patch', nargs='?', help="فایل patch یک پروژه (با --project یا از پوشه پروژه؛ پیش‌فرض: جدیدترین patch هر پروژه)")
+    p.add_argument('--no-backup', action='store_true', help="بدون ساخت بکاپ")
+    p.set_defaults(handler=cmd_apply)
+
+    p = sub.add_parser('download', parents=[common], help="دانلود کتابخانه‌ها")
+    p.add_argument('--libs', help="لیست کتابخانه‌ها جدا با کاما (پیش‌فرض: همه)")
+    p.set_defaults(handler=cmd_download)
+
+    p = sub.add_parser('export', parents=[common], help="ساخت بسته آفلاین کتابخانه‌ها")
+    p.add_argument('--libs', help="لیست کتابخانه‌ها جدا با کاما (پیش‌فرض: همه)")
+    p.add_argument('--output', '-o', default='cdn_bundle.tar.gz', help="فایل بسته")
+    p.set_defaults(handler=cmd_export)
+
+    p = sub.add_parser('import', parents=[common], help="نصب از بسته آفلاین (بدون شبکه)")
+    p.add_argument('bundle', help="فایل بسته")
+    p.set_defaults(handler=cmd_import)
+
+    p = sub.add_parser('verify', parents=[common], help="بررسی hash فایل‌های static نصب شده")
+    p.set_defaults(handler=cmd_verify)
+
+    p = sub.add_parser('subset-icons', parents=[common], help="کوچک کردن CSS فونت‌آوسام به آیکون‌های استفاده شده")
+    p.set_defaults(handler=cmd_subset_icons)
+
+    p = sub.add_parser('bundle', parents=[common], help="ترکیب فایل‌های CSS/JS محلی هر template")
+    p.add_argument('--dry-run', action='store_true', help="فقط تست، بدون تغییر")
+    p.add_argument('--no-backup', action='store_true', help="بدون ساخت بکاپ")
+    p.set_defaults(handler=cmd_bundle)
+
+    p = sub.add_parser('coverage', parents=[common], help="پوشش فایل‌های static همه mapping ها در همه پروژه‌ها")
+    p.set_defaults(handler=cmd_coverage)
+
+    p = sub.add_parser('validate', parents=[common], help="اعتبارسنجی پروژه‌ها")
+    p.set_defaults(handler=cmd_validate)
+
+    p = sub.add_parser('batch', parents=[common], help="پردازش دسته‌ای")
+    p.add_argument('--run', action='store_true', help="اجرای واقعی (پیش‌فرض: تست)")
+    p.add_argument('--no-backup', action='store_true', help="بدون ساخت بکاپ")
+    p.add_argument('--create-placeholders', action='store_true', default=False,
+                   help="ساخت فایل نمونه برای فایل‌های static ناموجود")
+    p.add_argument('--skip-static-check', action='store_true', help="رد شدن از بررسی فایل‌های static")
+    p.add_argument('--patch', action='store_true', help="در حالت تست، ذخیره تغییرات به صورت patch در پوشه لاگ")
+    p.set_defaults(handler=cmd_batch)
+
+    p = sub.add_parser('rollback', parents=[common], help="بازگردانی template ها از بکاپ یا لاگ")
+    p.add_argument('--batch', help="خروجی JSON یک اجرای replace/batch (بازگردانی همه پروژه‌هاش)")
+    p.add_argument('--backup', help="پوشه بکاپ (پیش‌فرض: جدیدترین)")
+    p.add_argument('--cdn', help="فقط جایگزینی‌های این CDN برگرده (از روی لاگ)")
+    p.add_argument('--log', help="فایل لاگ برای --cdn (پیش‌فرض: جدیدترین)")
+    p.set_defaults(handler=cmd_rollback)
+
+    p = sub.add_parser('index', parents=[common], help="ساخت/به‌روزرسانی ایندکس معکوس")
+    p.set_defaults(handler=cmd_index)
+
+    p = sub.add_parser('query', parents=[common], help="کدوم template ها از یک CDN استفاده می‌کنن")
+    p.add_argument('cdn', nargs='?', help="نام CDN در cdn_mappings (خالی = همه)")
+    p.set_defaults(handler=cmd_query)
+
+    p = sub.add_parser('discover', parents=[common], help="کشف لینک‌های CDN جدید و پیشنهاد mapping")
+    p.add_argument('--output', '-o', default='cdn_discovery.json', help="فایل خروجی پیشنهادها")
+    p.set_defaults(handler=cmd_discover)
+
+    p = sub.add_parser('lint', parents=[common], help="بررسی الگوهای کند")
+    p.set_defaults(handler=cmd_lint)
+
+    p = sub.add_parser('watch', parents=[common], help="نظارت و جایگزینی خودکار")
+    p.add_argument('--interval', type=float, help="فاصله polling (ثانیه)")
+    p.add_argument('--poll', action='store_true', help="استفاده از polling به جای inotify")
+    p.set_defaults(handler=cmd_watch)
+
+    p = sub.add_parser('serve', parents=[common], help="اجرای سرویس ماندگار")
+    p.add_argument('--host', default='127.0.0.1', help="آدرس")
+    p.add_argument('--port', type=int, default=8765, help="پورت")
+    p.add_argument('--socket', help="مسیر Unix socket")
+    p.set_defaults(handler=cmd_serve)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """تابع اصلی"""
+    args = build_parser().parse_args(argv)
+    emitter = ResultEmitter(args.format, args.command)
+
+    with emitter.quiet():
+        config_manager = ConfigManager(args.config)
+        args.handler(args, config_manager, emitter)
+
+    return 0 if emitter.close() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
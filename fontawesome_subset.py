@@ -0,0 +1,208 @@
+"""
+✂️ کوچک کردن CSS فونت‌آوسام
+فقط قوانین آیکون‌هایی که در template ها استفاده شدن در all.min.css می‌مونن
+"""
+
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from replace_cdn import ConfigManager, CDNReplacer
+from cdn_downloader import compress_asset
+from static_integrity import IntegrityManifest, hash_file
+
+
+# محل نصب توسط دانلودر (libraries.json)
+FONTAWESOME_CSS = 'auto_icons/fontawesome/css/all.min.css'
+
+# نسخه کامل برای اجراهای بعدی کنار فایل کوچک شده نگه داشته میشه
+FULL_CSS_NAME = 'all.full.min.css'
+
+ICON_CLASS_RE = re.compile(r"(?<![\w-])fa-([a-z0-9]+(?:-[a-z0-9]+)*)(?![\w-])")
+
+# کلاس ساخته شده در زمان اجرا: fa-{{ icon }} یا 'fa-' + name
+DYNAMIC_CLASS_RE = re.compile(r"""fa-(?:\{\{|\{%|['"]\s*\+|\$\{)""")
+
+# .fa-house:before یا .fa-house::before یا .fa-house (نسخه‌های جدید با --fa)
+ICON_SELECTOR_RE = re.compile(r"^\.fa-([a-z0-9]+(?:-[a-z0-9]+)*)(?:::?before|::?after)?$")
+
+# بدنه‌ای که فقط کد کاراکتر آیکون رو تعریف می‌کنه
+ICON_BODY_RE = re.compile(r"""^(?:\s*(?:content|--fa(?:--fa)?)\s*:\s*"[^"]*"\s*;?)+\s*$""")
+
+
+def split_rules(css: str) -> List[Tuple[str, str]]:
+    """تقسیم CSS به قوانین سطح بالا: (selector، بدنه)
+
+    بلاک‌های @media/@keyframes کامل به عنوان یک قانون برمی‌گردن.
+    """
+    rules = []
+    depth = 0
+    start = 0
+    body_start = None
+    i = 0
+    n = len(css)
+
+    while i < n:
+        ch = css[i]
+
+        if ch == '/' and css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            if depth == 0:
+                start = i
+            continue
+
+        if ch in '"\'':
+            end = i + 1
+            while end < n and css[end] != ch:
+                end += 2 if css[end] == '\\' else 1
+            i = end + 1
+            continue
+
+        if ch == '{':
+            if depth == 0:
+                body_start = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((css[start:body_start].strip(), css[body_start + 1:i]))
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            # @charset / @import
+            rules.append((css[start:i + 1].strip(), None))
+            start = i + 1
+
+        i += 1
+
+    return rules
+
+
+def subset_css(css: str, used: Set[str]) -> Tuple[str, int, int]:
+    """حذف قوانین آیکون‌های استفاده نشده
+
+    خروجی: (CSS جدید، تعداد آیکون‌های کل، تعداد آیکون‌های نگه داشته شده)
+    """
+    # توضیح مجوز اول فایل باید بمونه
+    banner = re.match(r"\s*(/\*!.*?\*/)", css, re.DOTALL)
+    output = [banner.group(1) + "\n"] if banner else []
+    total = kept = 0
+
+    for selector, body in split_rules(css):
+        if body is None:
+            output.append(selector)
+            continue
+
+        selectors = [s.strip() for s in selector.split(',')]
+        names = [ICON_SELECTOR_RE.match(s) for s in selectors]
+
+        if all(names) and ICON_BODY_RE.match(body):
+            total += 1
+            selectors = [s for s, m in zip(selectors, names) if m.group(1) in used]
+            if not selectors:
+                continue
+            kept += 1
+
+        output.append(','.join(selectors) + '{' + body + '}')
+
+    return ''.join(output), total, kept
+
+
+class FontAwesomeSubsetter:
+    """پیدا کردن کلاس‌های fa-* استفاده شده و کوچک کردن all.min.css یک پروژه"""
+
+    def __init__(self, proj_data: Dict, settings: Optional[Dict] = None):
+        self.settings = settings or {}
+        self.replacer = CDNReplacer(proj_data, [], self.settings)
+        self.css_file = self.replacer.static_dir / FONTAWESOME_CSS
+        self.full_file = self.css_file.with_name(FULL_CSS_NAME)
+
+        self.dynamic_templates: List[str] = []
+
+    def used_icons(self) -> Set[str]:
+        """همه نام‌های fa-* در template ها (به همراه لیست ثابت تنظیمات)"""
+        used = set(self.settings.get('fontawesome_keep_icons', []))
+
+        for file_path in self.replacer.find_template_files():
+            try:
+                content = file_path.read_text(encoding='utf-8')
+            except Exception as e:
+                print(f"   ❌ {file_path}: {e}")
+                continue
+
+            used.update(ICON_CLASS_RE.findall(content))
+
+            if DYNAMIC_CLASS_RE.search(content):
+                self.dynamic_templates.append(str(file_path.relative_to(self.replacer.templates_dir)))
+
+        return used
+
+    def subset(self) -> Optional[Dict]:
+        """ساخت all.min.css کوچک شده از روی نسخه کامل"""
+        if not self.full_file.exists():
+            if not self.css_file.exists():
+                print(f"   ⚠️ فونت‌آوسام نصب نشده: {self.css_file}")
+                return None
+            shutil.copy2(self.css_file, self.full_file)
+
+        used = self.used_icons()
+        full_css = self.full_file.read_text(encoding='utf-8')
+        css, total, kept = subset_css(full_css, used)
+
+        self.css_file.write_text(css, encoding='utf-8')
+
+        # hash جدید برای integrity= و نسخه‌های .gz/.br که دیگه قدیمی شدن
+        integrity = IntegrityManifest(self.replacer.static_dir)
+        sri = hash_file(self.css_file)
+        integrity.record(self.css_file, sri, 'fontawesome')
+        compress_asset(str(self.css_file))
+        integrity.files[integrity.relative(self.css_file)]['compressed'] = sri
+
+        # اگه نسخه hash دار داشت، نسخه جدید با hash جدید ساخته میشه
+        if integrity.fingerprinted(integrity.relative(self.css_file)):
+            compress_asset(str(self.replacer.static_dir / integrity.fingerprint(self.css_file)))
+
+        integrity.save()
+
+        # ارجاع‌ها به نسخه جدید میرن و نسخه قبلی بدون ارجاع پاک میشه
+        refreshed = self.replacer.refresh_fingerprints()
+
+        result = {
+            'icons_total': total,
+            'icons_kept': kept,
+            'bytes_before': len(full_css.encode('utf-8')),
+            'bytes_after': len(css.encode('utf-8')),
+            'repointed': refreshed['repointed'],
+            'dynamic_templates': self.dynamic_templates
+        }
+
+        print(f"   ✂️ {kept}/{total} آیکون نگه داشته شد: "
+              f"{result['bytes_before'] / 1024:.0f} KB → {result['bytes_after'] / 1024:.0f} KB")
+
+        for template in self.dynamic_templates:
+            print(f"   ⚠️ کلاس fa-* پویا در {template} (آیکون‌هاش رو به fontawesome_keep_icons اضافه کن)")
+
+        return result
+
+
+def main():
+    """تابع اصلی"""
+    print()
+    print("╔" + "═" * 68 + "╗")
+    print("║" + " " * 20 + "✂️ کوچک کردن Font Awesome" + " " * 23 + "║")
+    print("╚" + "═" * 68 + "╝")
+
+    config_manager = ConfigManager()
+    settings = config_manager.get_settings()
+
+    for proj_id, proj_data in config_manager.get_enabled_projects().items():
+        print(f"\n📁 {proj_data.get('name', proj_id)}")
+        FontAwesomeSubsetter(proj_data, settings).subset()
+
+    print()
+    input("Press Enter to exit...")
+
+
+if __name__ == "__main__":
+    main()
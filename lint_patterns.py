@@ -0,0 +1,216 @@
+"""
+🐢 بررسی الگوهای CDN
+پیدا کردن الگوهای regex که روی ورودی‌های بزرگ رفتار غیرخطی دارن
+"""
+
+import re
+import math
+import time
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+
+from replace_cdn import ConfigManager
+
+
+def time_finditer(pattern: str, text: str, budget: float) -> float:
+    """زمان اجرای finditer (بهترین از سه بار) - داخل پروسه جدا اجرا میشه"""
+    compiled = re.compile(pattern, re.IGNORECASE)
+    best = float('inf')
+
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in compiled.finditer(text):
+            pass
+        best = min(best, time.perf_counter() - start)
+
+        if best > budget:
+            break
+
+    return best
+
+
+class PatternLinter:
+    """بررسی‌کننده هزینه الگوهای cdn_mappings"""
+
+    # اندازه ورودی‌ها (کاراکتر) برای اندازه‌گیری رشد زمان
+    SIZES = [2000, 4000, 8000, 16000]
+
+    # اگه زمان با توان بیشتر از این رشد کنه، الگو غیرخطیه
+    MAX_EXPONENT = 1.5
+
+    # سقف زمان یک اندازه‌گیری (ثانیه) - رد شدن ازش در هر اندازه‌ای یعنی الگو غیرخطیه
+    TIME_BUDGET = 2.0
+
+    # بعد از این مدت پروسه اندازه‌گیری کشته میشه (الگوی نمایی هیچ وقت تموم نمیشه)
+    DEADLINE = 10.0
+
+    def __init__(self, config_file="config.json"):
+        self.config_manager = ConfigManager(config_file)
+        self.mappings = self.config_manager.get_cdn_mappings()
+        self.pool = None
+
+    def extract_literals(self, pattern: str) -> Tuple[List[str], List[str]]:
+        """استخراج دامنه‌ها و کلمات ثابت الگو برای ساخت ورودی‌های بدخیم"""
+        hosts = []
+        host_re = r"(?:(?<=//)|(?<=\(\?:)|(?<=\|))(?:[a-z0-9\-]+\\\.)+[a-z]{2,}(?:/[a-z0-9\-/]+)?"
+        for match in re.finditer(host_re, pattern, re.IGNORECASE):
+            hosts.append(match.group(0).replace('\\', ''))
+
+        labels = {label for host in hosts for label in re.split(r'[./]', host)}
+        words = []
+        for match in re.finditer(r"(?<![\\\w])[a-z][a-z0-9_\-]{3,}", pattern, re.IGNORECASE):
+            word = match.group(0)
+            if word not in ('https', 'http') and word not in labels:
+                words.append(word)
+
+        return hosts or ['cdn.example.com'], words or ['lib']
+
+    def build_inputs(self, pattern: str, size: int) -> Dict[str, str]:
+        """ساخت ورودی‌های بدخیم با اندازه مشخص"""
+        hosts, words = self.extract_literals(pattern)
+        host = hosts[0]
+        word = words[0]
+        prefix = f"https://{host}/"
+
+        def fill(unit: str, head: str = '') -> str:
+            repeat = max(1, (size - len(head)) // len(unit))
+            return head + unit * repeat
+
+        return {
+            # خط minify شده با کلی لینک ناقص (بدون پسوند)
+            'repeated_prefix': fill(prefix),
+            # یک لینک که کلمه کلیدی توش زیاد تکرار شده ولی تموم نمیشه
+            'repeated_keyword': fill(f"{word}@1.2.3/", prefix),
+            # دنباله طولانی بدون هیچ چیز جالب
+            'long_tail': fill('a', prefix),
+            # متن معمولی بدون لینک (مبنا)
+            'plain_text': fill('var x=1;'),
+        }
+
+    def time_pattern(self, pattern: str, text: str) -> Optional[float]:
+        """زمان اجرا در پروسه جدا؛ None یعنی از DEADLINE رد شد و پروسه کشته شد"""
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(1)
+
+        try:
+            return self.pool.apply_async(time_finditer, (pattern, text, self.TIME_BUDGET)).get(self.DEADLINE)
+        except multiprocessing.TimeoutError:
+            self.close()
+            return None
+
+    def close(self):
+        """بستن پروسه اندازه‌گیری"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def lint_pattern(self, cdn_name: str, pattern: str) -> Dict:
+        """بررسی یک الگو"""
+        re.compile(pattern, re.IGNORECASE)
+        families = {}
+
+        for family in self.build_inputs(pattern, self.SIZES[0]):
+            timings = []
+            over_budget = False
+
+            for size in self.SIZES:
+                text = self.build_inputs(pattern, size)[family]
+                elapsed = self.time_pattern(pattern, text)
+
+                if elapsed is None or elapsed > self.TIME_BUDGET:
+                    timings.append((len(text), self.DEADLINE if elapsed is None else elapsed))
+                    over_budget = True
+                    break
+
+                timings.append((len(text), elapsed))
+
+            exponent = None if over_budget else self.growth_exponent(timings)
+
+            families[family] = {
+                'timings_ms': [(n, round(t * 1000, 3)) for n, t in timings],
+                'exponent': None if exponent is None else round(exponent, 2),
+                'over_budget': over_budget,
+                'super_linear': over_budget or exponent > self.MAX_EXPONENT
+            }
+
+        # خانواده‌هایی که از بودجه زمان رد شدن بدترین هستن
+        worst = max(families.items(), key=lambda item: (item[1]['over_budget'], item[1]['exponent'] or 0.0))
+
+        return {
+            'name': cdn_name,
+            'pattern': pattern,
+            'families': families,
+            'worst_family': worst[0],
+            'worst_exponent': worst[1]['exponent'],
+            'super_linear': any(f['super_linear'] for f in families.values())
+        }
+
+    def growth_exponent(self, timings: List[Tuple[int, float]]) -> float:
+        """توان رشد زمان نسبت به اندازه ورودی (۱ = خطی، ۲ = درجه دو)"""
+        (n1, t1), (n2, t2) = timings[0], timings[-1]
+
+        # زمان‌های خیلی کوچک نویز هستن
+        if t1 <= 0 or t2 < 0.0005:
+            return 1.0 if t2 >= t1 else 0.0
+
+        return math.log(t2 / t1) / math.log(n2 / n1)
+
+    def lint_all(self) -> List[Dict]:
+        """بررسی همه الگوهای فعال"""
+        print()
+        print("=" * 80)
+        print("🐢 بررسی رفتار الگوهای CDN روی ورودی‌های بدخیم")
+        print("=" * 80)
+        print()
+
+        results = []
+
+        try:
+            for pattern, _, _, cdn_name in self.mappings:
+                results.append(self.lint_pattern(cdn_name, pattern))
+        finally:
+            self.close()
+
+        for result in results:
+            cdn_name = result['name']
+
+            if result['super_linear']:
+                family = result['families'][result['worst_family']]
+                last_n, last_ms = family['timings_ms'][-1]
+                growth = "بیش از بودجه زمان" if family['over_budget'] else f"توان {result['worst_exponent']}"
+                print(f"   ❌ {cdn_name}: رشد غیرخطی ({growth}) "
+                      f"در {result['worst_family']} - {last_ms} ms برای {last_n} کاراکتر")
+            else:
+                print(f"   ✅ {cdn_name}: خطی (توان {result['worst_exponent']})")
+
+        bad = sum(1 for r in results if r['super_linear'])
+
+        print()
+        print("=" * 80)
+        print(f"📊 {bad}/{len(results)} الگو رفتار غیرخطی دارن")
+
+        if bad:
+            print("💡 .*? بدون محدودیت رو با کلاس محدود مثل [^\"'\\s]*? عوض کن")
+
+        print("=" * 80)
+
+        return results
+
+
+def main():
+    """تابع اصلی"""
+    print()
+    print("╔" + "═" * 78 + "╗")
+    print("║" + " " * 22 + "🐢 بررسی الگوهای CDN" + " " * 36 + "║")
+    print("╚" + "═" * 78 + "╝")
+
+    linter = PatternLinter()
+    linter.lint_all()
+
+    print()
+    input("Press Enter to exit...")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ import os
 from pathlib import Path
 from typing import Dict, Optional
 
+from replace_cdn import DIALECTS
+
 
 class ProjectManager:
     """مدیریت پروژه‌ها در کانفیگ"""
@@ -66,7 +68,15 @@ class ProjectManager:
                 "backup_dir_name": "backup_templates_{timestamp}",
                 "save_log": True,
                 "log_dir": "logs",
-                "dry_run_first": True
+                "dry_run_first": True,
+                "regex_cost_threshold_ms_per_kb": 1.0,
+                "match_mode": "full",
+                "mmap_threshold_kb": 1024,
+                "fingerprint_assets": False,
+                "replacement_cache_mb": 64,
+                "file_types": ["templates"],
+                "scan_workers": 1,
+                "versioned_assets": False
             },
             "cdn_mappings": self.get_default_cdn_mappings()
         }
@@ -75,56 +85,56 @@ class ProjectManager:
         """CDN های پیش‌فرض"""
         return {
             "bootstrap_css": {
-                "pattern": r"https?://(?:cdn\.jsdelivr\.net|stackpath\.bootstrapcdn\.com|maxcdn\.bootstrapcdn\.com)/.*?bootstrap(?:@[\d\.]+)?.*?\.min\.css[\"']?",
-                "replacement": "{% static 'css/auto_bootstrap.min.css' %}\"",
+                "pattern": r"https?://(?:cdn\.jsdelivr\.net|stackpath\.bootstrapcdn\.com|maxcdn\.bootstrapcdn\.com)/.*?bootstrap(?:[@/](?P<version>\d[\d\.]*))?.*?\.min\.css[\"']?",
+                "asset": "css/auto_bootstrap.min.css",
                 "enabled": True,
                 "description": "Bootstrap CSS Framework"
             },
             "bootstrap_js_bundle": {
-                "pattern": r"https?://(?:cdn\.jsdelivr\.net|stackpath\.bootstrapcdn\.com|maxcdn\.bootstrapcdn\.com)/.*?bootstrap(?:@[\d\.]+)?.*?\.bundle\.min\.js[\"']?",
-                "replacement": "{% static 'js/auto_bootstrap.bundle.min.js' %}\"",
+                "pattern": r"https?://(?:cdn\.jsdelivr\.net|stackpath\.bootstrapcdn\.com|maxcdn\.bootstrapcdn\.com)/.*?bootstrap(?:[@/](?P<version>\d[\d\.]*))?.*?\.bundle\.min\.js[\"']?",
+                "asset": "js/auto_bootstrap.bundle.min.js",
                 "enabled": True,
                 "description": "Bootstrap JS Bundle (با Popper)"
             },
             "bootstrap_js": {
-                "pattern": r"https?://(?:cdn\.jsdelivr\.net|stackpath\.bootstrapcdn\.com)/.*?bootstrap(?:@[\d\.]+)?.*?\.min\.js[\"']?",
-                "replacement": "{% static 'js/auto_bootstrap.min.js' %}\"",
+                "pattern": r"https?://(?:cdn\.jsdelivr\.net|stackpath\.bootstrapcdn\.com)/.*?bootstrap(?:[@/](?P<version>\d[\d\.]*))?.*?\.min\.js[\"']?",
+                "asset": "js/auto_bootstrap.min.js",
                 "enabled": True,
                 "description": "Bootstrap JS (بدون Popper)"
             },
             "jquery": {
-                "pattern": r"https?://(?:code\.jquery\.com|ajax\.googleapis\.com/ajax/libs/jquery)/jquery-[\d\.]+\.min\.js[\"']?",
-                "replacement": "{% static 'js/auto_jquery.min.js' %}\"",
+                "pattern": r"https?://(?:code\.jquery\.com|ajax\.googleapis\.com/ajax/libs/jquery)/jquery-(?P<version>[\d\.]+)\.min\.js[\"']?",
+                "asset": "js/auto_jquery.min.js",
                 "enabled": True,
                 "description": "jQuery Library"
             },
             "select2_js": {
-                "pattern": r"https?://cdn\.jsdelivr\.net/npm/select2@[\d\.\-rc]+/dist/js/select2\.min\.js[\"']?",
-                "replacement": "{% static 'js/auto_select2.min.js' %}\"",
+                "pattern": r"https?://cdn\.jsdelivr\.net/npm/select2@(?P<version>[\d\.\-rc]+)/dist/js/select2\.min\.js[\"']?",
+                "asset": "js/auto_select2.min.js",
                 "enabled": True,
                 "description": "Select2 JavaScript"
             },
             "select2_css": {
-                "pattern": r"https?://cdn\.jsdelivr\.net/npm/select2@[\d\.\-rc]+/dist/css/select2\.min\.css[\"']?",
-                "replacement": "{% static 'css/auto_select2.min.css' %}\"",
+                "pattern": r"https?://cdn\.jsdelivr\.net/npm/select2@(?P<version>[\d\.\-rc]+)/dist/css/select2\.min\.css[\"']?",
+                "asset": "css/auto_select2.min.css",
                 "enabled": True,
                 "description": "Select2 CSS"
             },
             "datatables_js": {
-                "pattern": r"https?://cdn\.datatables\.net/[\d\.]+/js/jquery\.dataTables\.min\.js[\"']?",
-                "replacement": "{% static 'js/auto_datatables.min.js' %}\"",
+                "pattern": r"https?://cdn\.datatables\.net/(?P<version>[\d\.]+)/js/jquery\.dataTables\.min\.js[\"']?",
+                "asset": "js/auto_datatables.min.js",
                 "enabled": True,
                 "description": "DataTables JavaScript"
             },
             "sweetalert2_js": {
-                "pattern": r"https?://cdn\.jsdelivr\.net/npm/sweetalert2@[\d\.]+/dist/sweetalert2\.(?:all\.)?min\.js[\"']?",
-                "replacement": "{% static 'js/auto_sweetalert2.min.js' %}\"",
+                "pattern": r"https?://cdn\.jsdelivr\.net/npm/sweetalert2@(?P<version>[\d\.]+)/dist/sweetalert2\.(?:all\.)?min\.js[\"']?",
+                "asset": "js/auto_sweetalert2.min.js",
                 "enabled": True,
                 "description": "SweetAlert2 JavaScript"
             },
             "font_awesome": {
-                "pattern": r"https?://(?:cdnjs\.cloudflare\.com/ajax/libs/font-awesome|use\.fontawesome\.com/releases)/[\d\.]+/css/(?:all|fontawesome)\.min\.css[\"']?",
-                "replacement": "{% static 'auto_icons/fontawesome/css/all.min.css' %}\"",
+                "pattern": r"https?://(?:cdnjs\.cloudflare\.com/ajax/libs/font-awesome|use\.fontawesome\.com/releases)/(?P<version>[\d\.]+)/css/(?:all|fontawesome)\.min\.css[\"']?",
+                "asset": "auto_icons/fontawesome/css/all.min.css",
                 "enabled": True,
                 "description": "Font Awesome Icons"
             }
@@ -150,6 +160,7 @@ class ProjectManager:
             print(f"   📁 مسیر: {proj_data.get('path', 'نامشخص')}")
             print(f"   📂 Templates: {proj_data.get('templates_dir', 'templates')}")
             print(f"   📦 Static: {proj_data.get('static_dir', 'static')}")
+            print(f"   🧩 Dialect: {proj_data.get('dialect', 'django')}")
         
         print()
     
@@ -198,6 +209,11 @@ class ProjectManager:
         templates_dir = input("نام پوشه templates (پیش‌فرض: templates): ").strip() or "templates"
         static_dir = input("نام پوشه static (پیش‌فرض: static): ").strip() or "static"
         
+        dialect = input(f"dialect template ها ({'/'.join(DIALECTS)}، پیش‌فرض: django): ").strip().lower() or "django"
+        if dialect not in DIALECTS:
+            print(f"❌ dialect نامعتبر: {dialect}")
+            return
+        
         enabled_input = input("فعال باشه؟ (yes/no, پیش‌فرض: yes): ").strip().lower()
         enabled = enabled_input not in ['no', 'n', 'نه']
         
@@ -209,6 +225,7 @@ class ProjectManager:
             "path": path,
             "templates_dir": templates_dir,
             "static_dir": static_dir,
+            "dialect": dialect,
             "enabled": enabled
         }
         
@@ -255,6 +272,12 @@ class ProjectManager:
         if new_static:
             proj['static_dir'] = new_static
         
+        new_dialect = input(f"dialect (فعلی: {proj.get('dialect', 'django')}، Enter=بدون تغییر): ").strip().lower()
+        if new_dialect in DIALECTS:
+            proj['dialect'] = new_dialect
+        elif new_dialect:
+            print(f"⚠️ dialect نامعتبر، تغییر نکرد: {new_dialect}")
+        
         current_status = "فعال" if proj.get('enabled', False) else "غیرفعال"
         toggle = input(f"وضعیت فعلی: {current_status}، تغییر بده؟ (yes/no): ").strip().lower()
         
@@ -9,10 +9,264 @@
 import os
 import re
 import json
+import mmap
+import time
 import shutil
+import hashlib
+import tempfile
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Tuple, Optional
+
+from static_integrity import IntegrityManifest
+from cdn_downloader import load_manifest, manifest_assets, versioned_asset
+from replace_patch import PatchWriter, apply_hunks, format_file_patch, read_patch
+from replacement_cache import NO_MATCH
+
+
+# مقادیر src=/href= در HTML و url(...)/@import در CSS داخلی
+# طول مقدار محدوده تا یک کوتیشن بسته نشده باعث اسکن تا انتهای فایل نشه
+MAX_URL_LENGTH = 4096
+
+URL_TOKEN_PATTERN = (
+    r"""\b(?:src|href)\s*=\s*(?:"([^"]{0,%(n)d})"?|'([^']{0,%(n)d})'?|([^\s"'>]{1,%(n)d}))"""
+    r"""|\burl\(\s*(?:"([^"]{0,%(n)d})"?|'([^']{0,%(n)d})'?|([^\s"')]{1,%(n)d}))"""
+    r"""|@import\s+(?:"([^"]{0,%(n)d})"?|'([^']{0,%(n)d})'?)""" % {'n': MAX_URL_LENGTH}
+)
+
+URL_TOKEN_RE = re.compile(URL_TOKEN_PATTERN, re.IGNORECASE)
+URL_TOKEN_RE_BYTES = re.compile(URL_TOKEN_PATTERN.encode('ascii'), re.IGNORECASE)
+
+
+def iter_url_tokens(content):
+    """اسکن سریع متن و برگرداندن بازه هر مقدار لینک‌دار (start, end)
+    
+    هم str و هم bytes/mmap رو قبول می‌کنه. انتهای بازه کوتیشن بسته رو هم
+    شامل میشه چون الگوهای mapping اون رو هم می‌گیرن.
+    """
+    if isinstance(content, str):
+        token_re, slashes, quotes = URL_TOKEN_RE, '//', ('"', "'")
+    else:
+        token_re, slashes, quotes = URL_TOKEN_RE_BYTES, b'//', (b'"', b"'")
+    
+    for match in token_re.finditer(content):
+        group = match.lastindex
+        start, end = match.span(group)
+        
+        if slashes not in content[start:end]:
+            continue
+        
+        if content[end:end + 1] in quotes:
+            end += 1
+        
+        yield start, end
+
+
+@lru_cache(maxsize=32)
+def compile_patterns(patterns: Tuple[Tuple[str, str], ...], as_bytes: bool = False) -> Dict:
+    """کامپایل الگوهای mapping با cache سراسری
+    
+    patterns یک tuple از (cdn_name, pattern) است. پروسه‌های ماندگار (سرویس،
+    watch) برای هر پروژه و هر درخواست دوباره کامپایل نمی‌کنن.
+    """
+    return {
+        cdn_name: re.compile(pattern.encode('utf-8') if as_bytes else pattern, re.IGNORECASE)
+        for cdn_name, pattern in patterns
+    }
+
+
+def pattern_key(cdn_mappings: List[Tuple]) -> Tuple[Tuple[str, str], ...]:
+    """کلید compile_patterns برای یک مجموعه mapping"""
+    return tuple((cdn_name, pattern) for pattern, _, _, cdn_name in cdn_mappings)
+
+
+# رشته‌های JS که لینک دارن: loadScript('https://...')
+STRING_TOKEN_RE = re.compile(r"""(["'`])((?:\\.|(?!\1)[^\\\n]){1,%d})\1""" % MAX_URL_LENGTH)
+
+# لینک‌های markdown: [متن](https://...)
+MARKDOWN_LINK_RE = re.compile(r"""\]\(\s*<?([^)\s>]{1,%d})""" % MAX_URL_LENGTH)
+
+
+def iter_string_tokens(content: str):
+    """بازه رشته‌های لینک‌دار (همراه کوتیشن بسته) در کد JS"""
+    for match in STRING_TOKEN_RE.finditer(content):
+        start, end = match.span(2)
+        if '//' in content[start:end]:
+            yield start, end + 1
+
+
+def iter_markdown_tokens(content: str):
+    """لینک‌های markdown به همراه src/href های HTML داخل متن"""
+    spans = list(iter_url_tokens(content))
+    
+    for match in MARKDOWN_LINK_RE.finditer(content):
+        start, end = match.span(1)
+        if '//' in content[start:end]:
+            spans.append((start, end))
+    
+    return sorted(set(spans))
+
+
+def trailing_quote(matched: str) -> str:
+    """کوتیشن بسته‌ای که الگوی mapping همراه لینک گرفته"""
+    return matched[-1] if matched[-1:] in ('"', "'") else ''
+
+
+def render_relative(replacer, static_path: str, matched: str, source_file: Path) -> str:
+    """مسیر نسبی از خود فایل (CSS داخل static)"""
+    target = os.path.relpath(replacer.static_dir / static_path, source_file.parent)
+    return target.replace(os.sep, '/') + trailing_quote(matched)
+
+
+def render_static_url(replacer, static_path: str, matched: str, source_file: Path) -> str:
+    """آدرس مطلق static (JS، Python، Markdown)"""
+    static_url = replacer.settings.get('static_url', '/static/').rstrip('/')
+    return f"{static_url}/{static_path}" + trailing_quote(matched)
+
+
+# نسخه گرفته شده با گروه (?P<version>...) الگو؛ بخشی از مسیر فایل میشه پس / و .. ممنوعه
+VERSION_RE = re.compile(r"\d[\w\.\-]*")
+
+
+@lru_cache(maxsize=1)
+def manifest_libraries() -> Dict[str, str]:
+    """مسیر نصب فایل‌های libraries.json → نام کتابخانه (یک بار خوانده میشه)"""
+    try:
+        return manifest_assets(load_manifest())
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_library(asset: str) -> Optional[str]:
+    """کتابخانه‌ای که دانلودر این فایل رو ازش نصب می‌کنه"""
+    assets = manifest_libraries()
+    if asset in assets:
+        return assets[asset]
+    
+    # فایل داخل پوشه‌ای که یکجا نصب میشه (auto_icons/fontawesome/css/)
+    return next((lib for dest, lib in assets.items() if dest.endswith('/') and asset.startswith(dest)), None)
+
+
+# ارجاع به فایل static در template های هر فریم‌ورک ({asset} = مسیر داخل static)
+DIALECTS: Dict[str, str] = {}
+
+# replacement های قدیمی کانفیگ: {% static '...' %}" (کوتیشن آخر اختیاری)
+STATIC_TAG_RE = re.compile(r"""\{%\s*static\s+(['"])([^'"]+)\1\s*%\}["']?""")
+
+
+def register_dialect(name: str, template: str):
+    """اضافه کردن (یا جایگزینی) یک dialect؛ با نامش در dialect پروژه انتخاب میشه"""
+    DIALECTS[name] = template
+
+
+def render_dialect(dialect: str, asset: str) -> str:
+    """ارجاع یک فایل static با قالب dialect"""
+    return DIALECTS[dialect].replace('{asset}', asset)
+
+
+register_dialect('django', "{% static '{asset}' %}")
+register_dialect('jinja2', "{{ url_for('static', filename='{asset}') }}")
+register_dialect('flask', DIALECTS['jinja2'])
+
+
+def render_template_tag(replacer, static_path: str, matched: str, source_file: Path) -> str:
+    """ارجاع static در template با dialect پروژه"""
+    return render_dialect(replacer.dialect, static_path) + trailing_quote(matched)
+
+
+class FileType(NamedTuple):
+    """یک نوع فایل قابل اسکن: کجا، با چه پسوندی، لینک‌ها چطور پیدا و نوشته میشن"""
+    name: str
+    root: str                                   # templates، static یا project
+    extensions: Tuple[str, ...]
+    tokenizer: Optional[Callable] = None        # None = کل متن (یا tokens طبق match_mode)
+    render: Optional[Callable] = None           # None = replacement خود mapping
+
+
+FILE_TYPES: Dict[str, FileType] = {}
+
+
+def register_file_type(file_type: FileType):
+    """اضافه کردن (یا جایگزینی) یک نوع فایل؛ با نامش در تنظیمات file_types فعال میشه"""
+    FILE_TYPES[file_type.name] = file_type
+
+
+register_file_type(FileType('templates', 'templates', ('.html', '.htm', '.jinja', '.jinja2', '.j2'),
+                            render=render_template_tag))
+register_file_type(FileType('css', 'static', ('.css',), iter_url_tokens, render_relative))
+register_file_type(FileType('js', 'static', ('.js',), iter_string_tokens, render_static_url))
+register_file_type(FileType('python', 'project', ('.py',), iter_url_tokens, render_static_url))
+register_file_type(FileType('markdown', 'project', ('.md',), iter_markdown_tokens, render_static_url))
+
+# پوشه‌هایی که در پیمایش پروژه دیده نمیشن
+SKIP_DIRS = {'node_modules', '__pycache__', 'venv', 'env', 'site-packages', 'staticfiles', 'media'}
+
+# کپی فایل‌های غیر template قبل از تغییر، داخل پوشه بکاپ همون اجرا
+SOURCES_BACKUP_DIR = '.sources'
+
+
+# فایل‌های نمونه‌ای که create_placeholder_files می‌سازه از این کوچیک‌ترن
+PLACEHOLDER_MAX_SIZE = 256
+PLACEHOLDER_MARKER = b'Placeholder for '
+
+
+def placeholder_content(cdn_name: str, suffix: str) -> str:
+    """محتوای فایل نمونه برای یک mapping"""
+    if suffix == '.css':
+        return f"/* Placeholder for {cdn_name} */\n/* Download from CDN and replace this file */\n"
+    if suffix == '.js':
+        return f"// Placeholder for {cdn_name}\n// Download from CDN and replace this file\n"
+    return f"# Placeholder for {cdn_name}\n"
+
+
+def list_static_files(static_dir: Path) -> Dict[str, int]:
+    """یک پیمایش scandir از پوشه static: مسیر نسبی → اندازه"""
+    files = {}
+    stack = [(str(static_dir), '')]
+    
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append((entry.path, prefix + entry.name + '/'))
+                    else:
+                        files[prefix + entry.name] = entry.stat().st_size
+        except OSError:
+            continue
+    
+    return files
+
+
+def classify_static_file(static_dir: Path, listing: Dict[str, int], file_path: str, cdn_name: str) -> str:
+    """وضعیت فایل یک mapping: ok، missing، empty یا placeholder
+
+    فقط فایل‌های خیلی کوچیک خونده میشن: اول اندازه، بعد محتوا با امضای فایل نمونه.
+    """
+    size = listing.get(file_path)
+    
+    if size is None:
+        return 'missing'
+    if size == 0:
+        return 'empty'
+    if size > PLACEHOLDER_MAX_SIZE:
+        return 'ok'
+    
+    try:
+        with open(static_dir / file_path, 'rb') as f:
+            data = f.read(PLACEHOLDER_MAX_SIZE + 1)
+    except OSError:
+        return 'missing'
+    
+    expected = placeholder_content(cdn_name, Path(file_path).suffix).encode('utf-8')
+    if data.replace(b'\r\n', b'\n') == expected or PLACEHOLDER_MARKER in data:
+        return 'placeholder'
+    
+    return 'ok'
 
 
 class ConfigManager:
@@ -55,7 +309,15 @@ class ConfigManager:
                 "backup_dir_name": "backup_templates_{timestamp}",
                 "save_log": True,
                 "log_dir": "logs",
-                "dry_run_first": True
+                "dry_run_first": True,
+                "regex_cost_threshold_ms_per_kb": 1.0,
+                "match_mode": "full",
+                "mmap_threshold_kb": 1024,
+                "fingerprint_assets": False,
+                "replacement_cache_mb": 64,
+                "file_types": ["templates"],
+                "scan_workers": 1,
+                "versioned_assets": False
             },
             "cdn_mappings": {}
         }
@@ -79,26 +341,34 @@ class ConfigManager:
         return self.config.get('projects', {}).get(project_id)
     
     def get_cdn_mappings(self) -> List[Tuple[str, str, str]]:
-        """دریافت نقشه‌های CDN (pattern, replacement, file_path)"""
+        """دریافت نقشه‌های CDN (pattern, replacement, file_path)
+        
+        mapping جدید فقط مسیر فایل (asset) داره و replacement با dialect جنگو
+        ساخته میشه؛ هر پروژه موقع جایگزینی با dialect خودش می‌نویسه.
+        """
         mappings = []
         cdn_map = self.config.get('cdn_mappings', {})
         
         for cdn_name, cdn_data in cdn_map.items():
             if cdn_data.get('enabled', True):
-                # استخراج مسیر فایل از replacement
-                replacement = cdn_data['replacement']
-                
-                # مثال: {% static 'js/auto_jquery.min.js' %}"
-                # استخراج: js/auto_jquery.min.js
-                file_path_match = re.search(r"'([^']+)'", replacement)
-                if file_path_match:
-                    file_path = file_path_match.group(1)
+                if 'asset' in cdn_data:
+                    file_path = cdn_data['asset']
+                    replacement = render_dialect('django', file_path) + '"'
                 else:
-                    file_path = None
+                    # استخراج مسیر فایل از replacement
+                    replacement = cdn_data['replacement']
+                    
+                    # مثال: {% static 'js/auto_jquery.min.js' %}"
+                    # استخراج: js/auto_jquery.min.js
+                    file_path_match = re.search(r"'([^']+)'", replacement)
+                    if file_path_match:
+                        file_path = file_path_match.group(1)
+                    else:
+                        file_path = None
                 
                 mappings.append((
                     cdn_data['pattern'],
-                    cdn_data['replacement'],
+                    replacement,
                     file_path,
                     cdn_name
                 ))
@@ -113,6 +383,9 @@ class ConfigManager:
 class CDNReplacer:
     """جایگزین‌ساز CDN"""
     
+    # سقف فایل‌های match_cache (قدیمی‌ترین حذف میشه)
+    MATCH_CACHE_ENTRIES = 20000
+    
     def __init__(self, project_config: Dict, cdn_mappings: List, settings: Dict):
         self.project_name = project_config.get('name', 'Unknown')
         self.project_dir = Path(project_config['path'])
@@ -126,55 +399,237 @@ class CDNReplacer:
         self.replacements = cdn_mappings
         self.settings = settings
         
+        # قالب ارجاع static در template ها (django، jinja2/flask)
+        self.dialect = project_config.get('dialect', 'django')
+        if self.dialect not in DIALECTS:
+            print(f"⚠️ dialect ناشناخته '{self.dialect}' برای {self.project_name}، django استفاده میشه")
+            self.dialect = 'django'
+        
+        # mapping هایی که فایلشون از libraries.json نصب میشه: cdn_name → (کتابخانه، مسیر بدون hash)
+        # با versioned_assets نسخه‌ای که الگو (گروه version) می‌گیره در مسیر فایل میاد
+        self.versioned = settings.get('versioned_assets', False)
+        self.library_assets = self.find_library_assets(cdn_mappings)
+        
+        # استفاده از نام‌های hash دار (auto_bootstrap.<hash8>.min.css) که دانلودر ساخته
+        if settings.get('fingerprint_assets', False):
+            self.replacements = self.fingerprint_replacements(cdn_mappings)
+        
+        # الگوها یک بار کامپایل میشن، نه برای هر فایل (مستقل از dialect، پس بین همه
+        # پروژه‌ها مشترک)
+        key = pattern_key(cdn_mappings)
+        self.compiled_patterns = compile_patterns(key)
+        
+        # نسخه bytes الگوها برای مسیر mmap فایل‌های خیلی بزرگ
+        self.compiled_byte_patterns = compile_patterns(key, as_bytes=True)
+        self.mmap_threshold = settings.get('mmap_threshold_kb', 1024) * 1024
+        
+        # full: اجرای الگوها روی کل فایل / tokens: فقط روی مقادیر src/href/url()
+        self.match_mode = settings.get('match_mode', 'full')
+        
+        # هزینه هر mapping در طول اجرا (زمان و حجم متن بررسی شده)
+        self.cost_threshold = settings.get('regex_cost_threshold_ms_per_kb', 1.0)
+        self.mapping_costs = {
+            cdn_name: {'seconds': 0.0, 'chars': 0, 'matches': 0}
+            for _, _, _, cdn_name in cdn_mappings
+        }
+        
+        # ایندکس معکوس اختیاری که اسکن‌ها بهش گزارش میدن
+        self.index = None
+        self.index_project = None
+        
+        # cache نتیجه مشترک بین پروژه‌ها (replacement_cache.ReplacementCache)
+        self.result_cache = None
+        mapping_key = json.dumps([self.match_mode, self.dialect, self.versioned] +
+                                 [list(m) for m in self.replacements])
+        self.mapping_hash = hashlib.sha256(mapping_key.encode('utf-8')).hexdigest()
+        
+        # انواع فایل فعال (FILE_TYPES) و نوع هر فایل پیدا شده در پیمایش
+        self.file_types = [FILE_TYPES[name] for name in settings.get('file_types', ['templates'])
+                           if name in FILE_TYPES]
+        self.source_types: Dict[Path, FileType] = {}
+        self.static_paths = {cdn_name: file_path for _, _, file_path, cdn_name in self.replacements}
+        
+        # mapping هایی که ارجاع استاندارد static دارن با dialect نوشته میشن؛
+        # replacement سفارشی در template ها دست نمی‌خوره
+        self.dialect_paths = {
+            cdn_name: file_path for _, replacement, file_path, cdn_name in self.replacements
+            if file_path and self.is_static_tag(replacement, file_path)
+        }
+        # پیش‌فرض پشت سر هم؛ اسکن موازی با scan_workers > 1 انتخابی است
+        self.scan_workers = settings.get('scan_workers', 1)
+        self.lock = threading.Lock()
+        
+        # بازه‌های تطبیق اجرای تست (شمارش یا patch): مسیر فایل → (sha256 محتوا، تطبیق‌ها)
+        # اجرای واقعی بعدی روی همین نمونه، فایل‌های تغییر نکرده رو دوباره اسکن نمی‌کنه؛
+        # بعد از هر اجرای واقعی خالی میشه
+        self.match_cache: Dict[Path, Tuple[str, List]] = {}
+        
+        self.reset_stats()
+    
+    def reset_stats(self):
+        """صفر کردن آمار (بین اجرای تست و اجرای واقعی روی یک نمونه)"""
         self.stats = {
             'files_scanned': 0,
             'files_modified': 0,
             'replacements_made': 0,
+            'cached_files': 0,
             'errors': 0,
             'missing_files': [],
-            'copied_files': []
+            'placeholder_files': [],
+            'copied_files': [],
+            'drifted_files': []
         }
         
         self.detailed_log = []
     
-    def check_static_files(self):
-        """بررسی وجود فایل‌های static"""
+    @staticmethod
+    def find_library_assets(cdn_mappings: List) -> Dict[str, Tuple[str, str]]:
+        """mapping هایی که فایلشون رو دانلودر از libraries.json نصب می‌کنه"""
+        found = {}
+        
+        for _, _, file_path, cdn_name in cdn_mappings:
+            library = asset_library(file_path) if file_path else None
+            if library:
+                found[cdn_name] = (library, file_path)
+        
+        return found
+    
+    def match_version(self, cdn_name: str, content, start: int, end: int) -> Optional[str]:
+        """نسخه لینک در بازه تطبیق (None = الگو گروه version نداره، نسخه نگرفت یا نامعتبره)"""
+        pattern = self._patterns_for(content)[cdn_name]
+        if cdn_name not in self.library_assets or 'version' not in pattern.groupindex:
+            return None
+        
+        match = pattern.match(content, start, end)
+        version = match.group('version') if match else None
+        
+        if version is not None and not isinstance(version, str):
+            version = version.decode('ascii', errors='replace')
+        
+        return version if version and VERSION_RE.fullmatch(version) else None
+    
+    @staticmethod
+    def is_static_tag(replacement: str, file_path: str) -> bool:
+        """replacement همون {% static 'file_path' %} است (با کوتیشن آخر یا بدون)"""
+        match = STATIC_TAG_RE.fullmatch(replacement)
+        return match is not None and match.group(2) == file_path
+    
+    def fingerprint_replacements(self, cdn_mappings: List) -> List:
+        """جایگزینی مسیر فایل‌ها با نسخه hash دار ثبت شده در static_integrity.json"""
+        manifest = IntegrityManifest(self.static_dir)
+        mappings = []
+        
+        for pattern, replacement, file_path, cdn_name in cdn_mappings:
+            hashed = manifest.fingerprinted(file_path) if file_path else None
+            
+            if hashed:
+                replacement = replacement.replace(file_path, hashed)
+                file_path = hashed
+            
+            mappings.append((pattern, replacement, file_path, cdn_name))
+        
+        return mappings
+    
+    def refresh_fingerprints(self) -> Dict[str, int]:
+        """بردن ارجاع‌های نسخه‌های hash دار قبلی به نسخه فعلی (با بکاپ)، بعد حذف نسخه‌های بدون ارجاع
+        
+        بعد از هر نصب (دانلود، import، subset) و اجرای واقعی؛ لینک‌هایی که قبلا با
+        {% static %} جایگزین شدن دیگه با الگوهای CDN پیدا نمیشن.
+        """
+        manifest = IntegrityManifest(self.static_dir)
+        result = {'repointed': 0, 'removed': 0}
+        
+        if not manifest.fingerprint_moves():
+            return result
+        
+        sources = [file_path for file_path, _ in self.find_source_files()]
+        seen = set(sources)
+        sources += [file_path for file_path in manifest.static_sources() if file_path not in seen]
+        
+        for file_path in sources:
+            try:
+                with open(file_path, 'r', encoding='utf-8', newline='') as f:
+                    content = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"   ❌ {file_path}: {e}")
+                continue
+            
+            new_content, count = manifest.repoint_content(content, file_path)
+            if count:
+                self.backup_file(file_path)
+                with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(new_content)
+                result['repointed'] += 1
+        
+        removed = manifest.prune_fingerprints(sources)
+        result['removed'] = len(removed)
+        
+        if removed:
+            manifest.save()
+        
+        if result['repointed']:
+            print(f"🔗 ارجاع به نسخه hash دار جدید در {result['repointed']} فایل به‌روز شد")
+        if removed:
+            print(f"🧹 نسخه‌های hash دار قدیمی حذف شد: {len(removed)}")
+        
+        return result
+    
+    def check_static_files(self, create_placeholders: Optional[bool] = None):
+        """بررسی وجود فایل‌های static
+        
+        create_placeholders=None یعنی از کاربر پرسیده بشه؛ True/False برای اجرای
+        بدون ترمینال.
+        """
         print("🔍 بررسی فایل‌های static...")
         print("-" * 70)
         
         missing_files = []
+        placeholders = []
+        
+        # پوشه static یک بار لیست میشه، نه exists() برای هر فایل
+        listing = list_static_files(self.static_dir)
         
         for pattern, replacement, file_path, cdn_name in self.replacements:
             if not file_path:
                 continue
             
-            # مسیر کامل فایل
-            full_path = self.static_dir / file_path
+            status = classify_static_file(self.static_dir, listing, file_path, cdn_name)
             
-            if not full_path.exists():
+            if status == 'missing':
                 missing_files.append({
                     'name': cdn_name,
                     'path': file_path,
-                    'full_path': full_path
+                    'full_path': self.static_dir / file_path
                 })
                 print(f"   ❌ {file_path}")
+            elif status != 'ok':
+                placeholders.append(file_path)
+                print(f"   🟡 {file_path} ({'خالی' if status == 'empty' else 'فایل نمونه'} - باید دانلود بشه)")
             else:
                 print(f"   ✅ {file_path}")
         
         print()
         
+        self.stats['missing_files'] = [f['path'] for f in missing_files]
+        self.stats['placeholder_files'] = placeholders
+        
         if missing_files:
             print(f"⚠️ {len(missing_files)} فایل یافت نشد!")
             print()
-            print("💡 می‌خوای فایل‌های نمونه (placeholder) بسازم؟")
-            print("   این فایل‌ها خالی هستن، باید خودت CDN رو دانلود کنی")
-            print()
             
-            choice = input("ساخت فایل‌های نمونه؟ (yes/no): ").strip().lower()
+            if create_placeholders is None:
+                print("💡 می‌خوای فایل‌های نمونه (placeholder) بسازم؟")
+                print("   این فایل‌ها خالی هستن، باید خودت CDN رو دانلود کنی")
+                print()
+                
+                choice = input("ساخت فایل‌های نمونه؟ (yes/no): ").strip().lower()
+                create_placeholders = choice in ['yes', 'y', 'بله', 'آره']
             
-            if choice in ['yes', 'y', 'بله', 'آره']:
+            if create_placeholders:
                 self.create_placeholder_files(missing_files)
         
+        elif placeholders:
+            print(f"⚠️ همه فایل‌ها موجودن ولی {len(placeholders)} فایل هنوز نمونه/خالی است")
         else:
             print("✅ همه فایل‌ها موجود هستند!")
         
@@ -196,12 +651,7 @@ class CDNReplacer:
                 full_path.parent.mkdir(parents=True, exist_ok=True)
                 
                 # ساخت فایل خالی با کامنت
-                if full_path.suffix == '.css':
-                    content = f"/* Placeholder for {file_info['name']} */\n/* Download from CDN and replace this file */\n"
-                elif full_path.suffix == '.js':
-                    content = f"// Placeholder for {file_info['name']}\n// Download from CDN and replace this file\n"
-                else:
-                    content = f"# Placeholder for {file_info['name']}\n"
+                content = placeholder_content(file_info['name'], full_path.suffix)
                 
                 with open(full_path, 'w', encoding='utf-8') as f:
                     f.write(content)
@@ -232,7 +682,9 @@ class CDNReplacer:
         
         try:
             if self.templates_dir.exists():
-                shutil.copytree(self.templates_dir, self.backup_dir)
+                # فایل‌هایی که قبلا تکی بکاپ شدن (backup_file) نسخه اصلی‌ان و رونویسی نمیشن
+                shutil.copytree(self.templates_dir, self.backup_dir, dirs_exist_ok=True,
+                                copy_function=self.copy_if_missing)
                 print(f"   ✅ بکاپ ایجاد شد: {self.backup_dir.name}")
                 return True
             else:
@@ -244,57 +696,600 @@ class CDNReplacer:
     
     def find_template_files(self) -> List[Path]:
         """پیدا کردن فایل‌های template"""
-        if not self.templates_dir.exists():
-            return []
+        return [path for path, _ in self.find_source_files([FILE_TYPES['templates']])]
+    
+    def find_source_files(self, file_types: Optional[List[FileType]] = None) -> List[Tuple[Path, FileType]]:
+        """همه فایل‌های قابل اسکن همه انواع فعال در یک پیمایش
+        
+        فقط templates فعال باشه = فقط پوشه templates؛ در غیر این صورت کل پروژه.
+        فایل‌های نصب شده توسط دانلودر (auto_*) و بکاپ‌ها/لاگ‌ها رد میشن.
+        """
+        file_types = self.file_types if file_types is None else file_types
+        found = []
+        
+        for root in self.source_roots(file_types):
+            if not root.exists():
+                continue
+            
+            for directory, dirs, files in os.walk(root):
+                dirs[:] = sorted(d for d in dirs if not self.skip_dir(d))
+                
+                for name in sorted(files):
+                    path = Path(directory) / name
+                    file_type = self.classify_file(path, file_types)
+                    if file_type is not None:
+                        found.append((path, file_type))
+        
+        with self.lock:
+            self.source_types.update(found)
+        
+        return found
+    
+    def source_roots(self, file_types: Optional[List[FileType]] = None) -> List[Path]:
+        """پوشه‌هایی که فایل‌های انواع فعال زیرشون پیدا میشن"""
+        file_types = self.file_types if file_types is None else file_types
+        
+        if all(file_type.root == 'templates' for file_type in file_types):
+            return [self.templates_dir]
+        
+        roots = [self.project_dir]
+        if not self.templates_dir.is_relative_to(self.project_dir):
+            roots.append(self.templates_dir)
+        return roots
+    
+    def skip_dir(self, name: str) -> bool:
+        """پوشه‌هایی که اسکن نمیشن (مخفی، وابستگی‌ها، لاگ و بکاپ‌ها)"""
+        backup_prefix = self.settings.get('backup_dir_name', 'backup_{timestamp}').split('{timestamp}')[0]
+        return (name.startswith('.') or name in SKIP_DIRS or name == self.settings.get('log_dir', 'logs')
+                or bool(backup_prefix and name.startswith(backup_prefix)))
+    
+    def classify_file(self, path: Path, file_types: Optional[List[FileType]] = None) -> Optional[FileType]:
+        """نوع یک فایل بر اساس محل و پسوندش"""
+        suffix = path.suffix.lower()
+        root = 'project'
+        
+        # پوشه عمیق‌تر اول (اگه یکی داخل اون یکی باشه)
+        for directory, name in sorted([(self.templates_dir, 'templates'), (self.static_dir, 'static')],
+                                      key=lambda item: len(item[0].parts), reverse=True):
+            if path.is_relative_to(directory):
+                root = name
+                break
+        
+        # فایل‌های کتابخانه‌ها که دانلودر نصب کرده
+        if root == 'static' and any(part.startswith('auto_') for part in path.relative_to(self.static_dir).parts):
+            return None
+        
+        for file_type in (self.file_types if file_types is None else file_types):
+            if suffix in file_type.extensions and file_type.root in (root, 'project' if root == 'templates' else None):
+                return file_type
+        
+        return None
+    
+    def file_type_for(self, file_path: Path) -> FileType:
+        """نوع فایل (پیش‌فرض template برای فایل‌هایی که مستقیم داده شدن)"""
+        file_type = self.source_types.get(file_path)
+        if file_type is None:
+            file_type = self.classify_file(file_path, list(FILE_TYPES.values())) or FILE_TYPES['templates']
+        return file_type
+    
+    def source_root(self, file_type: FileType) -> Path:
+        """پوشه‌ای که مسیر فایل در لاگ، patch و ایندکس نسبت بهش ثبت میشه"""
+        return self.templates_dir if file_type.root == 'templates' else self.project_dir
+    
+    @staticmethod
+    def copy_if_missing(src: str, dest: str):
+        """کپی بدون رونویسی بکاپ موجود"""
+        if not os.path.exists(dest):
+            shutil.copy2(src, dest)
+    
+    def backup_file(self, file_path: Path):
+        """کپی فایل قبل از اولین تغییر، داخل بکاپ همین اجرا
         
-        extensions = ['.html', '.htm', '.jinja', '.jinja2', '.j2']
-        template_files = []
+        template ها با همون چیدمان بکاپ کامل، بقیه زیر .sources؛ برای مسیرهایی که
+        بکاپ کامل نمی‌سازن (watch، سرویس) هم همین بکاپ رو نگه می‌داره.
+        """
+        if not self.settings.get('create_backup', True):
+            return
         
-        for ext in extensions:
-            template_files.extend(self.templates_dir.rglob(f'*{ext}'))
+        if file_path.is_relative_to(self.templates_dir):
+            dest = self.backup_dir / file_path.relative_to(self.templates_dir)
+        else:
+            dest = self.backup_dir / SOURCES_BACKUP_DIR / file_path.relative_to(self.project_dir)
         
-        return template_files
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(file_path, dest)
     
     def replace_in_file(self, file_path: Path) -> Tuple[bool, int, List]:
         """جایگزینی CDN در فایل"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            result = self._replace_in_file(file_path)
+        except Exception as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            print(f"   ❌ خطا: {e}")
+            return False, 0, []
+        
+        # بعد از جایگزینی هیچ لینک CDN شناخته شده‌ای در فایل نمونده
+        if self.index is not None:
+            root = self.source_root(self.file_type_for(file_path))
+            self.index.record(self.index_project, file_path, root, [])
+        
+        return result
+    
+    def _replace_in_file(self, file_path: Path) -> Tuple[bool, int, List]:
+        """جایگزینی CDN در فایل (بدون مدیریت خطا)"""
+        file_type = self.file_type_for(file_path)
+        is_template = file_type.root == 'templates'
+        
+        if is_template and file_path.stat().st_size >= self.mmap_threshold:
+            return self._replace_in_file_mmap(file_path)
+        
+        # newline='' مثل diff_file (read_bytes): \r\n می‌مونه تا digest و بازه‌های اجرای تست معتبر باشن
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            content = f.read()
+        
+        # خروجی فایل‌های غیر template به محلشون بستگی داره (مسیر نسبی)، پس فقط template ها در cache مشترک
+        result_cache = self.result_cache if is_template else None
+        digest = self.content_hash(content) if result_cache is not None or self.match_cache else None
+        
+        if result_cache is not None:
+            cached = self.result_cache.get((digest, self.mapping_hash))
             
-            original_content = content
-            replacements_count = 0
-            replaced_items = []
+            if cached == NO_MATCH:
+                return False, 0, []
             
-            for pattern, replacement, file_path_in_static, cdn_name in self.replacements:
-                matches = list(re.finditer(pattern, content, re.IGNORECASE))
+            if cached is not None:
+                new_content, items = cached
+                self.backup_file(file_path)
+                with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(new_content)
+                return True, len(items), [dict(item) for item in items]
+        
+        matches = self.cached_matches(file_path, content, digest)
+        
+        if not matches:
+            if result_cache is not None:
+                result_cache.put((digest, self.mapping_hash), NO_MATCH)
+            return False, 0, []
+        
+        parts = []
+        replaced_items = []
+        last_end = 0
+        
+        for start, end, cdn_name, replacement in matches:
+            old_link = content[start:end]
+            parts.append(content[last_end:start])
+            parts.append(replacement)
+            last_end = end
+            
+            replaced_items.append(self._log_item(cdn_name, old_link, replacement))
+        
+        parts.append(content[last_end:])
+        new_content = ''.join(parts)
+        
+        self.backup_file(file_path)
+        
+        with open(file_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(new_content)
+        
+        if result_cache is not None:
+            result_cache.put((digest, self.mapping_hash), (new_content, replaced_items))
+            replaced_items = [dict(item) for item in replaced_items]
+        
+        return True, len(matches), replaced_items
+    
+    def _replace_in_file_mmap(self, file_path: Path) -> Tuple[bool, int, List]:
+        """جایگزینی در فایل‌های بزرگ بدون decode کل فایل
+        
+        فایل با mmap باز میشه و الگوهای bytes مستقیم روش اجرا میشن. فقط اگه
+        تطبیقی پیدا بشه خروجی با چسباندن بازه‌های دست‌نخورده (memoryview) و
+        بایت‌های جایگزین در یک فایل موقت نوشته و جایگزین فایل اصلی میشه.
+        """
+        with open(file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                matches = self.cached_matches(file_path, mm)
+                
+                if not matches:
+                    return False, 0, []
                 
-                if matches:
-                    for match in matches:
-                        old_link = match.group(0)
-                        content = content.replace(old_link, replacement)
-                        replacements_count += 1
+                replaced_items = []
+                view = memoryview(mm)
+                fd, tmp_name = tempfile.mkstemp(dir=file_path.parent, prefix='.cdn_', suffix='.tmp')
+                
+                try:
+                    with os.fdopen(fd, 'wb') as out:
+                        last_end = 0
+                        
+                        for start, end, cdn_name, replacement in matches:
+                            out.write(view[last_end:start])
+                            out.write(replacement.encode('utf-8'))
+                            last_end = end
+                            
+                            old_link = mm[start:end].decode('utf-8', errors='replace')
+                            replaced_items.append(self._log_item(cdn_name, old_link, replacement))
                         
-                        replaced_items.append({
-                            'cdn': cdn_name,
-                            'from': old_link[:80] + '...' if len(old_link) > 80 else old_link,
-                            'to': replacement
-                        })
+                        out.write(view[last_end:])
+                finally:
+                    view.release()
+        
+        try:
+            self.backup_file(file_path)
+            shutil.copymode(file_path, tmp_name)
+            os.replace(tmp_name, file_path)
+        except Exception:
+            os.unlink(tmp_name)
+            raise
+        
+        return True, len(matches), replaced_items
+    
+    def scan_file(self, file_path: Path) -> List[Tuple[int, int, str, str]]:
+        """تطبیق‌های یک فایل بدون تغییر دادنش"""
+        is_template = self.file_type_for(file_path).root == 'templates'
+        
+        if is_template and file_path.stat().st_size >= self.mmap_threshold:
+            with open(file_path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    matches = self.collect_matches(mm, file_path)
+                    self._index_matches(file_path, mm, matches)
+                    self.remember_matches(file_path, self.content_hash(mm), matches)
+                    return matches
+        
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            content = f.read()
+        
+        matches = self.collect_matches(content, file_path)
+        self._index_matches(file_path, content, matches)
+        self.remember_matches(file_path, self.content_hash(content), matches)
+        return matches
+    
+    def remember_matches(self, file_path: Path, digest: str, matches: List):
+        """ثبت تطبیق‌های اجرای تست برای اجرای واقعی بعدی"""
+        with self.lock:
+            self.match_cache.pop(file_path, None)
+            self.match_cache[file_path] = (digest, matches)
             
-            if content != original_content:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
+            while len(self.match_cache) > self.MATCH_CACHE_ENTRIES:
+                del self.match_cache[next(iter(self.match_cache))]
+    
+    @staticmethod
+    def content_hash(content) -> str:
+        """sha256 متن فایل (str یا bytes/mmap)"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return hashlib.sha256(content).hexdigest()
+    
+    def cached_matches(self, file_path: Path, content, digest: Optional[str] = None) -> List[Tuple[int, int, str, str]]:
+        """تطبیق‌های اجرای تست اگه فایل از اون موقع تغییر نکرده، وگرنه اسکن کامل"""
+        with self.lock:
+            cached = self.match_cache.pop(file_path, None)
+        
+        if cached is not None and cached[0] == (digest or self.content_hash(content)):
+            with self.lock:
+                self.stats['cached_files'] += 1
+            return cached[1]
+        
+        return self.collect_matches(content, file_path)
+    
+    def open_index(self, project_id: str):
+        """وصل شدن به ایندکس مشترک (index_file تنظیمات)؛ با save_log ذخیره میشه"""
+        # cdn_index خودش replace_cdn رو import می‌کنه
+        from cdn_index import open_index
+        
+        self.attach_index(open_index(self.settings), project_id)
+    
+    def attach_index(self, index, project_id: str):
+        """ثبت نتایج اسکن در ایندکس معکوس (cdn_index.CDNIndex)"""
+        self.index = index
+        self.index_project = project_id
+    
+    def attach_cache(self, cache):
+        """استفاده از cache نتیجه مشترک (فقط مسیر متنی، نه فایل‌های mmap)"""
+        self.result_cache = cache
+    
+    def _index_matches(self, file_path: Path, content, matches: List):
+        """تبدیل تطبیق‌ها به (cdn_name, line, url) و ثبت در ایندکس"""
+        if self.index is None:
+            return
+        
+        newline = '\n' if isinstance(content, str) else b'\n'
+        hits = []
+        line = 1
+        last = 0
+        
+        for start, end, cdn_name, _ in matches:
+            line += content[last:start].count(newline)
+            last = start
+            
+            url = content[start:end]
+            if not isinstance(url, str):
+                url = url.decode('utf-8', errors='replace')
+            
+            hits.append((cdn_name, line, url.rstrip('"\'')))
+        
+        root = self.source_root(self.file_type_for(file_path))
+        self.index.record(self.index_project, file_path, root, hits)
+    
+    def count_matches(self, file_path: Path) -> int:
+        """تعداد تغییرات ممکن در یک فایل (برای حالت تست)"""
+        return len(self.scan_file(file_path))
+    
+    def scan_versions(self) -> Dict[str, List[Optional[str]]]:
+        """نسخه‌های هر کتابخانه که در فایل‌های پروژه ارجاع شدن (ورودی دانلودر)
+        
+        None یعنی لینکی که نسخه نداشت و با فایل نسخه پیش‌فرض جایگزین میشه.
+        """
+        def scan(file_path: Path) -> List[Tuple[str, Optional[str]]]:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except (OSError, UnicodeDecodeError):
+                return []
+            
+            return [(cdn_name, self.match_version(cdn_name, content, start, end))
+                    for start, end, cdn_name, _ in self.collect_matches(content, file_path)]
+        
+        paths = [file_path for file_path, _ in self.find_source_files()]
+        found: Dict[str, set] = {}
+        
+        for hits in self.map_files(scan, paths):
+            for cdn_name, version in hits:
+                library = self.library_assets.get(cdn_name, (None,))[0]
+                if library:
+                    found.setdefault(library, set()).add(version)
+        
+        return {lib: sorted(versions, key=lambda v: (v is not None, v or ''))
+                for lib, versions in sorted(found.items())}
+    
+    def diff_file(self, file_path: Path) -> Tuple[int, Optional[str]]:
+        """تطبیق‌های یک فایل به صورت متن diff برای patch (حالت تست)"""
+        data = file_path.read_bytes()
+        content = data.decode('utf-8')
+        
+        digest = hashlib.sha256(data).hexdigest()
+        matches = self.collect_matches(content, file_path)
+        self._index_matches(file_path, content, matches)
+        self.remember_matches(file_path, digest, matches)
+        
+        if not matches:
+            return 0, None
+        
+        file_type = self.file_type_for(file_path)
+        items = [self._log_item(cdn_name, content[start:end], replacement)
+                 for start, end, cdn_name, replacement in matches]
+        name = file_path.relative_to(self.source_root(file_type)).as_posix()
+        root = None if file_type.root == 'templates' else 'project'
+        
+        return len(matches), format_file_patch(name, digest, items,
+                                               content, matches, root)
+    
+    def default_patch_file(self) -> Path:
+        """مسیر پیش‌فرض patch در پوشه لاگ پروژه"""
+        log_dir = self.project_dir / self.settings.get('log_dir', 'logs')
+        return log_dir / f"replacement_{datetime.now().strftime('%Y%m%d_%H%M%S')}.patch"
+    
+    def latest_patch_file(self) -> Optional[Path]:
+        """جدیدترین patch ساخته شده در حالت تست"""
+        log_dir = self.project_dir / self.settings.get('log_dir', 'logs')
+        patches = sorted(log_dir.glob('replacement_*.patch')) if log_dir.exists() else []
+        return patches[-1] if patches else None
+    
+    def apply_patch(self, patch_file: Path):
+        """اعمال patch حالت تست بدون اجرای دوباره الگوها
+        
+        فایل‌هایی که hash شون با زمان تست فرق داره (بعدش تغییر کردن) رد میشن.
+        """
+        print("=" * 70)
+        print(f"🩹 اعمال patch: {patch_file}")
+        print(f"🔄 پروژه: {self.project_name}")
+        print("=" * 70)
+        print()
+        
+        for entry in read_patch(patch_file):
+            self.stats['files_scanned'] += 1
+            root = self.project_dir if entry['root'] == 'project' else self.templates_dir
+            file_path = root / entry['file']
+            
+            try:
+                # patch نباید بیرون پوشه templates (یا پروژه) رو تغییر بده
+                file_path.resolve().relative_to(root.resolve())
+                data = file_path.read_bytes()
                 
-                return True, replacements_count, replaced_items
-            else:
-                return False, 0, []
+                if hashlib.sha256(data).hexdigest() != entry['sha256']:
+                    self.stats['drifted_files'].append(entry['file'])
+                    print(f"⚠️ {entry['file']} بعد از تست تغییر کرده، رد شد")
+                    continue
                 
-        except Exception as e:
-            self.stats['errors'] += 1
-            print(f"   ❌ خطا: {e}")
-            return False, 0, []
+                new_content = apply_hunks(data.decode('utf-8'), entry['hunks'])
+                
+                self.backup_file(file_path)
+                
+                fd, tmp_name = tempfile.mkstemp(dir=file_path.parent, prefix='.cdn_', suffix='.tmp')
+                with os.fdopen(fd, 'wb') as out:
+                    out.write(new_content.encode('utf-8'))
+                shutil.copymode(file_path, tmp_name)
+                os.replace(tmp_name, file_path)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"❌ {entry['file']} - خطا: {e}")
+                continue
+            
+            if self.index is not None:
+                self.index.record(self.index_project, file_path, root, [])
+            
+            count = len(entry['items'])
+            self.stats['files_modified'] += 1
+            self.stats['replacements_made'] += count
+            print(f"✅ {entry['file']} ({count} تغییر)")
+            
+            log_entry = {
+                'file': entry['file'],
+                'replacements': count,
+                'items': entry['items']
+            }
+            if entry['root'] == 'project':
+                log_entry['root'] = 'project'
+            self.detailed_log.append(log_entry)
+        
+        print()
+        self.print_summary()
+    
+    def _log_item(self, cdn_name: str, old_link: str, replacement: str) -> Dict:
+        """یک ردیف لاگ برای یک جایگزینی"""
+        item = {
+            'cdn': cdn_name,
+            'from': old_link[:80] + '...' if len(old_link) > 80 else old_link,
+            'to': replacement
+        }
+        
+        # لینک کامل برای برگرداندن جایگزینی (rollback.py)
+        if len(old_link) > 80:
+            item['original'] = old_link
+        
+        return item
+    
+    def collect_matches(self, content, file_path: Optional[Path] = None) -> List[Tuple[int, int, str, str]]:
+        """پیدا کردن همه لینک‌های CDN به صورت (start, end, cdn_name, replacement)
+        
+        اولویت با ترتیب mapping ها در کانفیگه؛ بازه‌هایی که با یک تطبیق قبلی
+        هم‌پوشانی دارن نادیده گرفته میشن. content می‌تونه str یا bytes/mmap باشه
+        که در این صورت بازه‌ها بر حسب بایت هستن. نوع فایل (file_path) تعیین
+        می‌کنه لینک‌ها چطور پیدا و جایگزین بشن.
+        """
+        file_type = self.file_type_for(file_path) if file_path is not None else FILE_TYPES['templates']
+        
+        if file_type.tokenizer is not None:
+            return self.render_matches(
+                self._collect_token_matches(content, file_type.tokenizer), content, file_type, file_path)
+        
+        if self.match_mode == 'tokens':
+            return self.render_matches(self._collect_token_matches(content), content, file_type, file_path)
+        
+        claimed = []
+        
+        for pattern, replacement, _, cdn_name in self.replacements:
+            for match in self.find_matches(cdn_name, content):
+                start, end = match.span()
+                
+                if any(start < c_end and c_start < end for c_start, c_end, _, _ in claimed):
+                    continue
+                
+                claimed.append((start, end, cdn_name, replacement))
+        
+        claimed.sort()
+        return self.render_matches(claimed, content, file_type, file_path)
     
-    def process_all_files(self, dry_run=False):
-        """پردازش همه فایل‌ها"""
+    def render_matches(self, matches: List, content, file_type: FileType, file_path: Optional[Path]) -> List:
+        """نوشتن جایگزین هر تطبیق با قالب نوع فایل (dialect، مسیر نسبی، آدرس static ...)"""
+        if file_type.render is None:
+            return matches
+        
+        is_template = file_type.root == 'templates'
+        paths = self.dialect_paths if is_template else self.static_paths
+        rendered = []
+        
+        for start, end, cdn_name, replacement in matches:
+            static_path = paths.get(cdn_name)
+            
+            # هر نسخه فایل جدای خودش رو داره (auto_bootstrap/4.6.2/...)
+            if static_path and self.versioned:
+                version = self.match_version(cdn_name, content, start, end)
+                if version:
+                    library, asset = self.library_assets[cdn_name]
+                    static_path = versioned_asset(library, version, asset)
+            
+            if static_path:
+                matched = content[start:end]
+                if not isinstance(matched, str):
+                    matched = matched.decode('utf-8', errors='replace')
+                rendered.append((start, end, cdn_name,
+                                 file_type.render(self, static_path, matched, file_path)))
+            elif is_template:
+                # replacement سفارشی کانفیگ همون‌طور نوشته میشه
+                rendered.append((start, end, cdn_name, replacement))
+            # mapping بدون مسیر فایل فقط در template ها معنی داره
+        
+        return rendered
+    
+    def _collect_token_matches(self, content, tokenizer: Callable = iter_url_tokens) -> List[Tuple[int, int, str, str]]:
+        """تطبیق فقط روی مقادیر لینک‌دار (پیش‌فرض src/href/url()/@import)
+        
+        الگوها فقط داخل همین بازه‌های کوتاه اجرا میشن، پس هزینه به تعداد لینک‌ها
+        بستگی داره نه به حجم فایل.
+        """
+        matches = []
+        patterns = self._patterns_for(content)
+        costs = {cdn_name: 0.0 for cdn_name in patterns}
+        found = {cdn_name: 0 for cdn_name in patterns}
+        last_end = 0
+        
+        for start, end in tokenizer(content):
+            if start < last_end:
+                continue
+            
+            for pattern, replacement, _, cdn_name in self.replacements:
+                t0 = time.perf_counter()
+                match = patterns[cdn_name].search(content, start, end)
+                costs[cdn_name] += time.perf_counter() - t0
+                
+                if match:
+                    matches.append((match.start(), match.end(), cdn_name, replacement))
+                    found[cdn_name] += 1
+                    last_end = match.end()
+                    break
+        
+        with self.lock:
+            for cdn_name, elapsed in costs.items():
+                self.mapping_costs[cdn_name]['seconds'] += elapsed
+                self.mapping_costs[cdn_name]['chars'] += len(content)
+                self.mapping_costs[cdn_name]['matches'] += found[cdn_name]
+        
+        return matches
+    
+    def _patterns_for(self, content) -> Dict:
+        """الگوهای کامپایل شده متناسب با نوع متن (str یا bytes)"""
+        if isinstance(content, str):
+            return self.compiled_patterns
+        return self.compiled_byte_patterns
+    
+    def find_matches(self, cdn_name: str, content) -> List:
+        """اجرای الگوی یک mapping روی متن با ثبت هزینه"""
+        start = time.perf_counter()
+        matches = list(self._patterns_for(content)[cdn_name].finditer(content))
+        elapsed = time.perf_counter() - start
+        
+        with self.lock:
+            cost = self.mapping_costs[cdn_name]
+            cost['seconds'] += elapsed
+            cost['chars'] += len(content)
+            cost['matches'] += len(matches)
+        
+        return matches
+    
+    def get_mapping_costs(self) -> Dict[str, Dict]:
+        """هزینه هر mapping به میلی‌ثانیه بر کیلوبایت"""
+        report = {}
+        
+        for cdn_name, cost in self.mapping_costs.items():
+            kb = cost['chars'] / 1024
+            ms_per_kb = (cost['seconds'] * 1000 / kb) if kb else 0.0
+            
+            report[cdn_name] = {
+                'total_ms': round(cost['seconds'] * 1000, 3),
+                'kb_scanned': round(kb, 1),
+                'matches': cost['matches'],
+                'ms_per_kb': round(ms_per_kb, 4),
+                'slow': ms_per_kb > self.cost_threshold
+            }
+        
+        return report
+    
+    def process_all_files(self, dry_run=False, patch_file: Optional[Path] = None):
+        """پردازش همه فایل‌ها
+        
+        در حالت تست با patch_file، تغییرات به صورت unified diff در فایل نوشته
+        میشن تا بعدا با apply_patch اعمال بشن.
+        """
         print("=" * 70)
         print(f"🔄 پروژه: {self.project_name}")
         print(f"📁 مسیر: {self.project_dir}")
@@ -305,54 +1300,103 @@ class CDNReplacer:
             print("⚠️ حالت تست (بدون تغییر)")
             print()
         
-        template_files = self.find_template_files()
+        source_files = self.find_source_files()
         
-        if not template_files:
+        if not source_files:
             print("❌ هیچ فایل template یافت نشد!")
             return
         
-        print(f"📄 تعداد فایل‌ها: {len(template_files)}")
+        print(f"📄 تعداد فایل‌ها: {len(source_files)}")
         print()
         
-        for i, file_path in enumerate(template_files, 1):
-            self.stats['files_scanned'] += 1
+        if dry_run and patch_file is not None:
+            with PatchWriter(patch_file) as writer:
+                self._process_files(source_files, dry_run, writer)
+            print()
+            print(f"🩹 patch: {patch_file} ({writer.files} فایل)")
+        else:
+            self._process_files(source_files, dry_run)
+        
+        if not dry_run:
+            with self.lock:
+                self.match_cache.clear()
             
-            relative_path = file_path.relative_to(self.templates_dir)
+            if self.settings.get('fingerprint_assets', False):
+                self.refresh_fingerprints()
+        
+        print()
+        self.print_summary()
+    
+    def map_files(self, func: Callable, paths: List[Path]) -> Iterator:
+        """اجرای func روی فایل‌ها به ترتیب؛ با scan_workers > 1 در thread pool"""
+        if self.scan_workers <= 1:
+            yield from map(func, paths)
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as executor:
+            yield from executor.map(func, paths)
+    
+    def _process_file(self, file_path: Path, dry_run: bool, with_patch: bool) -> Tuple:
+        """کار یک فایل داخل thread: (تغییر کرد، تعداد، ردیف‌ها یا متن patch، خطا)"""
+        if not dry_run:
+            modified, count, items = self.replace_in_file(file_path)
+            return modified, count, items, None
+        
+        try:
+            if with_patch:
+                count, patch_text = self.diff_file(file_path)
+                return False, count, patch_text, None
+            return False, self.count_matches(file_path), None, None
+        except Exception as e:
+            return False, 0, None, e
+    
+    def _process_files(self, source_files: List[Tuple[Path, FileType]], dry_run: bool,
+                       writer: Optional[PatchWriter] = None):
+        """حلقه اصلی روی همه فایل‌ها (موازی فقط با scan_workers > 1؛ نتایج به ترتیب پیمایش)"""
+        total = len(source_files)
+        paths = [file_path for file_path, _ in source_files]
+        
+        def work(file_path: Path) -> Tuple:
+            return self._process_file(file_path, dry_run, writer is not None)
+        
+        # نتایج به ترتیب پیمایش و فقط در همین thread شمرده و لاگ میشن
+        results = self.map_files(work, paths)
+        
+        for i, ((file_path, file_type), (modified, count, payload, error)) in enumerate(
+                zip(source_files, results), 1):
+            relative_path = file_path.relative_to(self.source_root(file_type))
+            
+            with self.lock:
+                self.stats['files_scanned'] += 1
             
             if not dry_run:
-                modified, count, items = self.replace_in_file(file_path)
-                
                 if modified:
-                    self.stats['files_modified'] += 1
-                    self.stats['replacements_made'] += count
-                    
-                    print(f"[{i}/{len(template_files)}] ✅ {relative_path} ({count} تغییر)")
+                    print(f"[{i}/{total}] ✅ {relative_path} ({count} تغییر)")
                     
-                    self.detailed_log.append({
+                    entry = {
                         'file': str(relative_path),
                         'replacements': count,
-                        'items': items
-                    })
+                        'items': payload
+                    }
+                    # مسیر فایل‌های غیر template نسبت به ریشه پروژه است
+                    if file_type.root != 'templates':
+                        entry['root'] = 'project'
+                    
+                    # worker های دیگه هنوز ممکنه stats (errors، cached_files) رو عوض کنن
+                    with self.lock:
+                        self.stats['files_modified'] += 1
+                        self.stats['replacements_made'] += count
+                        self.detailed_log.append(entry)
+            elif error is not None:
+                print(f"[{i}/{total}] ❌ {relative_path} - خطا: {error}")
             else:
                 # در حالت dry run فقط نشون بده چی میشه
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    count = 0
-                    for pattern, replacement, _, cdn_name in self.replacements:
-                        matches = list(re.finditer(pattern, content, re.IGNORECASE))
-                        count += len(matches)
-                    
-                    if count > 0:
-                        print(f"[{i}/{len(template_files)}] 🔍 {relative_path} ({count} تغییر ممکن)")
+                if payload:
+                    writer.write(payload)
                 
-                except Exception as e:
-                    print(f"[{i}/{len(template_files)}] ❌ {relative_path} - خطا: {e}")
-        
-        print()
-        self.print_summary()
-    
+                if count > 0:
+                    print(f"[{i}/{total}] 🔍 {relative_path} ({count} تغییر ممکن)")
+
     def print_summary(self):
         """خلاصه عملیات"""
         print("=" * 70)
@@ -362,19 +1406,37 @@ class CDNReplacer:
         print(f"✏️  تغییر یافته: {self.stats['files_modified']}")
         print(f"🔄 جایگزینی‌ها: {self.stats['replacements_made']}")
         
+        if self.stats['cached_files']:
+            print(f"♻️  بدون اسکن دوباره (از اجرای تست): {self.stats['cached_files']}")
+        
         if self.stats['copied_files']:
             print(f"📝 فایل‌های نمونه: {len(self.stats['copied_files'])}")
         
+        if self.stats['drifted_files']:
+            print(f"⚠️ تغییر کرده بعد از تست (رد شد): {len(self.stats['drifted_files'])}")
+        
         print(f"❌ خطاها: {self.stats['errors']}")
+        
+        slow = {k: v for k, v in self.get_mapping_costs().items() if v['slow']}
+        if slow:
+            print()
+            print(f"🐢 الگوهای کند (بیشتر از {self.cost_threshold} ms/KB):")
+            for cdn_name, cost in slow.items():
+                print(f"   ⚠️ {cdn_name}: {cost['ms_per_kb']} ms/KB ({cost['total_ms']} ms کل)")
+            print("💡 برای بررسی دقیق‌تر: python lint_patterns.py")
+        
         print("=" * 70)
     
-    def save_log(self):
-        """ذخیره لاگ"""
+    def save_log(self) -> Optional[Path]:
+        """ذخیره لاگ (و ایندکس وصل شده)"""
+        if self.index is not None:
+            self.index.save()
+        
         if not self.settings.get('save_log', True):
-            return
+            return None
         
         if not self.detailed_log:
-            return
+            return None
         
         log_dir = self.project_dir / self.settings.get('log_dir', 'logs')
         log_dir.mkdir(exist_ok=True)
@@ -387,12 +1449,32 @@ class CDNReplacer:
                     'project': self.project_name,
                     'timestamp': datetime.now().isoformat(),
                     'stats': self.stats,
+                    'mapping_costs': self.get_mapping_costs(),
                     'files': self.detailed_log
                 }, f, indent=2, ensure_ascii=False)
             
             print(f"\n📝 لاگ: {log_file}")
+            return log_file
         except Exception as e:
             print(f"\n⚠️ خطا در ذخیره لاگ: {e}")
+            return None
+
+
+def scan_fleet_versions(projects: Dict[str, Dict], cdn_mappings: List,
+                        settings: Dict) -> Dict[str, Dict[str, List[Optional[str]]]]:
+    """نسخه‌های ارجاع شده در هر پروژه (FleetDownloader با versioned_assets)"""
+    return {
+        proj_id: CDNReplacer(proj_data, cdn_mappings, settings).scan_versions()
+        for proj_id, proj_data in projects.items()
+    }
+
+
+def refresh_fleet_fingerprints(projects: Dict[str, Dict], settings: Dict) -> Dict[str, Dict[str, int]]:
+    """CDNReplacer.refresh_fingerprints برای همه پروژه‌ها (بعد از نصب دانلودر)"""
+    return {
+        proj_id: CDNReplacer(proj_data, [], settings).refresh_fingerprints()
+        for proj_id, proj_data in projects.items()
+    }
 
 
 def main():
@@ -476,6 +1558,20 @@ def main():
     
     for proj_id, proj_data in selected_projects:
         replacer = CDNReplacer(proj_data, cdn_mappings, settings)
+        replacer.open_index(proj_id)
+        
+        # اول تست؛ اجرای واقعی از تطبیق‌های همین تست استفاده می‌کنه
+        if not dry_run and settings.get('dry_run_first', True):
+            replacer.process_all_files(dry_run=True)
+            print()
+            
+            cont = input(f"اعمال روی {proj_data['name']}؟ (yes/no): ").strip().lower()
+            if cont not in ['yes', 'y', 'بله', 'آره']:
+                print("❌ رد شد")
+                continue
+            
+            replacer.reset_stats()
+            print()
         
         # بررسی فایل‌های static
         if not dry_run:
@@ -500,12 +1596,15 @@ def main():
                 continue
             print()
         
-        # جایگزینی
-        replacer.process_all_files(dry_run=dry_run)
+        # جایگزینی (حالت تست: patch برای اعمال بعدی با cli.py apply)
+        patch_file = replacer.default_patch_file() if dry_run else None
+        replacer.process_all_files(dry_run=dry_run, patch_file=patch_file)
         
         # ذخیره لاگ
         if not dry_run:
             replacer.save_log()
+        else:
+            replacer.index.save()
         
         print()
         print("-" * 70)
@@ -513,6 +1612,7 @@ def main():
     
     if dry_run:
         print("💡 این تست بود. برای اجرای واقعی گزینه 2 رو انتخاب کن.")
+        print("💡 یا همین patch رو بدون اسکن دوباره اعمال کن: python cli.py apply")
     else:
         print("🎉 تمام!")
     
@@ -0,0 +1,233 @@
+"""
+🩹 فایل patch برای حالت تست
+خروجی حالت تست یک unified diff کامل است که مستقیم (بدون اجرای دوباره الگوها)
+اعمال میشه. hash هر فایل در patch ثبت میشه تا اگه فایل بعد از تست تغییر کرد
+اعمال نشه.
+"""
+
+import os
+import re
+import json
+import bisect
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# خط اول هر فایل در patch (ابزار patch/git apply این خط‌ها رو نادیده می‌گیرن)
+FILE_MARKER = '# cdn-replacer sha256='
+ITEMS_MARKER = '# items: '
+NO_NEWLINE = '\\ No newline at end of file'
+
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# تعداد خط‌های زمینه اطراف هر تغییر
+CONTEXT_LINES = 3
+
+
+def split_lines(text: str) -> List[str]:
+    """تقسیم فقط روی \\n با نگه داشتن انتهای خط (\\r\\n دست نمی‌خوره)"""
+    parts = text.split('\n')
+    lines = [part + '\n' for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def build_hunks(content: str, matches: List[Tuple[int, int, str, str]],
+                context: int = CONTEXT_LINES) -> List[Tuple[int, int, int, int, List[Tuple[str, str]]]]:
+    """ساخت hunk ها مستقیم از بازه‌های تطبیق (بدون difflib)
+
+    خروجی: (شروع قدیم، تعداد قدیم، شروع جدید، تعداد جدید، [(علامت، خط)])
+    """
+    lines = split_lines(content)
+    starts = []
+    offset = 0
+    for line in lines:
+        starts.append(offset)
+        offset += len(line)
+
+    # خط‌های درگیر هر تطبیق؛ تطبیق‌های یک خط در یک بلاک
+    blocks: List[List] = []
+    for match in matches:
+        first = bisect.bisect_right(starts, match[0]) - 1
+        last = bisect.bisect_right(starts, match[1] - 1) - 1
+
+        if blocks and first <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], last)
+            blocks[-1][2].append(match)
+        else:
+            blocks.append([first, last, [match]])
+
+    changes = []
+    for first, last, block_matches in blocks:
+        base = starts[first]
+        old = lines[first:last + 1]
+        text = ''.join(old)
+
+        parts = []
+        cursor = 0
+        for start, end, _, replacement in block_matches:
+            parts.append(text[cursor:start - base])
+            parts.append(replacement)
+            cursor = end - base
+        parts.append(text[cursor:])
+
+        new = split_lines(''.join(parts))
+        if new != old:
+            changes.append((first, last, old, new))
+
+    # بلاک‌هایی که زمینه‌شون روی هم میفته در یک hunk
+    groups: List[List] = []
+    for change in changes:
+        if groups and change[0] - groups[-1][-1][1] - 1 <= 2 * context:
+            groups[-1].append(change)
+        else:
+            groups.append([change])
+
+    hunks = []
+    delta = 0
+
+    for group in groups:
+        hunk_start = max(0, group[0][0] - context)
+        hunk_end = min(len(lines), group[-1][1] + 1 + context)
+
+        body = [(' ', line) for line in lines[hunk_start:group[0][0]]]
+        for i, (first, last, old, new) in enumerate(group):
+            if i:
+                body.extend((' ', line) for line in lines[group[i - 1][1] + 1:first])
+            body.extend(('-', line) for line in old)
+            body.extend(('+', line) for line in new)
+        body.extend((' ', line) for line in lines[group[-1][1] + 1:hunk_end])
+
+        old_count = hunk_end - hunk_start
+        new_count = old_count + sum(len(new) - len(old) for _, _, old, new in group)
+        new_start = hunk_start + delta + (1 if new_count else 0)
+
+        hunks.append((hunk_start + 1, old_count, new_start, new_count, body))
+        delta += new_count - old_count
+
+    return hunks
+
+
+def apply_hunks(content: str, hunks: List[Tuple[int, int, int, int, List[Tuple[str, str]]]]) -> str:
+    """اعمال hunk ها روی متن فایل (هر خط زمینه و حذفی بررسی میشه)"""
+    lines = split_lines(content)
+    output = []
+    pos = 0
+
+    for old_start, old_count, _, _, body in hunks:
+        index = old_start - 1 if old_count else old_start
+        if index < pos:
+            raise ValueError(f"hunk @{old_start} out of order")
+
+        output.extend(lines[pos:index])
+        pos = index
+
+        for tag, line in body:
+            if tag in ' -':
+                if pos >= len(lines) or lines[pos] != line:
+                    raise ValueError(f"hunk @{old_start} does not match line {pos + 1}")
+                pos += 1
+            if tag in ' +':
+                output.append(line)
+
+    output.extend(lines[pos:])
+    return ''.join(output)
+
+
+def format_file_patch(name: str, sha256: str, items: List[Dict], content: str,
+                      matches: List[Tuple[int, int, str, str]], root: Optional[str] = None) -> Optional[str]:
+    """diff یک فایل همراه با hash و ردیف‌های لاگش
+
+    root='project' یعنی مسیر نسبت به ریشه پروژه است نه پوشه templates.
+    """
+    hunks = build_hunks(content, matches)
+    if not hunks:
+        return None
+
+    out = [
+        f"{FILE_MARKER}{sha256}" + (f" root={root}" if root else "") + "\n",
+        ITEMS_MARKER + json.dumps(items, ensure_ascii=False) + "\n",
+        f"--- a/{name}\n",
+        f"+++ b/{name}\n"
+    ]
+
+    for old_start, old_count, new_start, new_count, body in hunks:
+        out.append(f"@@ -{old_start},{old_count} +{new_start},{new_count} @@\n")
+        for tag, line in body:
+            out.append(tag + line)
+            if not line.endswith('\n'):
+                out.append("\n" + NO_NEWLINE + "\n")
+
+    return ''.join(out)
+
+
+class PatchWriter:
+    """نوشتن جریانی patch: هر فایل به محض بررسی شدن به دیسک میره"""
+
+    def __init__(self, patch_file: Path):
+        self.patch_file = Path(patch_file)
+        self.tmp_file = self.patch_file.with_name(self.patch_file.name + '.tmp')
+        self.files = 0
+        self.f = None
+
+    def __enter__(self):
+        self.patch_file.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(self.tmp_file, 'wb')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.f.close()
+        if exc_type is None:
+            os.replace(self.tmp_file, self.patch_file)
+        else:
+            self.tmp_file.unlink(missing_ok=True)
+        return False
+
+    def write(self, patch_text: str):
+        """نوشتن diff یک فایل (خروجی format_file_patch)"""
+        self.f.write(patch_text.encode('utf-8'))
+        self.files += 1
+
+
+def read_patch(patch_file: Path) -> Iterator[Dict]:
+    """خواندن جریانی patch: {file، sha256، root، items، hunks} برای هر فایل"""
+    entry = None
+    hunk = None
+    remaining_old = remaining_new = 0
+
+    with open(patch_file, 'rb') as f:
+        for raw in f:
+            line = raw.decode('utf-8')
+
+            if line.startswith('\\'):
+                # خط قبلی \n نداشت (آخر فایل)
+                tag, text = hunk[4][-1]
+                hunk[4][-1] = (tag, text[:-1])
+            elif hunk is not None and (remaining_old or remaining_new):
+                tag, text = line[0], line[1:]
+                hunk[4].append((tag, text))
+                if tag in ' -':
+                    remaining_old -= 1
+                if tag in ' +':
+                    remaining_new -= 1
+            elif line.startswith(FILE_MARKER):
+                if entry is not None:
+                    yield entry
+                sha256, _, root = line[len(FILE_MARKER):].strip().partition(' root=')
+                entry = {'file': None, 'sha256': sha256, 'root': root or None, 'items': [], 'hunks': []}
+                hunk = None
+            elif line.startswith(ITEMS_MARKER):
+                entry['items'] = json.loads(line[len(ITEMS_MARKER):])
+            elif line.startswith('+++ b/'):
+                entry['file'] = line[len('+++ b/'):].rstrip('\n')
+            elif line.startswith('@@'):
+                match = HUNK_RE.match(line)
+                old_count = int(match.group(2) or 1)
+                new_count = int(match.group(4) or 1)
+                hunk = (int(match.group(1)), old_count, int(match.group(3)), new_count, [])
+                entry['hunks'].append(hunk)
+                remaining_old, remaining_new = old_count, new_count
+
+    if entry is not None:
+        yield entry
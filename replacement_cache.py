@@ -0,0 +1,89 @@
+"""
+♻️ cache سراسری نتیجه جایگزینی
+پروژه‌هایی که از یک پایه fork شدن template های یکسان زیادی دارن (base.html،
+partials/). نتیجه جایگزینی هر محتوا یک بار حساب میشه و برای همه پروژه‌ها
+استفاده میشه.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+
+# نشانه «تطبیقی نداشت» (جدا از نبودن در cache)
+NO_MATCH = 'no-match'
+
+# هزینه تقریبی هر ردیف جدا از متن خروجی (کلید، لیست تغییرات)
+ENTRY_OVERHEAD = 256
+
+
+class ReplacementCache:
+    """(hash محتوا، hash مجموعه mapping) → (متن جدید، ردیف‌های لاگ) یا NO_MATCH
+
+    حجم کل محدوده و قدیمی‌ترین استفاده (LRU) اول حذف میشه. بین thread ها
+    مشترکه (cli --jobs، سرویس).
+    """
+
+    def __init__(self, max_mb: float = 64):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.entries: 'OrderedDict[Tuple[str, str], Tuple[Union[str, Tuple[str, List[Dict]]], int]]' = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[Union[str, Tuple[str, List[Dict]]]]:
+        """نتیجه ذخیره شده یا None"""
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple[str, str], value: Union[str, Tuple[str, List[Dict]]]):
+        """ثبت نتیجه و حذف قدیمی‌ترین‌ها تا حجم زیر سقف بمونه"""
+        size = ENTRY_OVERHEAD + (0 if value == NO_MATCH else len(value[0]))
+
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+            self.entries[key] = (value, size)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def get_metrics(self) -> Dict:
+        """آمار استفاده"""
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'entries': len(self.entries),
+                'size_mb': round(self.size / (1024 * 1024), 2),
+                'max_mb': round(self.max_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+def create_cache(settings: Dict) -> Optional[ReplacementCache]:
+    """cache بر اساس replacement_cache_mb در تنظیمات (0 = غیرفعال)"""
+    max_mb = settings.get('replacement_cache_mb', 64)
+    return ReplacementCache(max_mb) if max_mb > 0 else None
@@ -0,0 +1,393 @@
+"""
+🛰️ سرویس ماندگار جایگزینی CDN
+نگه داشتن کانفیگ، الگوهای کامپایل شده و نتایج اسکن در حافظه و پاسخ به
+درخواست‌ها روی localhost یا Unix socket
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+import socketserver
+from pathlib import Path
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from replace_cdn import ConfigManager, CDNReplacer, compile_patterns, pattern_key
+from replacement_cache import create_cache
+
+
+class ServiceError(Exception):
+    """خطای درخواست که با کد HTTP به کلاینت برمی‌گرده"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ReplacerService:
+    """هسته سرویس: همه چیزی که بین درخواست‌ها گرم می‌مونه"""
+
+    # تعداد نمونه‌های تاخیر نگه داشته شده برای هر endpoint
+    LATENCY_SAMPLES = 1000
+
+    # سقف تعداد فایل‌های cache اسکن (قدیمی‌ترین استفاده اول حذف میشه)
+    SCAN_CACHE_ENTRIES = 20000
+
+    def __init__(self, config_file="config.json"):
+        self.config_file = config_file
+        self.lock = threading.Lock()
+        self.project_locks: Dict[str, threading.Lock] = {}
+
+        # مسیر فایل → (mtime_ns, size, تطبیق‌ها)؛ بین thread ها مشترکه پس فقط با scan_lock
+        self.scan_cache: 'OrderedDict[Path, Tuple[int, int, List]]' = OrderedDict()
+        self.scan_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self.metrics: Dict[str, Dict] = {}
+        self.started_at = time.time()
+
+        self.reload()
+
+    def reload(self) -> Dict:
+        """بارگذاری دوباره کانفیگ و پاک کردن cache"""
+        config_manager = ConfigManager(self.config_file)
+
+        with self.lock:
+            self.projects = config_manager.get_projects()
+            self.cdn_mappings = config_manager.get_cdn_mappings()
+            self.settings = config_manager.get_settings()
+
+            with self.scan_lock:
+                self.scan_cache.clear()
+
+            # کلیدها شامل hash مجموعه mapping هستن؛ فقط سقف حجم ممکنه عوض شده باشه
+            self.result_cache = create_cache(self.settings)
+
+        # کامپایل الگوها همین حالا انجام میشه نه در اولین درخواست
+        key = pattern_key(self.cdn_mappings)
+        compile_patterns(key)
+        compile_patterns(key, as_bytes=True)
+
+        return {'projects': len(self.projects), 'mappings': len(self.cdn_mappings)}
+
+    def resolve_project(self, body: Dict) -> Tuple[str, Dict]:
+        """پیدا کردن پروژه از روی شناسه یا مسیر درخواست"""
+        if 'project' in body:
+            proj_id = body['project']
+            proj_data = self.projects.get(proj_id)
+
+            if proj_data is None:
+                raise ServiceError(f"پروژه {proj_id} یافت نشد", 404)
+
+            return proj_id, proj_data
+
+        if 'path' in body:
+            # فقط پروژه‌های کانفیگ؛ مسیر دلخواه یعنی نوشتن در هر جایی که سرویس دسترسی داره
+            requested = Path(body['path']).resolve()
+
+            for proj_id, proj_data in self.projects.items():
+                if Path(proj_data['path']).resolve() == requested:
+                    return proj_id, proj_data
+
+            raise ServiceError(f"مسیر جزو پروژه‌های کانفیگ نیست: {body['path']}", 403)
+
+        raise ServiceError("project یا path لازمه")
+
+    def resolve_files(self, replacer: CDNReplacer, names: List[str]) -> List[Path]:
+        """مسیر فایل‌های درخواست؛ هر مسیری که بیرون پوشه templates بیفته رد میشه"""
+        templates_dir = replacer.templates_dir.resolve()
+        file_paths = []
+
+        for name in names:
+            file_path = (templates_dir / name).resolve()
+
+            if not file_path.is_relative_to(templates_dir):
+                raise ServiceError(f"فایل بیرون پوشه templates: {name}", 403)
+
+            file_paths.append(file_path)
+
+        return file_paths
+
+    def make_replacer(self, proj_id: str, proj_data: Dict) -> CDNReplacer:
+        """ساخت replacer با mapping ها و تنظیمات گرم"""
+        replacer = CDNReplacer(proj_data, self.cdn_mappings, self.settings)
+        replacer.attach_cache(self.result_cache)
+        replacer.open_index(proj_id)
+
+        # مسیرهای resolve شده درخواست با پوشه‌های resolve شده مقایسه میشن
+        replacer.templates_dir = replacer.templates_dir.resolve()
+        return replacer
+
+    def scan_file(self, replacer: CDNReplacer, file_path: Path) -> List:
+        """اسکن یک فایل با استفاده از cache بر اساس stat"""
+        st = file_path.stat()
+        signature = (st.st_mtime_ns, st.st_size)
+
+        with self.scan_lock:
+            cached = self.scan_cache.get(file_path)
+            if cached and cached[:2] == signature:
+                self.scan_cache.move_to_end(file_path)
+                self.cache_hits += 1
+                return cached[2]
+
+            self.cache_misses += 1
+
+        matches = replacer.scan_file(file_path)
+
+        with self.scan_lock:
+            self.scan_cache[file_path] = (signature[0], signature[1], matches)
+            while len(self.scan_cache) > self.SCAN_CACHE_ENTRIES:
+                self.scan_cache.popitem(last=False)
+
+        return matches
+
+    def forget(self, file_path: Path):
+        """حذف یک فایل از cache اسکن (بعد از بازنویسی)"""
+        with self.scan_lock:
+            self.scan_cache.pop(file_path, None)
+
+    def scan(self, body: Dict) -> Dict:
+        """اسکن (dry-run) یک پروژه یا یک درخت دلخواه"""
+        proj_id, proj_data = self.resolve_project(body)
+        replacer = self.make_replacer(proj_id, proj_data)
+
+        if not replacer.templates_dir.exists():
+            raise ServiceError(f"پوشه templates یافت نشد: {replacer.templates_dir}", 404)
+
+        files = []
+        total = 0
+
+        for file_path in replacer.find_template_files():
+            try:
+                matches = self.scan_file(replacer, file_path)
+            except Exception as e:
+                files.append({'file': str(file_path.relative_to(replacer.templates_dir)), 'error': str(e)})
+                continue
+
+            if matches:
+                total += len(matches)
+                files.append({
+                    'file': str(file_path.relative_to(replacer.templates_dir)),
+                    'replacements': len(matches),
+                    'cdns': sorted({cdn_name for _, _, cdn_name, _ in matches})
+                })
+
+        replacer.index.save()
+
+        return {'project': proj_id, 'dry_run': True, 'replacements': total, 'files': files}
+
+    def replace(self, body: Dict) -> Dict:
+        """جایگزینی در فایل‌های مشخص شده یا کل پروژه (با بکاپ)"""
+        proj_id, proj_data = self.resolve_project(body)
+        replacer = self.make_replacer(proj_id, proj_data)
+
+        with self.lock:
+            project_lock = self.project_locks.setdefault(proj_id, threading.Lock())
+
+        with project_lock:
+            if body.get('files'):
+                # replace_in_file قبل از نوشتن هر فایل در پوشه بکاپ همین اجرا کپی می‌گیره
+                file_paths = self.resolve_files(replacer, body['files'])
+            else:
+                if not replacer.create_backup():
+                    raise ServiceError("ساخت بکاپ ناموفق بود", 500)
+                file_paths = replacer.find_template_files()
+
+            files = []
+
+            for file_path in file_paths:
+                if not file_path.exists():
+                    files.append({'file': str(file_path), 'error': 'not found'})
+                    continue
+
+                modified, count, items = replacer.replace_in_file(file_path)
+                self.forget(file_path)
+                replacer.stats['files_scanned'] += 1
+
+                if modified:
+                    replacer.stats['files_modified'] += 1
+                    replacer.stats['replacements_made'] += count
+
+                    entry = {
+                        'file': str(file_path.relative_to(replacer.templates_dir)),
+                        'replacements': count,
+                        'items': items
+                    }
+                    replacer.detailed_log.append(entry)
+                    files.append(entry)
+
+            replacer.save_log()
+
+        return {'project': proj_id, 'dry_run': False, 'stats': replacer.stats, 'files': files}
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        """ثبت تاخیر یک درخواست"""
+        with self.lock:
+            metric = self.metrics.setdefault(endpoint, {
+                'count': 0, 'errors': 0, 'samples': deque(maxlen=self.LATENCY_SAMPLES)
+            })
+            metric['count'] += 1
+            metric['errors'] += 0 if ok else 1
+            metric['samples'].append(seconds)
+
+    def get_metrics(self) -> Dict:
+        """تاخیرها (میلی‌ثانیه) و آمار cache"""
+        endpoints = {}
+
+        with self.lock:
+            for endpoint, metric in self.metrics.items():
+                samples = sorted(metric['samples'])
+
+                def percentile(p: float) -> float:
+                    return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 3)
+
+                endpoints[endpoint] = {
+                    'count': metric['count'],
+                    'errors': metric['errors'],
+                    'p50_ms': percentile(0.5),
+                    'p95_ms': percentile(0.95),
+                    'max_ms': round(samples[-1] * 1000, 3)
+                }
+
+        with self.scan_lock:
+            lookups = self.cache_hits + self.cache_misses
+            scan_cache = {
+                'entries': len(self.scan_cache),
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': round(self.cache_hits / lookups, 3) if lookups else 0.0
+            }
+
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'endpoints': endpoints,
+            'scan_cache': scan_cache,
+            'result_cache': self.result_cache.get_metrics() if self.result_cache else None
+        }
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """مسیریابی درخواست‌های HTTP به ReplacerService"""
+
+    service: ReplacerService = None
+
+    def do_GET(self):
+        routes = {
+            '/health': lambda body: {'status': 'ok'},
+            '/metrics': lambda body: self.service.get_metrics(),
+        }
+        self.dispatch(routes)
+
+    def do_POST(self):
+        # فقط JSON؛ فرم یا text/plain از یک صفحه وب بدون preflight به سرویس نمی‌رسه
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            return self.dispatch({self.path: self.reject_content_type})
+
+        routes = {
+            '/scan': self.service.scan,
+            '/dry-run': self.service.scan,
+            '/replace': self.service.replace,
+            '/reload': lambda body: self.service.reload(),
+        }
+        self.dispatch(routes)
+
+    @staticmethod
+    def reject_content_type(body: Dict) -> Dict:
+        raise ServiceError("Content-Type باید application/json باشه", 415)
+
+    def dispatch(self, routes: Dict):
+        """اجرای handler و ارسال پاسخ JSON"""
+        start = time.perf_counter()
+        handler = routes.get(self.path)
+        status = 200
+
+        try:
+            if handler is None:
+                raise ServiceError(f"مسیر نامعتبر: {self.path}", 404)
+
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+            result = handler(body)
+
+        except ServiceError as e:
+            status, result = e.status, {'error': str(e)}
+        except json.JSONDecodeError as e:
+            status, result = 400, {'error': f"JSON نامعتبر: {e}"}
+        except Exception as e:
+            status, result = 500, {'error': str(e)}
+
+        payload = json.dumps(result, ensure_ascii=False, default=str).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+        if handler is not None:
+            self.service.record(self.path, time.perf_counter() - start, status == 200)
+
+    def address_string(self) -> str:
+        # روی Unix socket آدرس کلاینت خالیه
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """سرور HTTP روی Unix socket با یک thread برای هر درخواست"""
+
+    daemon_threads = True
+
+
+def make_server(service: ReplacerService, host: str = '127.0.0.1', port: int = 8765,
+                socket_path: Optional[str] = None):
+    """ساخت سرور HTTP (localhost یا Unix socket)"""
+    handler = type('BoundHandler', (ServiceRequestHandler,), {'service': service})
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    """تابع اصلی"""
+    parser = argparse.ArgumentParser(description="🛰️ سرویس ماندگار جایگزینی CDN")
+    parser.add_argument('--config', default='config.json', help="مسیر فایل کانفیگ")
+    parser.add_argument('--host', default='127.0.0.1', help="آدرس (پیش‌فرض فقط localhost)")
+    parser.add_argument('--port', type=int, default=8765, help="پورت")
+    parser.add_argument('--socket', help="مسیر Unix socket به جای TCP")
+    args = parser.parse_args()
+
+    service = ReplacerService(args.config)
+    server = make_server(service, args.host, args.port, args.socket)
+
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"🛰️ سرویس آماده است: {where}")
+    print("   GET  /health  /metrics")
+    print("   POST /scan  /dry-run  /replace  /reload")
+    print("💡 برای توقف Ctrl+C بزن")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+⏪ برگرداندن تغییرات جایگزینی
+بازگردانی template ها از بکاپ (فقط فایل‌هایی که واقعا فرق کردن) یا برگرداندن
+جایگزینی‌های یک CDN خاص با استفاده از لاگ
+"""
+
+import os
+import json
+import shutil
+import filecmp
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from replace_cdn import ConfigManager, SOURCES_BACKUP_DIR
+
+
+def scan_files(root: Path) -> List[str]:
+    """همه فایل‌های زیر یک پوشه به صورت مسیر نسبی (فقط با scandir)"""
+    files = []
+    stack = ['']
+
+    while stack:
+        prefix = stack.pop()
+        with os.scandir(root / prefix if prefix else root) as entries:
+            for entry in entries:
+                name = f"{prefix}/{entry.name}" if prefix else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    files.append(name)
+
+    return files
+
+
+def restore_file(src: Path, dest: Path):
+    """کپی اتمیک فایل بکاپ روی فایل فعلی"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest.with_name('.' + dest.name + '.rollback.tmp')
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+class RollbackEngine:
+    """بازگردانی template های یک یا چند پروژه"""
+
+    def __init__(self, settings: Optional[Dict] = None, workers: int = 8):
+        self.settings = settings or {}
+        self.workers = workers
+
+    def project_dirs(self, proj_data: Dict) -> Tuple[Path, Path]:
+        """(پوشه پروژه، پوشه templates)"""
+        project_dir = Path(proj_data['path'])
+        return project_dir, project_dir / proj_data.get('templates_dir', 'templates')
+
+    def latest_backup(self, proj_data: Dict) -> Optional[Path]:
+        """جدیدترین بکاپ ساخته شده با backup_dir_name"""
+        project_dir, _ = self.project_dirs(proj_data)
+        prefix = self.settings.get('backup_dir_name', 'backup_{timestamp}').split('{timestamp}')[0]
+
+        if not project_dir.exists():
+            return None
+
+        backups = [p for p in project_dir.iterdir() if p.is_dir() and p.name.startswith(prefix)]
+
+        # timestamp در نام به ترتیب زمان مرتب میشه
+        return max(backups, key=lambda p: p.name) if backups else None
+
+    def restore_backup(self, proj_data: Dict, backup_dir: Optional[str] = None) -> Dict:
+        """بازگردانی از بکاپ: فقط فایل‌هایی که با بکاپ فرق دارن دوباره نوشته میشن
+
+        فایل‌هایی که بعد از بکاپ اضافه شدن پاک نمیشن، فقط گزارش میشن. فایل‌های
+        غیر template (CSS، JS ...) در زیرپوشه .sources بکاپ به ریشه پروژه برمی‌گردن.
+        """
+        project_dir, templates_dir = self.project_dirs(proj_data)
+        backup = Path(backup_dir) if backup_dir else self.latest_backup(proj_data)
+
+        result = {'backup_dir': str(backup) if backup else None,
+                  'restored': [], 'unchanged': 0, 'extra': [], 'errors': []}
+
+        if backup is None or not backup.is_dir():
+            result['errors'].append('backup not found')
+            return result
+
+        backup_files = scan_files(backup)
+
+        def restore(name: str) -> Tuple[str, Optional[str]]:
+            src, dest = backup / name, templates_dir / name
+            if name.startswith(SOURCES_BACKUP_DIR + '/'):
+                dest = project_dir / name[len(SOURCES_BACKUP_DIR) + 1:]
+            try:
+                # filecmp اول اندازه رو مقایسه می‌کنه، بعد محتوا
+                if dest.is_file() and filecmp.cmp(src, dest, shallow=False):
+                    return 'unchanged', None
+                restore_file(src, dest)
+                return 'restored', None
+            except OSError as e:
+                return 'error', f"{name}: {e}"
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for name, (status, error) in zip(backup_files, executor.map(restore, backup_files)):
+                if status == 'restored':
+                    result['restored'].append(name)
+                elif status == 'unchanged':
+                    result['unchanged'] += 1
+                else:
+                    result['errors'].append(error)
+
+        if templates_dir.exists():
+            in_backup = set(backup_files)
+            result['extra'] = sorted(n for n in scan_files(templates_dir) if n not in in_backup)
+
+        return result
+
+    def rollback_batch(self, results: List[Dict], projects: Dict[str, Dict]) -> List[Dict]:
+        """برگرداندن کل یک اجرای دسته‌ای (نتایج BatchProcessor یا cli.py batch --format json)"""
+        jobs = []
+
+        for item in results:
+            proj_data = projects.get(item.get('project'))
+            if item.get('dry_run') or not item.get('backup_dir') or proj_data is None:
+                continue
+            jobs.append((item['project'], proj_data, item['backup_dir']))
+
+        def restore(job: Tuple[str, Dict, str]) -> Dict:
+            proj_id, proj_data, backup_dir = job
+            return dict(project=proj_id, **self.restore_backup(proj_data, backup_dir))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(restore, jobs))
+
+    def latest_log(self, proj_data: Dict) -> Optional[Path]:
+        """جدیدترین لاگ جایگزینی پروژه"""
+        project_dir, _ = self.project_dirs(proj_data)
+        log_dir = project_dir / self.settings.get('log_dir', 'logs')
+
+        logs = sorted(log_dir.glob('replacement_log_*.json')) if log_dir.exists() else []
+        return logs[-1] if logs else None
+
+    def rollback_cdn(self, proj_data: Dict, cdn_name: str, log_file: Optional[str] = None) -> Dict:
+        """برگرداندن فقط جایگزینی‌های یک CDN با برعکس کردن ردیف‌های لاگ
+
+        ردیف‌های هر فایل به ترتیب اومدن در فایل هستن، پس هر 'to' از جای قبلی
+        به بعد پیدا میشه. اگه تعداد 'to' ها در فایل با لاگ نخونه (فایل بعدا
+        دستی تغییر کرده) اون فایل دست نمی‌خوره.
+        """
+        project_dir, templates_dir = self.project_dirs(proj_data)
+        log_path = Path(log_file) if log_file else self.latest_log(proj_data)
+
+        result = {'log_file': str(log_path) if log_path else None, 'cdn': cdn_name,
+                  'files': [], 'reverted': 0, 'ambiguous': [], 'errors': []}
+
+        if log_path is None or not log_path.exists():
+            result['errors'].append('log not found')
+            return result
+
+        with open(log_path, 'r', encoding='utf-8') as f:
+            log = json.load(f)
+
+        changed = False
+
+        for entry in log.get('files', []):
+            items = [item for item in entry['items'] if not item.get('reverted')]
+            if not any(item['cdn'] == cdn_name for item in items):
+                continue
+
+            file_path = (project_dir if entry.get('root') == 'project' else templates_dir) / entry['file']
+
+            try:
+                # newline='' تا انتهای خط‌های \r\n همون‌طور بمونن
+                with open(file_path, 'r', encoding='utf-8', newline='') as f:
+                    content = f.read()
+            except OSError as e:
+                result['errors'].append(f"{entry['file']}: {e}")
+                continue
+
+            expected: Dict[str, int] = {}
+            for item in items:
+                expected[item['to']] = expected.get(item['to'], 0) + 1
+
+            if any(content.count(to) != count for to, count in expected.items()):
+                result['ambiguous'].append(entry['file'])
+                continue
+
+            parts = []
+            cursor = 0
+            reverted = []
+
+            for item in items:
+                start = content.find(item['to'], cursor)
+                if start < 0:
+                    break
+
+                parts.append(content[cursor:start])
+
+                if item['cdn'] == cdn_name:
+                    parts.append(item.get('original', item['from']))
+                    reverted.append(item)
+                else:
+                    parts.append(item['to'])
+
+                cursor = start + len(item['to'])
+            else:
+                parts.append(content[cursor:])
+
+            if len(parts) != 2 * len(items) + 1:
+                result['ambiguous'].append(entry['file'])
+                continue
+
+            tmp_path = file_path.with_name('.' + file_path.name + '.rollback.tmp')
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(''.join(parts))
+            os.replace(tmp_path, file_path)
+
+            for item in reverted:
+                item['reverted'] = True
+
+            result['files'].append(entry['file'])
+            result['reverted'] += len(reverted)
+            changed = True
+
+        # ردیف‌های برگردانده شده علامت می‌خورن تا اجرای دوباره دوبار برنگردونه
+        if changed:
+            tmp_log = log_path.with_suffix('.tmp')
+            with open(tmp_log, 'w', encoding='utf-8') as f:
+                json.dump(log, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_log, log_path)
+
+        return result
+
+
+def print_result(name: str, result: Dict):
+    """خلاصه یک بازگردانی"""
+    print(f"\n📁 {name}")
+
+    if 'restored' in result:
+        print(f"   ⏪ {len(result['restored'])} فایل بازگردانی شد، {result['unchanged']} بدون تغییر"
+              f" (بکاپ: {result['backup_dir']})")
+        for extra in result['extra']:
+            print(f"   ⚠️ فایل جدید (در بکاپ نیست): {extra}")
+    else:
+        print(f"   ⏪ {result['reverted']} جایگزینی {result['cdn']} در {len(result['files'])} فایل برگشت")
+        for ambiguous in result['ambiguous']:
+            print(f"   ⚠️ فایل بعد از جایگزینی تغییر کرده، دست نخورد: {ambiguous}")
+
+    for error in result['errors']:
+        print(f"   ❌ {error}")
+
+
+def main():
+    """تابع اصلی"""
+    print()
+    print("╔" + "═" * 68 + "╗")
+    print("║" + " " * 20 + "⏪ برگرداندن تغییرات" + " " * 28 + "║")
+    print("╚" + "═" * 68 + "╝")
+
+    config_manager = ConfigManager()
+    engine = RollbackEngine(config_manager.get_settings())
+
+    print()
+    print("1. بازگردانی از آخرین بکاپ")
+    print("2. برگرداندن فقط یک CDN (از آخرین لاگ)")
+    print()
+
+    choice = input("انتخاب (1 یا 2): ").strip()
+    cdn_name = input("نام CDN: ").strip() if choice == '2' else None
+
+    if choice not in ('1', '2') or (choice == '2' and not cdn_name):
+        print("❌ انتخاب نامعتبر!")
+    else:
+        for proj_id, proj_data in config_manager.get_enabled_projects().items():
+            if cdn_name:
+                result = engine.rollback_cdn(proj_data, cdn_name)
+            else:
+                result = engine.restore_backup(proj_data)
+            print_result(proj_data.get('name', proj_id), result)
+
+    print()
+    input("Press Enter to exit...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+🧭 پوشش فایل‌های static
+برای همه پروژه‌ها: فایل هر mapping واقعا موجوده، یا نیست، یا فقط placeholder است؟
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from replace_cdn import ConfigManager, CDNReplacer, classify_static_file, list_static_files
+
+
+STATUS_ICONS = {'ok': '✅', 'missing': '❌', 'placeholder': '🟡', 'empty': '⚪'}
+
+
+class StaticCoverage:
+    """بررسی دسته‌ای mapping → فایل static برای کل پروژه‌ها"""
+
+    def __init__(self, config_file="config.json", workers: int = 8):
+        self.config_manager = ConfigManager(config_file)
+        self.cdn_mappings = self.config_manager.get_cdn_mappings()
+        self.settings = self.config_manager.get_settings()
+        self.workers = workers
+
+    def check_project(self, proj_id: str, proj_data: Dict) -> Dict:
+        """وضعیت فایل همه mapping ها در یک پروژه (یک بار لیست کردن static)"""
+        # مسیرهای نهایی (با نام hash دار اگه فعال باشه) از خود replacer میاد
+        replacer = CDNReplacer(proj_data, self.cdn_mappings, self.settings)
+        listing = list_static_files(replacer.static_dir)
+
+        files = {}
+        counts = {status: 0 for status in STATUS_ICONS}
+
+        for _, _, file_path, cdn_name in replacer.replacements:
+            if not file_path:
+                continue
+
+            status = classify_static_file(replacer.static_dir, listing, file_path, cdn_name)
+            files[cdn_name] = {'path': file_path, 'status': status}
+            counts[status] += 1
+
+        return {
+            'project': proj_id,
+            'static_dir': str(replacer.static_dir),
+            'static_files': len(listing),
+            'ok': counts['ok'] == len(files),
+            'counts': counts,
+            'files': files
+        }
+
+    def fleet_report(self, projects: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+        """بررسی موازی همه پروژه‌ها"""
+        if projects is None:
+            projects = self.config_manager.get_enabled_projects()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(lambda item: self.check_project(*item), projects.items()))
+
+    def print_report(self, results: List[Dict]):
+        """جدول mapping × پروژه"""
+        print()
+        print("=" * 80)
+        print("🧭 پوشش فایل‌های static")
+        print("=" * 80)
+
+        names = [cdn_name for _, _, file_path, cdn_name in self.cdn_mappings if file_path]
+        width = max([len(name) for name in names] + [10])
+
+        print(" " * (width + 2) + "  ".join(r['project'][:12].ljust(12) for r in results))
+
+        for name in names:
+            cells = []
+            for result in results:
+                status = result['files'].get(name, {}).get('status')
+                cells.append((STATUS_ICONS.get(status, '-')).ljust(12))
+            print(f"{name.ljust(width)}  " + "  ".join(cells))
+
+        print()
+        print("✅ موجود   ❌ ناموجود   🟡 placeholder   ⚪ خالی")
+        print()
+
+        for result in results:
+            counts = result['counts']
+            problems = counts['missing'] + counts['placeholder'] + counts['empty']
+            icon = "✅" if not problems else "⚠️"
+            print(f"{icon} {result['project']}: {counts['ok']}/{len(result['files'])} فایل واقعی")
+
+        print("=" * 80)
+
+    def save_report(self, results: List[Dict], output_file: str):
+        """ذخیره گزارش JSON"""
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump({'projects': results}, f, indent=2, ensure_ascii=False)
+
+        print(f"💾 گزارش: {output_file}")
+
+
+def main():
+    """تابع اصلی"""
+    print()
+    print("╔" + "═" * 78 + "╗")
+    print("║" + " " * 22 + "🧭 پوشش فایل‌های static" + " " * 33 + "║")
+    print("╚" + "═" * 78 + "╝")
+
+    coverage = StaticCoverage()
+    results = coverage.fleet_report()
+
+    if not results:
+        print("❌ هیچ پروژه فعالی یافت نشد!")
+    else:
+        coverage.print_report(results)
+        coverage.save_report(results, 'static_coverage.json')
+
+    print()
+    input("Press Enter to exit...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+🔐 هش‌های Subresource Integrity برای فایل‌های static
+SHA-384 هر فایل نصب شده هنگام نوشتن محاسبه و کنار پوشه static ذخیره میشه
+"""
+
+import os
+import re
+import json
+import base64
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
+
+
+# فایل مانیفست در کنار پوشه static (نه داخلش، تا collectstatic برش نداره)
+INTEGRITY_FILE = 'static_integrity.json'
+
+# فایل‌هایی که نسخه hash دار (auto_bootstrap.<hash8>.min.css) براشون ساخته میشه
+FINGERPRINT_EXTENSIONS = ('.css', '.js')
+
+# نسخه‌های فشرده کنار هر فایل (دانلودر می‌سازه)
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+CHUNK_SIZE = 1024 * 1024
+
+# کاراکترهای مسیر یک ارجاع (بین کوتیشن، url() یا فاصله)
+REF_CHARS = r"""[^\s'"()<>=,]*"""
+
+
+def sri_value(digest) -> str:
+    """تبدیل hash به قالب integrity="sha384-..." """
+    return 'sha384-' + base64.b64encode(digest.digest()).decode('ascii')
+
+
+def copy_with_hash(src: BinaryIO, dest_path: Path, *extra) -> str:
+    """کپی جریانی و محاسبه SHA-384 در همون یک بار خواندن
+
+    extra: hash های دیگه‌ای که باید با همین داده‌ها به‌روز بشن (مثلا sha256 بسته)
+    """
+    digest = hashlib.sha384()
+
+    with open(dest_path, 'wb') as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            for other in extra:
+                other.update(chunk)
+            dst.write(chunk)
+
+    return sri_value(digest)
+
+
+def hash_file(path: Path) -> str:
+    """SHA-384 یک فایل موجود"""
+    with open(path, 'rb') as f:
+        digest = hashlib.sha384()
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return sri_value(digest)
+
+
+class IntegrityManifest:
+    """مانیفست hash فایل‌های static: مسیر نسبی → sha384، اندازه و mtime"""
+
+    VERSION = 1
+
+    def __init__(self, static_dir: Path):
+        self.static_dir = Path(static_dir)
+        self.manifest_file = self.static_dir.parent / INTEGRITY_FILE
+        self.lock = threading.Lock()
+        self.files: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self):
+        """بارگذاری مانیفست از دیسک"""
+        if not self.manifest_file.exists():
+            return
+
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ مانیفست integrity خراب است: {e}")
+            return
+
+        if data.get('version') == self.VERSION:
+            self.files = data.get('files', {})
+
+    def save(self):
+        """ذخیره اتمیک مانیفست"""
+        with self.lock:
+            data = {'version': self.VERSION, 'files': dict(sorted(self.files.items()))}
+
+            self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.manifest_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, self.manifest_file)
+
+    def relative(self, path: Path) -> Optional[str]:
+        """مسیر نسبی فایل داخل static (None اگه بیرون static باشه)"""
+        try:
+            return Path(path).resolve().relative_to(self.static_dir.resolve()).as_posix()
+        except ValueError:
+            return None
+
+    def record(self, path: Path, integrity: str, library: Optional[str] = None):
+        """ثبت hash فایلی که همین الان نوشته شد"""
+        name = self.relative(path)
+        if name is None:
+            return
+
+        st = Path(path).stat()
+
+        with self.lock:
+            old = self.files.get(name, {})
+            self.files[name] = {
+                'integrity': integrity,
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'library': library or old.get('library')
+            }
+
+            # نسخه‌های hash دار قبلی تا وقتی template ای بهشون ارجاع میده می‌مونن
+            for key in ('fingerprint', 'previous'):
+                if old.get(key):
+                    self.files[name][key] = old[key]
+
+    def forget_tree(self, directory: Path):
+        """حذف فایل‌های یک پوشه (وقتی پوشه کامل جایگزین میشه)
+
+        فایل‌هایی که نسخه hash دار دارن می‌مونن تا سابقه fingerprint/previous گم نشه؛
+        record() بعدی همون سابقه رو نگه می‌داره.
+        """
+        prefix = self.relative(directory)
+        if prefix is None:
+            return
+
+        with self.lock:
+            for name in [n for n in self.files if n.startswith(prefix + '/')]:
+                if not self.files[name].get('fingerprint'):
+                    del self.files[name]
+
+    def fingerprint_names(self) -> Set[str]:
+        """همه نسخه‌های hash دار (فعلی و قبلی)"""
+        names = set()
+        for entry in self.files.values():
+            if entry.get('fingerprint'):
+                names.add(entry['fingerprint'])
+            names.update(entry.get('previous', []))
+        return names
+
+    def is_fingerprint_file(self, name: str) -> bool:
+        """نسخه hash دار یا .gz/.br اون (نباید با پوشه جایگزین شده پاک بشه)"""
+        for suffix in COMPRESSED_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        return name in self.fingerprint_names()
+
+    def fingerprint(self, path: Path) -> Optional[str]:
+        """ساخت کپی با hash محتوا در نام (برای cache بدون انقضا)
+
+        auto_bootstrap.min.css → auto_bootstrap.<hash8>.min.css
+        hash از همون SHA-384 ثبت شده میاد و فایل دوباره خونده نمیشه.
+        نسخه قبلی پاک نمیشه (template ها هنوز بهش ارجاع میدن)؛ repoint_content ارجاع‌ها رو
+        به نسخه جدید می‌بره و prune_fingerprints نسخه بدون ارجاع رو پاک می‌کنه.
+        """
+        name = self.relative(path)
+        entry = self.files.get(name) if name else None
+        if entry is None:
+            return None
+
+        digest = base64.b64decode(entry['integrity'][len('sha384-'):]).hex()[:8]
+        directory, _, filename = name.rpartition('/')
+        stem, dot, rest = filename.partition('.')
+        hashed = (directory + '/' if directory else '') + f"{stem}.{digest}{dot}{rest}"
+
+        target = self.static_dir / hashed
+        if not target.exists():
+            shutil.copy2(self.static_dir / name, target)
+
+        with self.lock:
+            old = entry.get('fingerprint')
+            previous = [p for p in entry.get('previous', []) if p != hashed]
+            if old and old != hashed and old not in previous:
+                previous.append(old)
+
+            entry['fingerprint'] = hashed
+            if previous:
+                entry['previous'] = previous
+            else:
+                entry.pop('previous', None)
+
+        return hashed
+
+    def fingerprint_moves(self) -> Dict[str, str]:
+        """نسخه hash دار قبلی → نسخه فعلی همون فایل"""
+        return {
+            old: entry['fingerprint']
+            for entry in self.files.values() if entry.get('fingerprint')
+            for old in entry.get('previous', [])
+        }
+
+    def reference_spans(self, content: str, file_path: Path, name: str) -> List[Tuple[int, int]]:
+        """بازه نام فایل name (مسیر داخل static) در ارجاع‌های content
+
+        ارجاع یا مسیر static است ({% static %}، url_for، /static/...) یا مسیر نسبی
+        به پوشه خود فایل (مثلا url() در css). بازه فقط نام فایل (بدون پوشه) است.
+        """
+        basename = name.rpartition('/')[2]
+        if basename not in content:
+            return []
+
+        target = (self.static_dir / name).resolve()
+        spans = []
+
+        for match in re.finditer(REF_CHARS + re.escape(basename) + r"(?![\w.-])", content):
+            ref = match.group(0)
+
+            if ref.endswith(name) and (len(ref) == len(name) or ref[-len(name) - 1] in '/}'):
+                found = True
+            else:
+                try:
+                    found = (Path(file_path).parent / ref).resolve() == target
+                except (OSError, ValueError):
+                    found = False
+
+            if found:
+                spans.append((match.end() - len(basename), match.end()))
+
+        return spans
+
+    def repoint_content(self, content: str, file_path: Path) -> Tuple[str, int]:
+        """بردن ارجاع‌های نسخه‌های hash دار قبلی به نسخه فعلی (همون پوشه، فقط hash عوض میشه)"""
+        edits = []
+
+        for old, new in self.fingerprint_moves().items():
+            old_dir, _, _ = old.rpartition('/')
+            new_dir, _, new_name = new.rpartition('/')
+            if old_dir != new_dir:
+                continue
+
+            for start, end in self.reference_spans(content, file_path, old):
+                edits.append((start, end, new_name))
+
+        if not edits:
+            return content, 0
+
+        parts = []
+        last = 0
+        for start, end, new_name in sorted(edits):
+            parts.append(content[last:start])
+            parts.append(new_name)
+            last = end
+        parts.append(content[last:])
+
+        return ''.join(parts), len(edits)
+
+    def static_sources(self) -> List[Path]:
+        """فایل‌های css/js خود پروژه در static (نه فایل‌های نصب شده) که ممکنه به نسخه hash دار ارجاع بدن"""
+        if not self.static_dir.exists():
+            return []
+
+        sources = []
+        for path in sorted(self.static_dir.rglob('*')):
+            name = self.relative(path)
+            if path.suffix in FINGERPRINT_EXTENSIONS and path.is_file() and name not in self.files \
+                    and not self.is_fingerprint_file(name):
+                sources.append(path)
+        return sources
+
+    def prune_fingerprints(self, sources: Iterable[Path]) -> List[str]:
+        """حذف نسخه‌های hash دار قدیمی که دیگه هیچ فایلی (template، css و ...) بهشون ارجاع نمیده"""
+        stale = {old for entry in self.files.values() for old in entry.get('previous', [])}
+        if not stale:
+            return []
+
+        for file_path in sources:
+            try:
+                with open(file_path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+                    content = f.read()
+            except OSError:
+                continue
+
+            stale = {old for old in stale if not self.reference_spans(content, file_path, old)}
+            if not stale:
+                return []
+
+        for old in stale:
+            for suffix in ('',) + COMPRESSED_SUFFIXES:
+                (self.static_dir / (old + suffix)).unlink(missing_ok=True)
+
+        with self.lock:
+            for entry in self.files.values():
+                if entry.get('previous'):
+                    entry['previous'] = [p for p in entry['previous'] if p not in stale]
+                    if not entry['previous']:
+                        del entry['previous']
+
+        return sorted(stale)
+
+    def fingerprinted(self, name: str) -> Optional[str]:
+        """مسیر hash دار یک فایل static (اگه ساخته شده باشه)"""
+        entry = self.files.get(name)
+        return entry.get('fingerprint') if entry else None
+
+    def get(self, name: str) -> Optional[str]:
+        """مقدار integrity برای مسیر نسبی داخل static (مثلا css/auto_bootstrap.min.css)"""
+        entry = self.files.get(name)
+        return entry['integrity'] if entry else None
+
+    def verify(self) -> Dict[str, list]:
+        """بررسی سریع: فقط فایل‌هایی که mtime یا اندازه‌شون عوض شده دوباره hash میشن"""
+        result = {'ok': [], 'rehashed': [], 'modified': [], 'missing': []}
+
+        for name, entry in list(self.files.items()):
+            path = self.static_dir / name
+
+            try:
+                st = path.stat()
+            except OSError:
+                result['missing'].append(name)
+                continue
+
+            if st.st_size == entry['size'] and st.st_mtime_ns == entry['mtime_ns']:
+                result['ok'].append(name)
+                continue
+
+            if st.st_size == entry['size'] and hash_file(path) == entry['integrity']:
+                # فقط touch شده؛ mtime جدید ثبت میشه تا دفعه بعد دوباره hash نشه
+                with self.lock:
+                    entry['mtime_ns'] = st.st_mtime_ns
+                result['rehashed'].append(name)
+            else:
+                result['modified'].append(name)
+
+        return result
+
+
+def main():
+    """تابع اصلی"""
+    print()
+    print("╔" + "═" * 68 + "╗")
+    print("║" + " " * 20 + "🔐 بررسی فایل‌های static" + " " * 24 + "║")
+    print("╚" + "═" * 68 + "╝")
+
+    from replace_cdn import ConfigManager
+
+    config_manager = ConfigManager()
+
+    for proj_id, proj_data in config_manager.get_enabled_projects().items():
+        static_dir = Path(proj_data['path']) / proj_data.get('static_dir', 'static')
+        manifest = IntegrityManifest(static_dir)
+
+        print(f"\n📁 {proj_data.get('name', proj_id)}")
+
+        if not manifest.files:
+            print(f"   ⚠️ مانیفست یافت نشد: {manifest.manifest_file}")
+            continue
+
+        result = manifest.verify()
+        manifest.save()
+
+        print(f"   ✅ سالم: {len(result['ok']) + len(result['rehashed'])}/{len(manifest.files)}"
+              f" (hash دوباره: {len(result['rehashed'])})")
+
+        for name in result['modified']:
+            print(f"   ❌ تغییر کرده: {name}")
+        for name in result['missing']:
+            print(f"   ❌ ناموجود: {name}")
+
+    print()
+    input("Press Enter to exit...")
+
+
+if __name__ == "__main__":
+    main()
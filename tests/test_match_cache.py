@@ -0,0 +1,71 @@
+"""
+🧪 استفاده دوباره از تطبیق‌های اجرای تست در اجرای واقعی (match_cache)
+"""
+
+import pytest
+
+from replace_cdn import CDNReplacer
+
+
+JQUERY_MAPPING = (
+    r"""https?://code\.jquery\.com/jquery-(?P<version>[\d\.]+)\.min\.js["']?""",
+    """{% static 'js/auto_jquery.min.js' %}\"""",
+    'js/auto_jquery.min.js',
+    'jquery'
+)
+
+CRLF_TEMPLATE = (
+    '<html>\r\n'
+    '<head>\r\n'
+    '<script src="https://code.jquery.com/jquery-3.7.1.min.js"></script>\r\n'
+    '</head>\r\n'
+    '</html>\r\n'
+)
+
+
+def make_replacer(project_dir):
+    settings = {'create_backup': False, 'save_log': False}
+    return CDNReplacer({'name': 'test', 'path': str(project_dir)}, [JQUERY_MAPPING], settings)
+
+
+@pytest.mark.parametrize('with_patch', [False, True])
+def test_crlf_template_reuses_dry_run_matches(tmp_path, with_patch):
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    template = templates / 'base.html'
+    template.write_bytes(CRLF_TEMPLATE.encode('utf-8'))
+
+    replacer = make_replacer(tmp_path)
+    replacer.process_all_files(dry_run=True, patch_file=tmp_path / 'run.patch' if with_patch else None)
+    assert template in replacer.match_cache
+
+    replacer.reset_stats()
+    replacer.process_all_files()
+
+    assert replacer.stats['cached_files'] == 1
+    assert replacer.stats['replacements_made'] == 1
+    assert replacer.match_cache == {}
+
+    # \r\n ها دست نخوردن و لینک درست جایگزین شد
+    data = template.read_bytes()
+    assert data.count(b'\r\n') == 5
+    assert b"""<script src="{% static 'js/auto_jquery.min.js' %}"></script>\r\n""" in data
+
+
+def test_changed_template_is_rescanned(tmp_path):
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    template = templates / 'base.html'
+    template.write_bytes(CRLF_TEMPLATE.encode('utf-8'))
+
+    replacer = make_replacer(tmp_path)
+    replacer.process_all_files(dry_run=True)
+
+    template.write_bytes(b'<!-- edited -->\r\n' + CRLF_TEMPLATE.encode('utf-8'))
+
+    replacer.reset_stats()
+    replacer.process_all_files()
+
+    assert replacer.stats['cached_files'] == 0
+    assert replacer.stats['replacements_made'] == 1
+    assert template.read_bytes().startswith(b'<!-- edited -->\r\n')
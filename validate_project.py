@@ -3,17 +3,54 @@
 بررسی ساختار پروژه قبل از جایگزینی CDN
 """
 
+import os
 import json
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple
 
+from replace_cdn import DIALECTS
+
+
+def scan_tree(root: Path, suffixes: Tuple[str, ...], recursive: bool = True) -> Tuple[int, Dict[str, int]]:
+    """شمارش فایل‌ها با یک پیمایش scandir (بدون ساخت لیست)
+
+    خروجی: (تعداد، mtime هر پوشه دیده شده) - mtime ها کلید cache هستن
+    """
+    count = 0
+    dirs = {}
+    stack = [str(root)]
+    
+    while stack:
+        directory = stack.pop()
+        try:
+            dirs[directory] = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                    elif entry.name.endswith(suffixes):
+                        count += 1
+        except OSError:
+            continue
+    
+    return count, dirs
+
 
 class ProjectValidator:
     """اعتبارسنج پروژه"""
     
-    def __init__(self, config_file="config.json"):
+    def __init__(self, config_file="config.json", cache_file="validation_cache.json", workers: int = 8):
         self.config_file = Path(config_file)
         self.config = self.load_config()
+        self.workers = workers
+        
+        # proj_id → {config، mtime پوشه‌ها، نتیجه}
+        self.cache_file = Path(cache_file)
+        self.cache: Dict[str, Dict] = self.load_cache()
+        self.lock = threading.Lock()
     
     def load_config(self) -> dict:
         """بارگذاری کانفیگ"""
@@ -22,54 +59,80 @@ class ProjectValidator:
                 return json.load(f)
         return {}
     
-    def validate_project(self, proj_id: str) -> Tuple[bool, List[str]]:
-        """اعتبارسنجی یک پروژه"""
-        projects = self.config.get('projects', {})
-        
-        if proj_id not in projects:
-            return False, [f"❌ پروژه {proj_id} در کانفیگ یافت نشد"]
-        
-        proj = projects[proj_id]
+    def load_cache(self) -> Dict:
+        """بارگذاری نتایج قبلی"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_cache(self):
+        """ذخیره نتایج برای اجرای بعدی"""
+        with self.lock:
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+    
+    @staticmethod
+    def dirs_unchanged(dirs: Dict[str, int]) -> bool:
+        """فقط stat پوشه‌ها؛ اضافه/حذف شدن فایل mtime پوشه رو عوض می‌کنه"""
+        for directory, mtime_ns in dirs.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                if mtime_ns is not None:
+                    return False
+        return True
+    
+    def inspect(self, project_path: Path, proj: Dict) -> Tuple[List[str], Dict[str, int]]:
+        """بررسی ساختار پوشه‌ها (بخشی که cache میشه)"""
         issues = []
-        
-        project_path = Path(proj.get('path', ''))
-        
-        if not project_path.exists():
-            issues.append(f"❌ مسیر پروژه وجود نداره: {project_path}")
-            return False, issues
+        dirs = {}
         
         templates_dir = project_path / proj.get('templates_dir', 'templates')
         
         if not templates_dir.exists():
+            dirs[str(templates_dir)] = None
             issues.append(f"⚠️ پوشه templates یافت نشد: {templates_dir}")
         else:
-            template_files = list(templates_dir.rglob('*.html'))
+            template_count, seen = scan_tree(templates_dir, ('.html',))
+            dirs.update(seen)
             
-            if not template_files:
+            if not template_count:
                 issues.append(f"⚠️ هیچ فایل HTML در templates یافت نشد")
             else:
-                issues.append(f"✅ {len(template_files)} فایل template پیدا شد")
+                issues.append(f"✅ {template_count} فایل template پیدا شد")
         
         static_dir = project_path / proj.get('static_dir', 'static')
         
         if not static_dir.exists():
+            dirs[str(static_dir)] = None
             issues.append(f"⚠️ پوشه static یافت نشد: {static_dir}")
             issues.append(f"💡 توصیه: ابتدا فایل‌های Local رو در {static_dir} قرار بده")
         else:
+            dirs[str(static_dir)] = static_dir.stat().st_mtime_ns
+            
             css_dir = static_dir / 'css'
             js_dir = static_dir / 'js'
             icons_dir = static_dir / 'auto_icons'
             
             if css_dir.exists():
-                css_count = len(list(css_dir.glob('*.css')))
+                css_count, seen = scan_tree(css_dir, ('.css',), recursive=False)
+                dirs.update(seen)
                 issues.append(f"✅ {css_count} فایل CSS در static/css")
             else:
+                dirs[str(css_dir)] = None
                 issues.append(f"⚠️ پوشه static/css یافت نشد")
             
             if js_dir.exists():
-                js_count = len(list(js_dir.glob('*.js')))
+                js_count, seen = scan_tree(js_dir, ('.js',), recursive=False)
+                dirs.update(seen)
                 issues.append(f"✅ {js_count} فایل JS در static/js")
             else:
+                dirs[str(js_dir)] = None
                 issues.append(f"⚠️ پوشه static/js یافت نشد")
             
             if icons_dir.exists():
@@ -77,13 +140,44 @@ class ProjectValidator:
             else:
                 issues.append(f"⚠️ پوشه auto_icons یافت نشد")
         
-        try:
-            test_file = project_path / '.write_test'
-            test_file.touch()
-            test_file.unlink()
+        return issues, dirs
+    
+    def validate_project(self, proj_id: str) -> Tuple[bool, List[str]]:
+        """اعتبارسنجی یک پروژه"""
+        projects = self.config.get('projects', {})
+        
+        if proj_id not in projects:
+            return False, [f"❌ پروژه {proj_id} در کانفیگ یافت نشد"]
+        
+        proj = projects[proj_id]
+        issues = []
+        
+        project_path = Path(proj.get('path', ''))
+        
+        if not project_path.exists():
+            issues.append(f"❌ مسیر پروژه وجود نداره: {project_path}")
+            return False, issues
+        
+        dialect = proj.get('dialect', 'django')
+        if dialect not in DIALECTS:
+            issues.append(f"❌ dialect ناشناخته: {dialect} (معتبر: {', '.join(DIALECTS)})")
+        
+        # اگه کانفیگ و mtime هیچ پوشه‌ای عوض نشده، نتیجه قبلی معتبره
+        cached = self.cache.get(proj_id)
+        
+        if cached and cached['config'] == proj and self.dirs_unchanged(cached['dirs']):
+            issues.extend(cached['issues'])
+        else:
+            found, dirs = self.inspect(project_path, proj)
+            issues.extend(found)
+            
+            with self.lock:
+                self.cache[proj_id] = {'config': proj, 'dirs': dirs, 'issues': found}
+        
+        if os.access(project_path, os.W_OK):
             issues.append(f"✅ دسترسی نوشتن در پروژه OK")
-        except Exception as e:
-            issues.append(f"❌ مشکل در دسترسی نوشتن: {e}")
+        else:
+            issues.append(f"❌ مشکل در دسترسی نوشتن: {project_path}")
             return False, issues
         
         has_critical = any(msg.startswith('❌') for msg in issues)
@@ -91,7 +185,7 @@ class ProjectValidator:
         return not has_critical, issues
     
     def validate_all_enabled_projects(self):
-        """اعتبارسنجی همه پروژه‌های فعال"""
+        """اعتبارسنجی همه پروژه‌های فعال (موازی)"""
         projects = self.config.get('projects', {})
         enabled_projects = {k: v for k, v in projects.items() if v.get('enabled', False)}
         
@@ -104,20 +198,24 @@ class ProjectValidator:
         print("✅ اعتبارسنجی پروژه‌های فعال")
         print("=" * 80)
         
-        for proj_id, proj_data in enabled_projects.items():
-            print()
-            print(f"📋 {proj_data.get('name', proj_id)}")
-            print("-" * 80)
-            
-            is_valid, issues = self.validate_project(proj_id)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(self.validate_project, enabled_projects)
             
-            for issue in issues:
-                print(f"   {issue}")
-            
-            if is_valid:
-                print(f"\n   🎉 پروژه {proj_id} آماده استفاده است!")
-            else:
-                print(f"\n   ⚠️ پروژه {proj_id} مشکل دارد و باید اصلاح بشه")
+            # چاپ به ترتیب کانفیگ، به محض آماده شدن هر نتیجه
+            for (proj_id, proj_data), (is_valid, issues) in zip(enabled_projects.items(), results):
+                print()
+                print(f"📋 {proj_data.get('name', proj_id)}")
+                print("-" * 80)
+                
+                for issue in issues:
+                    print(f"   {issue}")
+                
+                if is_valid:
+                    print(f"\n   🎉 پروژه {proj_id} آماده استفاده است!")
+                else:
+                    print(f"\n   ⚠️ پروژه {proj_id} مشکل دارد و باید اصلاح بشه")
+        
+        self.save_cache()
         
         print()
         print("=" * 80)
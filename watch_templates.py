@@ -0,0 +1,368 @@
+"""
+👀 حالت نظارت
+جایگزینی خودکار CDN به محض تغییر فایل‌های template و بقیه انواع فعال پروژه
+"""
+
+import os
+import sys
+import time
+import ctypes
+import select
+import signal
+import struct
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from replace_cdn import ConfigManager, CDNReplacer
+from replacement_cache import create_cache
+
+
+class InotifyBackend:
+    """دریافت رویدادهای تغییر از inotify لینوکس (بدون polling)"""
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+
+    def __init__(self, extensions: Tuple[str, ...]):
+        self.extensions = extensions
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK)
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 ناموفق بود")
+
+        self.watches: Dict[int, Path] = {}
+
+        # پوشه → تابع رد کردن زیرپوشه‌ها (برای پوشه‌هایی که بعدا ساخته میشن)
+        self.skips: Dict[int, Optional[Callable[[str], bool]]] = {}
+
+    @classmethod
+    def available(cls) -> bool:
+        """آیا inotify روی این سیستم قابل استفاده است"""
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            return hasattr(ctypes.CDLL(None), 'inotify_init1')
+        except OSError:
+            return False
+
+    def add_tree(self, root: Path, skip: Optional[Callable[[str], bool]] = None):
+        """اضافه کردن یک پوشه و همه زیرپوشه‌ها (به جز اونایی که skip رد می‌کنه)"""
+        for dirpath, dirs, _ in os.walk(root):
+            if skip:
+                dirs[:] = [d for d in dirs if not skip(d)]
+            self.add_dir(Path(dirpath), skip)
+
+    def add_dir(self, directory: Path, skip: Optional[Callable[[str], bool]] = None):
+        """اضافه کردن یک پوشه"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self.watches[wd] = directory
+            self.skips[wd] = skip
+
+    def wait(self, timeout: float) -> Set[Path]:
+        """منتظر رویداد تا timeout و برگرداندن مسیرهای تغییر کرده"""
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+
+        if not ready:
+            return changed
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+            offset += 16 + length
+
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+
+            path = directory / os.fsdecode(name)
+
+            if mask & self.IN_ISDIR:
+                skip = self.skips.get(wd)
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and not (skip and skip(path.name)):
+                    self.add_tree(path, skip)
+                    changed.update(p for p in path.rglob('*') if p.suffix.lower() in self.extensions)
+            elif path.suffix.lower() in self.extensions:
+                changed.add(path)
+
+        return changed
+
+    def close(self):
+        """بستن inotify"""
+        os.close(self.fd)
+
+
+class TemplateWatcher:
+    """نظارت بر فایل‌های انواع فعال هر پروژه و اجرای replace_in_file روی فایل‌های تغییر کرده"""
+
+    def __init__(self, replacers: List[CDNReplacer], interval: float = 1.0,
+                 debounce: float = 0.5, use_inotify: bool = True):
+        self.replacers = replacers
+        self.interval = interval
+        self.debounce = debounce
+
+        # مسیر فایل → (mtime_ns, size)
+        self.stat_cache: Dict[Path, Tuple[int, int]] = {}
+
+        # مسیر فایل → (replacer, زمان آخرین تغییر دیده شده, stat همون لحظه)
+        self.pending: Dict[Path, Tuple[CDNReplacer, float, Tuple[int, int]]] = {}
+
+        self.latencies: List[float] = []
+
+        # پسوندهای همه انواع فعال (file_types) همه پروژه‌ها
+        self.extensions = tuple(sorted({extension for replacer in replacers
+                                        for file_type in replacer.file_types
+                                        for extension in file_type.extensions}))
+
+        self.backend: Optional[InotifyBackend] = None
+        if use_inotify and InotifyBackend.available():
+            try:
+                self.backend = InotifyBackend(self.extensions)
+            except OSError as e:
+                print(f"⚠️ inotify در دسترس نیست، polling استفاده میشه: {e}")
+
+    @staticmethod
+    def scan_project(replacer: CDNReplacer) -> Dict[Path, Tuple[int, int]]:
+        """stat همه فایل‌های انواع فعال پروژه (همون فایل‌هایی که replacer اسکن می‌کنه)"""
+        snapshot = {}
+
+        for path, _ in replacer.find_source_files():
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+
+        return snapshot
+
+    def owner_of(self, path: Path) -> Optional[CDNReplacer]:
+        """پیدا کردن replacer پروژه‌ای که فایل متعلق بهشه"""
+        for replacer in self.replacers:
+            for root in replacer.source_roots():
+                if not path.is_relative_to(root):
+                    continue
+                if any(replacer.skip_dir(part) for part in path.relative_to(root).parts[:-1]):
+                    continue
+                if replacer.classify_file(path) is not None:
+                    return replacer
+        return None
+
+    def poll_changes(self) -> Set[Path]:
+        """مقایسه stat فعلی با cache"""
+        changed = set()
+
+        for replacer in self.replacers:
+            snapshot = self.scan_project(replacer)
+            roots = replacer.source_roots()
+
+            for path, signature in snapshot.items():
+                if self.stat_cache.get(path) != signature:
+                    changed.add(path)
+
+            for path in [p for p in self.stat_cache if p not in snapshot]:
+                if any(path.is_relative_to(root) for root in roots):
+                    del self.stat_cache[path]
+
+        return changed
+
+    def current_signature(self, path: Path) -> Optional[Tuple[int, int]]:
+        """stat فعلی فایل اگه با cache فرق داشته باشه (رویدادهای نوشتن خودمون رد میشن)"""
+        try:
+            st = path.stat()
+        except OSError:
+            self.stat_cache.pop(path, None)
+            return None
+
+        signature = (st.st_mtime_ns, st.st_size)
+        return None if self.stat_cache.get(path) == signature else signature
+
+    def queue(self, paths: Set[Path]):
+        """اضافه کردن فایل‌ها به صف؛ تایمر debounce فقط با تغییر جدید از اول شروع میشه"""
+        now = time.monotonic()
+
+        for path in paths:
+            replacer = self.owner_of(path)
+            signature = self.current_signature(path) if replacer else None
+
+            if signature is None:
+                continue
+
+            previous = self.pending.get(path)
+            if previous is None or previous[2] != signature:
+                self.pending[path] = (replacer, now, signature)
+
+    def flush(self):
+        """پردازش فایل‌هایی که به اندازه debounce ثابت موندن"""
+        now = time.monotonic()
+        ready = [p for p, (_, seen, _) in self.pending.items() if now - seen >= self.debounce]
+
+        for path in ready:
+            replacer, _, _ = self.pending.pop(path)
+
+            try:
+                edited_at = path.stat().st_mtime
+            except OSError:
+                continue
+
+            # replace_in_file قبل از نوشتن از فایل بکاپ می‌گیره (پوشه بکاپ همین نشست)
+            modified, count, items = replacer.replace_in_file(path)
+            replacer.stats['files_scanned'] += 1
+
+            try:
+                st = path.stat()
+                self.stat_cache[path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+
+            if not modified:
+                continue
+
+            latency = time.time() - edited_at
+            self.latencies.append(latency)
+
+            relative_path = path.relative_to(replacer.source_root(replacer.file_type_for(path)))
+            replacer.stats['files_modified'] += 1
+            replacer.stats['replacements_made'] += count
+            replacer.detailed_log.append({
+                'file': str(relative_path),
+                'replacements': count,
+                'items': items
+            })
+
+            print(f"   ✅ [{replacer.project_name}] {relative_path} ({count} تغییر) - "
+                  f"تاخیر {latency * 1000:.0f} ms")
+
+    @staticmethod
+    def stop(signum, frame):
+        """SIGTERM مثل Ctrl+C حلقه رو تموم می‌کنه تا لاگ ذخیره بشه"""
+        raise KeyboardInterrupt
+
+    def save_logs(self):
+        """ذخیره لاگ همه پروژه‌ها"""
+        for replacer in self.replacers:
+            replacer.save_log()
+
+    def watch(self, max_iterations: Optional[int] = None):
+        """حلقه اصلی نظارت (با Ctrl+C یا SIGTERM متوقف میشه و لاگ‌ها ذخیره میشن)"""
+        for replacer in self.replacers:
+            self.stat_cache.update(self.scan_project(replacer))
+            if self.backend:
+                for root in replacer.source_roots():
+                    self.backend.add_tree(root, replacer.skip_dir)
+
+        mode = "inotify" if self.backend else f"polling هر {self.interval} ثانیه"
+        print(f"👀 نظارت بر {len(self.stat_cache)} فایل ({mode})")
+        print("💡 برای توقف Ctrl+C بزن")
+        print()
+
+        iterations = 0
+
+        # signal فقط در thread اصلی قابل تنظیمه
+        previous_handler = None
+        try:
+            previous_handler = signal.signal(signal.SIGTERM, self.stop)
+        except ValueError:
+            pass
+
+        try:
+            while max_iterations is None or iterations < max_iterations:
+                iterations += 1
+
+                # وقتی چیزی در صف هست فقط تا زمان debounce صبر کن
+                timeout = self.debounce if self.pending else self.interval
+
+                if self.backend:
+                    self.queue(self.backend.wait(timeout))
+                else:
+                    time.sleep(timeout)
+                    self.queue(self.poll_changes())
+
+                self.flush()
+
+        except KeyboardInterrupt:
+            print()
+        finally:
+            if previous_handler is not None:
+                signal.signal(signal.SIGTERM, previous_handler)
+            if self.backend:
+                self.backend.close()
+            self.save_logs()
+
+        self.print_summary()
+
+    def print_summary(self):
+        """خلاصه تاخیرها"""
+        print("=" * 70)
+        print("📊 خلاصه نظارت:")
+        print("=" * 70)
+        print(f"✏️  فایل‌های بازنویسی شده: {len(self.latencies)}")
+
+        if self.latencies:
+            avg = sum(self.latencies) / len(self.latencies)
+            print(f"⏱️  تاخیر میانگین: {avg * 1000:.0f} ms")
+            print(f"⏱️  بیشترین تاخیر: {max(self.latencies) * 1000:.0f} ms")
+
+        print("=" * 70)
+
+
+def main():
+    """تابع اصلی"""
+    print()
+    print("╔" + "═" * 68 + "╗")
+    print("║" + " " * 20 + "👀 CDN Watcher" + " " * 34 + "║")
+    print("╚" + "═" * 68 + "╝")
+    print()
+
+    config_manager = ConfigManager()
+    enabled_projects = config_manager.get_enabled_projects()
+    cdn_mappings = config_manager.get_cdn_mappings()
+    settings = config_manager.get_settings()
+
+    if not enabled_projects:
+        print("❌ هیچ پروژه فعالی یافت نشد!")
+        return
+
+    if not cdn_mappings:
+        print("❌ هیچ CDN mapping فعالی یافت نشد!")
+        return
+
+    replacers = []
+    for proj_id, proj_data in enabled_projects.items():
+        replacer = CDNReplacer(proj_data, cdn_mappings, settings)
+        replacer.open_index(proj_id)
+        replacers.append(replacer)
+
+    cache = create_cache(settings)
+    for replacer in replacers:
+        replacer.attach_cache(cache)
+
+    for replacer in replacers:
+        roots = ', '.join(str(root) for root in replacer.source_roots())
+        print(f"📁 {replacer.project_name}: {roots} ({', '.join(t.name for t in replacer.file_types)})")
+    print()
+
+    watcher = TemplateWatcher(
+        replacers,
+        interval=settings.get('watch_interval', 1.0),
+        debounce=settings.get('watch_debounce', 0.5),
+        use_inotify='--poll' not in sys.argv
+    )
+    watcher.watch()
+
+
+if __name__ == "__main__":
+    main()